@@ -0,0 +1,85 @@
+"""
+Tests for polling a comment thread for new comments.
+"""
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.comments.models import Comment
+from apps.core.routers import ReplicaRouter, replica_reads_allowed
+from apps.posts.models import Post
+from apps.users.models import User
+
+
+@override_settings(COMMENT_CURSOR_LAG=5)
+class NewCommentsTests(TestCase):
+    """Test GET /api/comments/post/<id>/?since=<cursor>."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        self.top = Comment.objects.create(post=self.post, author=self.author, content='Top')
+        self.path = f'/api/comments/post/{self.post.id}/'
+
+    def created(self, comment, seconds_ago):
+        Comment.objects.filter(id=comment.id).update(
+            created_at=timezone.now() - timedelta(seconds=seconds_ago)
+        )
+
+    def test_returns_only_new_comments_with_their_place_in_the_tree(self):
+        self.created(self.top, 60)
+        cursor = self.client.get(self.path).json()['cursor']
+
+        reply = Comment.objects.create(post=self.post, parent=self.top, author=self.author, content='Reply')
+        deeper = Comment.objects.create(post=self.post, parent=reply, author=self.author, content='Deeper')
+        Comment.objects.create(post=Post.objects.create(author=self.author, content='Other'),
+                               author=self.author, content='Elsewhere')
+
+        data = self.client.get(self.path, {'since': cursor}).json()
+        self.assertEqual(
+            [(comment['id'], comment['parent'], comment['depth']) for comment in data['comments']],
+            [(reply.id, self.top.id, 1), (deeper.id, reply.id, 2)]
+        )
+        self.assertEqual(data['comments'][0]['reply_count'], 1)
+        self.assertEqual(data['comments'][0]['replies'], [])
+
+    def test_cursor_lags_behind_to_catch_late_commits(self):
+        self.created(self.top, 60)
+        data = self.client.get(self.path, {'since': (timezone.now() - timedelta(seconds=30)).isoformat()}).json()
+        self.assertEqual(data['comments'], [])
+
+        # A comment stamped before the previous poll but committed after it
+        late = Comment.objects.create(post=self.post, author=self.author, content='Late')
+        self.created(late, 2)
+        self.assertEqual(
+            [comment['id'] for comment in self.client.get(self.path, {'since': data['cursor']}).json()['comments']],
+            [late.id]
+        )
+
+        # The cursor never moves backwards
+        future = timezone.now() + timedelta(minutes=1)
+        with mock.patch('apps.comments.views.timezone.now', return_value=future - timedelta(minutes=2)):
+            cursor = self.client.get(self.path, {'since': future.isoformat()}).json()['cursor']
+        self.assertEqual(cursor.replace('Z', '+00:00'), future.isoformat())
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_polls_read_from_the_primary(self):
+        """Test that only the full tree may come from a replica."""
+        reads = []
+
+        def db_for_read(router, model, **hints):
+            reads.append((model, replica_reads_allowed.get()))
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            self.client.get(self.path)
+            self.assertIn((Comment, True), reads)
+            reads.clear()
+            self.client.get(self.path, {'since': timezone.now().isoformat()})
+            self.assertIn((Comment, False), reads)
+            self.assertNotIn((Comment, True), reads)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.path, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = 'comments'
 
 urlpatterns = [
     path('', views.CommentCreateView.as_view(), name='comment-create'),
     path('<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
-    path('post/<int:post_id>/', views.PostCommentsView.as_view(), name='post-comments'),
+    path(
+        'post/<int:post_id>/',
+        (views_async if settings.ASYNC_VIEWS else views).PostCommentsView.as_view(),
+        name='post-comments'
+    ),
 ]
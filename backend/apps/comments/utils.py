@@ -5,7 +5,7 @@ The key insight is that we fetch ALL comments for a post in ONE query,
 then build the tree structure in Python. This avoids the N+1 problem
 where each comment would trigger a query for its replies.
 """
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 
 def build_comment_tree(comments, serializer_class, context):
@@ -82,11 +82,27 @@ def get_flat_comment_list(comments, serializer_class, context):
     Alternative: Return a flat list with parent references.
     Useful for clients that want to build the tree themselves.
     """
+    # Count replies among the listed comments
+    reply_counts = Counter(comment.parent_id for comment in comments)
     for comment in comments:
-        # Count replies
-        reply_count = sum(1 for c in comments if c.parent_id == comment.id)
-        comment._reply_count = reply_count
+        comment._reply_count = reply_counts[comment.id]
         comment._replies_data = []  # Don't nest, let client build tree
     
     serializer = serializer_class(comments, many=True, context=context)
     return serializer.data
+
+
+def comment_subtree_ids(comment):
+    """
+    IDs of a comment and all its replies, at any depth.
+
+    One query per level of the subtree, using the parent index.
+    """
+    from .models import Comment
+
+    ids = [comment.id]
+    level = [comment.id]
+    while level:
+        level = list(Comment.objects.filter(parent_id__in=level).values_list('id', flat=True))
+        ids.extend(level)
+    return ids
@@ -1,15 +1,97 @@
+from contextlib import nullcontext
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Comment
 from .serializers import CommentSerializer, CommentCreateSerializer
-from .utils import build_comment_tree
+from .utils import build_comment_tree, comment_subtree_ids, get_flat_comment_list
+from apps.core.routers import use_primary
+from apps.events.services import publish
 from apps.likes.models import CommentLike
 from apps.users.models import User
 from apps.posts.models import Post
 
 
+def post_comments_queryset(post, user_id):
+    """
+    All comments of a post with authors joined and the user's likes prefetched.
+
+    Shared by the sync and async (views_async.py) comment tree views.
+    """
+    # select_related('author') joins the user table (one query)
+    queryset = Comment.objects.filter(post=post).select_related('author')
+    
+    if user_id:
+        # Prefetch the current user's likes for all these comments
+        # This is ONE additional query, not N queries
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                'comment_likes',
+                queryset=CommentLike.objects.filter(user_id=user_id),
+                to_attr='prefetched_likes'
+            )
+        )
+    
+    return queryset
+
+
+def parse_comment_cursor(value):
+    """Parse a `since` cursor (ISO 8601 timestamp); None if it is not one."""
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def next_comment_cursor(since=None):
+    """
+    Cursor for the client's next poll, taken before reading the comments.
+
+    It lags COMMENT_CURSOR_LAG seconds behind now: created_at is set before
+    the comment commits, so a comment can become visible after a poll that
+    has passed its timestamp. The next poll sends recent comments again;
+    clients skip the ids they already have.
+    """
+    cursor = timezone.now() - timedelta(seconds=settings.COMMENT_CURSOR_LAG)
+    return max(cursor, since) if since else cursor
+
+
+def new_comments_reads(since):
+    """
+    Where to read comments from: polls with a cursor read the primary.
+
+    A replica lagging more than COMMENT_CURSOR_LAG behind would hide
+    comments behind a cursor the client then moves past for good.
+    """
+    return use_primary() if since is not None else nullcontext()
+
+
+def post_comments_response(post_id, comments, since, cursor, context):
+    """
+    Response body shared by the sync and async comment views: the nested
+    tree, or with `since` a flat list of the new comments, oldest first.
+    """
+    if since is None:
+        data = build_comment_tree(comments, CommentSerializer, context)
+    else:
+        data = get_flat_comment_list(comments, CommentSerializer, context)
+    return {
+        'post_id': post_id,
+        'count': len(comments),
+        'comments': data,
+        'cursor': cursor,
+    }
+
+
 class PostCommentsView(APIView):
     """
     Get all comments for a post as a nested tree.
@@ -21,7 +103,16 @@ class PostCommentsView(APIView):
     4. Building the tree structure in Python (O(n))
     
     Result: Exactly 2-3 queries regardless of comment count or nesting depth.
+
+    GET /api/comments/post/<post_id>/?since=<cursor> returns only the
+    comments created after the cursor, as a flat list with each comment's
+    parent and depth, using the (post, created_at) index and read from the
+    primary. Every response carries the `cursor` for the next poll.
+    Deleted comments are reported by /api/sync/, not here.
     """
+    # session + post + comments + current user's likes
+    query_budget = 4
+    replica_reads = True
 
     def get(self, request, post_id):
         # Verify post exists
@@ -33,38 +124,32 @@ class PostCommentsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        user_id = request.session.get('user_id')
+        since = None
+        if 'since' in request.query_params:
+            since = parse_comment_cursor(request.query_params['since'])
+            if since is None:
+                return Response(
+                    {'error': 'since must be an ISO 8601 timestamp'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        cursor = next_comment_cursor(since)
         
-        # Fetch ALL comments for this post in ONE query
-        # select_related('author') joins the user table (one query)
-        queryset = Comment.objects.filter(post=post).select_related('author')
+        user_id = request.session.get('user_id')
         
-        if user_id:
-            # Prefetch the current user's likes for all these comments
-            # This is ONE additional query, not N queries
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    'comment_likes',
-                    queryset=CommentLike.objects.filter(user_id=user_id),
-                    to_attr='prefetched_likes'
-                )
-            )
+        # Fetch ALL comments for this post in ONE query, with the
+        # current user's likes in one more
+        queryset = post_comments_queryset(post, user_id)
+        if since is not None:
+            queryset = queryset.filter(created_at__gt=since).order_by('created_at', 'id')
         
         # Fetch all comments
-        comments = list(queryset)
+        with new_comments_reads(since):
+            comments = list(queryset)
         
         # Build nested tree structure in Python (O(n) time complexity)
-        comment_tree = build_comment_tree(
-            comments,
-            CommentSerializer,
-            {'request': request}
+        return Response(
+            post_comments_response(post_id, comments, since, cursor, {'request': request})
         )
-        
-        return Response({
-            'post_id': post_id,
-            'count': len(comments),
-            'comments': comment_tree
-        })
 
 
 class CommentCreateView(generics.CreateAPIView):
@@ -89,7 +174,13 @@ class CommentCreateView(generics.CreateAPIView):
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        comment = serializer.save(author=user)
+        with transaction.atomic():
+            comment = serializer.save(author=user)
+            publish(
+                'comment_created',
+                comment_id=comment.id, post_id=comment.post_id,
+                parent_id=comment.parent_id, author_id=user.id
+            )
         
         # Return the created comment with full data
         response_serializer = CommentSerializer(comment, context={'request': request})
@@ -99,6 +190,8 @@ class CommentCreateView(generics.CreateAPIView):
 class CommentDetailView(generics.RetrieveDestroyAPIView):
     """Retrieve or delete a comment."""
     serializer_class = CommentSerializer
+    # session + comment + current user's like
+    query_budget = 3
 
     def get_queryset(self):
         user_id = self.request.session.get('user_id')
@@ -132,4 +225,12 @@ class CommentDetailView(generics.RetrieveDestroyAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return super().destroy(request, *args, **kwargs)
+        with transaction.atomic():
+            # Replies are deleted with their parent (CASCADE)
+            comment_ids = comment_subtree_ids(comment)
+            response = super().destroy(request, *args, **kwargs)
+            publish(
+                'comment_deleted',
+                comment_ids=comment_ids, post_id=comment.post_id, author_id=user_id
+            )
+        return response
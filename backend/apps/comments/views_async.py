@@ -0,0 +1,55 @@
+"""
+Async version of the comment tree view, served under ASGI when
+ASYNC_VIEWS is enabled. See apps/core/asyncviews.py.
+"""
+from django.views import View
+from rest_framework import status
+from apps.core.asyncviews import aget_session_user_id, json_response
+from apps.posts.models import Post
+from .views import (
+    new_comments_reads, next_comment_cursor, parse_comment_cursor, post_comments_queryset,
+    post_comments_response
+)
+
+
+class PostCommentsView(View):
+    """
+    Async GET /api/comments/post/<post_id>/[?since=<cursor>]
+    (same response as views.PostCommentsView).
+    """
+    # session + post + comments + current user's likes
+    query_budget = 4
+    replica_reads = True
+
+    async def get(self, request, post_id):
+        try:
+            post = await Post.objects.aget(id=post_id)
+        except Post.DoesNotExist:
+            return json_response(
+                {'error': 'Post not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        since = None
+        if 'since' in request.GET:
+            since = parse_comment_cursor(request.GET['since'])
+            if since is None:
+                return json_response(
+                    {'error': 'since must be an ISO 8601 timestamp'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        cursor = next_comment_cursor(since)
+        
+        user_id = await aget_session_user_id(request)
+        
+        # One query for the comments, one for the user's likes
+        queryset = post_comments_queryset(post, user_id)
+        if since is not None:
+            queryset = queryset.filter(created_at__gt=since).order_by('created_at', 'id')
+        with new_comments_reads(since):
+            comments = [comment async for comment in queryset]
+        
+        # Pure Python from here on: everything the serializer reads is loaded
+        return json_response(
+            post_comments_response(post_id, comments, since, cursor, {'request': request})
+        )
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    """
+    Cross-cutting infrastructure: request instrumentation and metrics.
+    """
+    name = 'apps.core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_wrapper
+
+        connection_created.connect(install_query_wrapper, dispatch_uid='core.install_query_wrapper')
@@ -0,0 +1,31 @@
+"""
+Helpers for the async (ASGI) read views.
+
+DRF's APIView is sync-only, so the async views are plain Django class
+views with `async def get`. They keep the sync views' URL names, query
+budgets and replica_reads flags, and render through the same
+TimedJSONRenderer so responses are byte-for-byte the same.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from .renderers import TimedJSONRenderer
+
+_renderer = TimedJSONRenderer()
+
+
+async def aget_session_user_id(request):
+    """
+    Read the demo session's user id without blocking the event loop.
+
+    Loading the session may query the database, so it runs in a worker
+    thread; later sync reads (e.g. in serializers) hit the loaded cache.
+    """
+    return await sync_to_async(request.session.get)('user_id')
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        _renderer.render(data),
+        content_type=_renderer.media_type,
+        status=status
+    )
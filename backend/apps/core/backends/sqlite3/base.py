@@ -0,0 +1,30 @@
+"""
+SQLite backend tuned for concurrent web workers.
+
+Django's stock backend opens SQLite in rollback-journal mode, where a
+writer blocks every reader, and starts transactions with a deferred
+BEGIN, so two like toggles that both read before writing deadlock and one
+fails immediately with "database is locked". This backend:
+
+1. Applies the SQLITE_PRAGMAS setting on every new connection (by
+   default WAL journal, synchronous=NORMAL, busy_timeout and mmap_size),
+   so readers never wait for writers
+2. Starts transactions with BEGIN IMMEDIATE, so writers queue on the
+   busy timeout instead of failing when upgrading a read lock
+
+Use it with ENGINE 'apps.core.backends.sqlite3'.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,76 @@
+"""
+Helpers shared by the benchmark commands (bench_likes, stress_likes,
+loadtest, microbench).
+
+Results are plain dicts so they can be written as JSON and compared
+between runs; `run_metadata` records what was measured (commit, host)
+alongside the numbers.
+"""
+import multiprocessing
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from django.conf import settings
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list, rounded to 2 places."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return round(sorted_values[index], 2)
+
+
+def latency_summary(values):
+    """p50/p95/p99, mean and max of a list of latencies (any unit)."""
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'mean': round(sum(values) / len(values), 2) if values else None,
+        'max': round(values[-1], 2) if values else None,
+    }
+
+
+def git_revision():
+    """Commit of the working tree, with '-dirty' if it has local changes; None outside git."""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return f'{revision}-dirty' if dirty else revision
+
+
+def run_metadata(**extra):
+    """Describe the run: commit, time and host, plus any `extra` fields."""
+    return {
+        'revision': git_revision(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        **extra,
+    }
+
+
+def worker_process_context():
+    """Multiprocessing context for benchmark workers: fork where available."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def init_worker_process():
+    """Pool initializer: set Django up in spawned (not forked) workers."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
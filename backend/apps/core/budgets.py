@@ -0,0 +1,42 @@
+"""
+Per-view query budgets.
+
+Views declare the maximum number of queries a read (GET/HEAD) request
+may run, independent of how many rows it returns:
+
+    class PostListCreateView(generics.ListCreateAPIView):
+        query_budget = 4
+
+The test suite checks the budget (see testing.py) and, with
+QUERY_BUDGET_LOG enabled, MetricsMiddleware logs every request that
+exceeds it in production.
+"""
+import logging
+
+logger = logging.getLogger('apps.core.budgets')
+
+
+def get_query_budget(match):
+    """Return the query budget declared by the view of a ResolverMatch, if any."""
+    if match is None:
+        return None
+
+    # DRF's as_view() sets .cls, Django's sets .view_class
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    return getattr(view_class, 'query_budget', None)
+
+
+def check_query_budget(request, view_name, queries):
+    """Log a warning if a read request ran more queries than its view's budget."""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+
+    budget = get_query_budget(getattr(request, 'resolver_match', None))
+    if budget is None or queries <= budget:
+        return False
+
+    logger.warning(
+        'Query budget exceeded: %s %s (%s) ran %d queries, budget is %d',
+        request.method, request.path, view_name, queries, budget
+    )
+    return True
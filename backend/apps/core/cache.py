@@ -0,0 +1,239 @@
+"""
+Two-tier cache: a per-process LRU in front of a shared cache.
+
+Configured as the default cache:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.core.cache.TieredCache',
+            'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', ...},
+    }
+
+Reads hit the in-process LRU first and fall back to the shared backend
+(file cache locally, any Django backend such as Redis in production).
+Local entries live at most LOCAL_TIMEOUT seconds, which bounds how long
+another worker can serve a value after it was changed or deleted.
+Lookups are counted in the cache_requests_total metric by tier and result.
+
+CacheNamespace groups the keys of one app under a version number, so
+everything cached for that app can be invalidated with one increment:
+
+    posts_cache = CacheNamespace('posts')
+    page = posts_cache.get_or_set(f'feed:{page_number}', build_page, timeout=30)
+    posts_cache.invalidate()  # after a write
+
+The version number itself always lives in the shared tier only, so an
+invalidation is seen by every worker on its next read.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from .metrics import registry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache(BaseCache):
+    """Django cache backend combining a LocalLRU with a shared cache alias."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self.local = LocalLRU(int(options.get('LOCAL_MAX_ENTRIES', 1000)))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            registry.inc('cache_requests_total', {'tier': 'local', 'result': 'hit'})
+            return value
+        registry.inc('cache_requests_total', {'tier': 'local', 'result': 'miss'})
+
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            registry.inc('cache_requests_total', {'tier': 'shared', 'result': 'miss'})
+            return default
+        registry.inc('cache_requests_total', {'tier': 'shared', 'result': 'hit'})
+        self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._resolve_timeout(timeout)
+        self.shared.set(key, value, timeout, version=version)
+        self._set_local(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._resolve_timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._set_local(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._resolve_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def _resolve_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _set_local(self, key, value, timeout, version):
+        local_key = self.make_and_validate_key(key, version=version)
+        if timeout is not None and timeout <= 0:
+            self.local.delete(local_key)
+            return
+        ttl = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        self.local.set(local_key, value, ttl)
+
+
+class CacheNamespace:
+    """
+    Versioned key namespace in a cache.
+
+    Keys are stored as '<name>:v<version>:<key>'. invalidate() increments
+    the version, so every existing key of the namespace stops being read
+    at once and simply expires later. The version is read and incremented
+    on the shared tier of a TieredCache, never through its local LRU.
+    """
+
+    def __init__(self, name, alias='default'):
+        self.name = name
+        self.alias = alias
+        self.version_key = f'{name}:version'
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_cache(self):
+        cache = self.cache
+        return cache.shared if isinstance(cache, TieredCache) else cache
+
+    def version(self):
+        cache = self.version_cache
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, 1, timeout=None)
+            version = cache.get(self.version_key, 1)
+        return version
+
+    def make_key(self, key):
+        return f'{self.name}:v{self.version()}:{key}'
+
+    def get(self, key, default=None):
+        return self.cache.get(self.make_key(key), default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.cache.set(self.make_key(key), value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT):
+        """Return the cached value, computing and storing `default()` on a miss."""
+        full_key = self.make_key(key)
+        value = self.cache.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = default() if callable(default) else default
+            self.cache.set(full_key, value, timeout)
+        return value
+
+    def invalidate(self):
+        """Orphan every key in the namespace."""
+        cache = self.version_cache
+        with _incr_lock(cache):
+            try:
+                cache.incr(self.version_key)
+            except ValueError:
+                # No version stored yet: readers were using 1
+                cache.set(self.version_key, 2, timeout=None)
+
+
+@contextmanager
+def _incr_lock(cache):
+    """
+    Serialize increments on a FileBasedCache across processes.
+
+    FileBasedCache.incr() is a read followed by a write, so two workers
+    invalidating at once could both store the same version. Other backends
+    (Redis, memcached, locmem) increment atomically on their own.
+    """
+    if fcntl is None or not isinstance(cache, FileBasedCache):
+        yield
+        return
+    os.makedirs(cache._dir, exist_ok=True)
+    with open(os.path.join(cache._dir, '.incr.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
@@ -0,0 +1,119 @@
+"""
+Negotiated compression of API responses.
+
+JSON bodies from this API are very repetitive (the same nested author
+objects on every post and comment) and compress 5-10x. CompressionMiddleware
+picks the best encoding both sides support, in this order of preference:
+
+    zstd (needs the `zstandard` package), br (needs `brotli`), gzip
+
+Only 200 responses with a compressible content type and a body of at
+least COMPRESS_MIN_SIZE bytes are compressed, at the fast levels in
+COMPRESS_LEVELS. Compressed bodies are kept in a small per-process LRU
+keyed by encoding and a hash of the uncompressed body, so a response that
+is served repeatedly (e.g. from the cache) is compressed only once.
+"""
+import gzip
+import hashlib
+from django.conf import settings
+from .cache import LocalLRU
+from .metrics import registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _gzip(data, level):
+    # mtime=0 keeps the output (and so any ETag derived from it) stable
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Server preference order; encodings whose library is missing are left out
+COMPRESSORS = {
+    name: compress
+    for name, compress, available in (
+        ('zstd', _zstd, zstandard is not None),
+        ('br', _brotli, brotli is not None),
+        ('gzip', _gzip, True),
+    )
+    if available
+}
+
+_compressed_bodies = None
+
+
+def choose_encoding(accept_encoding):
+    """
+    Pick the preferred encoding the client accepts, or None.
+
+    Understands q-values ('gzip;q=0' refuses gzip) and '*'.
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    for name in COMPRESSORS:
+        if accepted.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+def should_compress(response):
+    if response.streaming or response.status_code != 200 or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '')
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return len(response.content) >= settings.COMPRESS_MIN_SIZE
+
+
+def compress_body(body, encoding):
+    """Compress `body`, reusing a cached result for an identical body."""
+    cache = _get_cache()
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    compressed = cache.get(key, None) if cache is not None else None
+    if compressed is not None:
+        registry.inc('cache_requests_total', {'tier': 'compression', 'result': 'hit'})
+        return compressed
+
+    level = settings.COMPRESS_LEVELS[encoding]
+    compressed = COMPRESSORS[encoding](body, level)
+    if cache is not None:
+        registry.inc('cache_requests_total', {'tier': 'compression', 'result': 'miss'})
+        cache.set(key, compressed, settings.COMPRESS_CACHE_TIMEOUT)
+    return compressed
+
+
+def _get_cache():
+    global _compressed_bodies
+    if not settings.COMPRESS_CACHE_ENTRIES:
+        return None
+    if _compressed_bodies is None:
+        _compressed_bodies = LocalLRU(settings.COMPRESS_CACHE_ENTRIES)
+    return _compressed_bodies
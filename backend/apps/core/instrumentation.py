@@ -0,0 +1,109 @@
+"""
+Per-request instrumentation.
+
+Every database connection gets an execute wrapper (installed when the
+connection is created) that records query count and time into the
+RequestStats of the request currently being served. The stats object is
+held in a context variable, so it follows the request into
+sync_to_async threads and does not need DEBUG=True.
+
+When a request is being profiled (see ProfileMiddleware), the wrapper
+also keeps every statement with its duration and call site.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from django import db
+from django.conf import settings
+
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    """Database and rendering activity of a single request."""
+
+    __slots__ = ('queries', 'db_time', 'render_time', 'query_log')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        # List of (sql, params, duration, call_site) while profiling, else None
+        self.query_log = None
+
+
+@contextmanager
+def request_stats():
+    """
+    Bind a RequestStats to the current context for the duration of the block.
+
+    Nested uses (e.g. several middlewares) share the outermost stats object.
+    """
+    stats = current_request_stats.get()
+    if stats is not None:
+        yield stats
+        return
+
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request_stats.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that times the query into the current RequestStats."""
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.query_log is not None:
+            stats.query_log.append((sql, params, duration, _call_site()))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """connection_created handler: instrument the new connection once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _call_site():
+    """
+    The code that triggered the query.
+
+    The innermost project frame (under apps/, outside apps.core) if there
+    is one; otherwise the innermost frame outside the ORM, e.g. a DRF
+    generic view evaluating the queryset.
+    """
+    base_dir = Path(settings.BASE_DIR)
+    apps_dir = str(base_dir / 'apps')
+    core_dir = str(base_dir / 'apps' / 'core')
+    fallback = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(apps_dir) and not filename.startswith(core_dir):
+            return _describe_frame(frame, Path(filename).relative_to(base_dir))
+        if fallback is None and not filename.startswith(_ORM_DIR):
+            fallback = frame
+        frame = frame.f_back
+    if fallback is None:
+        return None
+    return _describe_frame(fallback, fallback.f_code.co_filename)
+
+
+def _describe_frame(frame, filename):
+    return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+_ORM_DIR = str(Path(db.__file__).parent)
@@ -0,0 +1,224 @@
+"""
+Non-blocking, structured logging.
+
+Request threads never write to stdout/stderr themselves. QueueLogHandler
+puts each record on a bounded in-memory queue and returns; a background
+listener thread formats and writes them. When the queue is full the
+record is dropped and counted (log_records_dropped_total) instead of
+blocking the request.
+
+Other pieces, wired up in settings.LOGGING:
+- JsonFormatter: one JSON object per line, with request id and URL name
+- RequestContextFilter: attaches the request id and URL name of the
+  request being served (see RequestIdMiddleware)
+- SamplingFilter: keeps only a fraction of the records of high-volume
+  loggers, e.g. {'django.db.backends': 0.01}; errors are always kept
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# (request id, request) of the request being served
+current_request_context = ContextVar('current_request_context', default=None)
+
+# LogRecord attributes that are not "extra" fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id', 'view',
+    'request',  # django.request's extra; represented by request_id and view
+}
+
+MAX_REQUEST_ID_LENGTH = 64
+
+# Longest a flush, or stopping the listener at exit, waits for the queue
+FLUSH_TIMEOUT = 5.0
+
+
+def new_request_id(incoming=None):
+    """Reuse a sane incoming X-Request-ID (e.g. from the load balancer) or make one."""
+    if incoming and len(incoming) <= MAX_REQUEST_ID_LENGTH and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to a background thread through a bounded queue.
+
+    The formatter and filters configured on this handler are applied as
+    usual: filters in the calling thread (so sampled-out records cost
+    almost nothing), the formatter in the listener thread.
+    """
+
+    def __init__(self, maxsize=10000, stream='ext://sys.stderr'):
+        super().__init__(queue.Queue(maxsize))
+        self.stream = stream
+        self.dropped = Counter()
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+        atexit.register(self._stop_listener)
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.name] += 1
+            from .metrics import registry
+            registry.inc('log_records_dropped_total', {'logger': record.name})
+
+    def prepare(self, record):
+        # Merge args and render the traceback now, while they are still
+        # valid; the full formatting happens in the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def flush(self):
+        """Block until the listener has written everything queued so far (up to FLUSH_TIMEOUT)."""
+        if self._listener is None or self._listener_pid != os.getpid():
+            return
+        # The listener marks every record done once written; the listener keeps running
+        with self.queue.all_tasks_done:
+            self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, FLUSH_TIMEOUT)
+
+    def close(self):
+        self._stop_listener()
+        super().close()
+
+    def _stop_listener(self):
+        """Write out what is queued and stop the listener thread."""
+        with self._lock:
+            listener = self._listener
+            if listener is None or self._listener_pid != os.getpid():
+                return
+            self._listener = None
+        try:
+            listener.stop()
+        except queue.Full:
+            # No room for the stop sentinel within FLUSH_TIMEOUT: the listener
+            # is stuck writing. It is a daemon thread and ends with the process
+            pass
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            # First record, or a forked worker that did not inherit the thread
+            target = logging.StreamHandler(_resolve_stream(self.stream))
+            target.setFormatter(self.formatter or logging.Formatter())
+            self._listener = _QueueListener(self.queue, target)
+            self._listener_pid = os.getpid()
+            self._listener.start()
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that waits for room to enqueue its stop sentinel.
+
+    The stock listener uses put_nowait(), which raises queue.Full when
+    stop() is called on a full bounded queue.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=FLUSH_TIMEOUT)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            data['request_id'] = request_id
+            data['view'] = getattr(record, 'view', None)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach request_id and view (URL name) of the current request, if any."""
+
+    def filter(self, record):
+        context = current_request_context.get()
+        if context is not None:
+            record.request_id, request = context
+        else:
+            # django.request logs 4xx/5xx after the middleware has finished,
+            # passing the request along as an extra
+            request = getattr(record, 'request', None)
+            record.request_id = getattr(request, 'request_id', None)
+        match = getattr(request, 'resolver_match', None)
+        record.view = match.url_name if match is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records of selected loggers.
+
+    Args:
+        rates: Mapping of logger name -> fraction kept (0.0-1.0), or the
+            same as a 'django.db.backends=0.01,apps.core.budgets=0.1'
+            string. A rate applies to the logger and its children; the
+            most specific name wins. Unlisted loggers are not sampled.
+        always_keep: Records at or above this level are never dropped
+    """
+
+    def __init__(self, rates=None, always_keep='ERROR'):
+        super().__init__()
+        if isinstance(rates, str):
+            rates = dict(item.split('=', 1) for item in rates.split(',') if '=' in item)
+        self.rates = {name.strip(): float(rate) for name, rate in (rates or {}).items()}
+        self.always_keep = logging.getLevelName(always_keep)
+        self._cache = {}
+
+    def filter(self, record):
+        if record.levelno >= self.always_keep or not self.rates:
+            return True
+        rate = self._cache.get(record.name)
+        if rate is None:
+            rate = self._cache[record.name] = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+    def _rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return float(self.rates[name])
+            name = name.rpartition('.')[0]
+        return 1.0
+
+
+def _resolve_stream(stream):
+    if isinstance(stream, str) and stream.startswith('ext://sys.'):
+        return getattr(sys, stream[len('ext://sys.'):])
+    return stream
@@ -0,0 +1,489 @@
+"""
+Management command to load-test a running server over HTTP.
+
+Each worker thread logs in as one of the server's users and runs
+scenarios picked from a weighted mix until the time is up:
+
+- feed: scroll the feed (first page, then up to two more)
+- thread: open a post and its comment tree
+- like_hot / like_cold: toggle a like on one of the most liked posts
+  (row contention) or on any other post
+- post: create a post
+- leaderboard: poll the leaderboard
+
+Without --rate every worker starts its next scenario as soon as the last
+one finished (closed loop). With --rate, scenario starts are spread
+evenly over time across all workers; if the server cannot keep up, the
+delay behind schedule is reported as schedule_lag_ms. The first
+--warmup seconds are not measured.
+
+The report has p50/p95/p99 latency, throughput and error rate per
+endpoint plus the git revision, so runs can be compared across commits
+(--output run.json).
+
+The target server needs data (e.g. `seed_data --bulk`); like and post
+scenarios write to it.
+
+Examples:
+    python manage.py loadtest --url http://127.0.0.1:8000 --concurrency 16 --duration 30
+    python manage.py loadtest --rate 100 --mix feed=60,thread=30,leaderboard=10 --output run.json
+"""
+import gzip
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from apps.core.benchmarks import latency_summary, run_metadata
+
+DEFAULT_MIX = 'feed=40,thread=25,like_hot=10,like_cold=10,post=5,leaderboard=10'
+
+
+class Command(BaseCommand):
+    help = 'Load-test a running server with a mix of API scenarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Base URL of the server under test'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Concurrent clients (worker threads)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30.0,
+            help='Seconds to measure'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=float,
+            default=2.0,
+            help='Seconds to run before measuring'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Scenario starts per second across all workers (default: as fast as possible)'
+        )
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Scenario weights, e.g. "{DEFAULT_MIX}"'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Distinct users to log in as'
+        )
+        parser.add_argument(
+            '--hot-posts',
+            type=int,
+            default=5,
+            help='Most liked posts targeted by like_hot'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10.0,
+            help='Per-request timeout in seconds'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the JSON results to this file'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+        if options['rate'] is not None and options['rate'] <= 0:
+            raise CommandError('--rate must be positive')
+        mix = parse_mix(options['mix'])
+
+        targets = discover_targets(
+            Client(options['url'], options['timeout']), options['users'], options['hot_posts']
+        )
+
+        start = time.perf_counter()
+        measure_from = start + options['warmup']
+        deadline = measure_from + options['duration']
+        pacer = Pacer(options['rate'], start) if options['rate'] else None
+        workers = [
+            Worker(
+                Client(options['url'], options['timeout'], measure_from),
+                targets.usernames[index % len(targets.usernames)],
+                targets, mix, pacer, random.Random(options['seed'] + index)
+            )
+            for index in range(options['concurrency'])
+        ]
+        threads = [
+            threading.Thread(target=worker.run, args=(deadline,), daemon=True)
+            for worker in workers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = build_report(workers, options, mix)
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print_report(report)
+
+    def _print_report(self, report):
+        meta = report['meta']
+        totals = report['totals']
+        self.stdout.write(
+            f"{meta['url']} @ {meta['revision'] or 'unknown revision'}, "
+            f"{meta['concurrency']} clients, {meta['duration']}s"
+            + (f", {meta['rate']}/s" if meta['rate'] else '')
+        )
+        self.stdout.write(
+            f"{'endpoint':<18} {'reqs':>7} {'rps':>8} {'err%':>6} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8}"
+        )
+        for name, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"{name:<18} {stats['requests']:>7} {stats['rps']:>8} "
+                f"{stats['error_rate'] * 100:>6.1f} {_ms(latency['p50'])} "
+                f"{_ms(latency['p95'])} {_ms(latency['p99'])}"
+            )
+        latency = totals['latency_ms']
+        self.stdout.write(
+            f"{'total':<18} {totals['requests']:>7} {totals['rps']:>8} "
+            f"{totals['error_rate'] * 100:>6.1f} {_ms(latency['p50'])} "
+            f"{_ms(latency['p95'])} {_ms(latency['p99'])}"
+        )
+        if report['schedule_lag_ms']:
+            lag = report['schedule_lag_ms']
+            self.stdout.write(f"behind schedule: p50 {lag['p50']} ms, p99 {lag['p99']} ms")
+        for name, stats in report['endpoints'].items():
+            for status, count in stats['errors_by_status'].items():
+                self.stdout.write(self.style.WARNING(f'  {name}: {count} x {status}'))
+
+
+class Targets:
+    """What the scenarios act on, discovered from the server before the run."""
+
+    def __init__(self, usernames, post_ids, hot_post_ids, cold_post_ids):
+        self.usernames = usernames
+        self.post_ids = post_ids
+        self.hot_post_ids = hot_post_ids
+        self.cold_post_ids = cold_post_ids
+
+
+def discover_targets(client, users, hot_posts, post_pages=5):
+    """List users and posts through the API; the most liked posts are "hot"."""
+    usernames = []
+    page = 1
+    while len(usernames) < users:
+        status, data = client.request('discover', 'GET', f'/api/users/?page={page}')
+        if status != 200:
+            break
+        usernames.extend(user['username'] for user in data['results'])
+        if not data.get('next'):
+            break
+        page += 1
+
+    posts = []
+    for page in range(1, post_pages + 1):
+        status, data = client.request('discover', 'GET', f'/api/posts/?page={page}')
+        if status != 200:
+            break
+        posts.extend(data['results'])
+        if not data.get('next'):
+            break
+
+    if not usernames or not posts:
+        raise CommandError(
+            f'{client.base_url} has no users or posts to test with; seed it first '
+            '(python manage.py seed_data --bulk).'
+        )
+
+    by_likes = sorted(posts, key=lambda post: -post['like_count'])
+    hot = [post['id'] for post in by_likes[:hot_posts]]
+    cold = [post['id'] for post in by_likes[hot_posts:]] or hot
+    return Targets(usernames[:users], [post['id'] for post in posts], hot, cold)
+
+
+class Client:
+    """
+    One keep-alive HTTP connection with its own session cookie.
+
+    Records the latency and status of every request sent at or after
+    `measure_from` (perf_counter time), by endpoint name.
+    """
+
+    def __init__(self, base_url, timeout, measure_from=0.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise CommandError(f'Not an http(s) URL: {base_url}')
+        self.base_url = base_url
+        self.parts = parts
+        self.timeout = timeout
+        self.measure_from = measure_from
+        self.cookies = {}
+        self.connection = None
+        self.latencies = {}
+        self.statuses = {}
+
+    def request(self, endpoint, method, path, payload=None):
+        """
+        Send one request.
+
+        Returns:
+            Tuple of (status code or exception name, decoded JSON body or None)
+        """
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        start = time.perf_counter()
+        try:
+            connection = self._connection()
+            connection.request(method, self.parts.path.rstrip('/') + path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            # The connection is unusable now; open a new one next time
+            self.close()
+            self._record(endpoint, start, type(exc).__name__)
+            return type(exc).__name__, None
+        self._record(endpoint, start, response.status)
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.headers.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        try:
+            data = json.loads(content) if content else None
+        except ValueError:
+            data = None
+        return response.status, data
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _connection(self):
+        if self.connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self.parts.scheme == 'https'
+                else http.client.HTTPConnection
+            )
+            self.connection = connection_class(
+                self.parts.hostname, self.parts.port, timeout=self.timeout
+            )
+        return self.connection
+
+    def _record(self, endpoint, start, status):
+        if start < self.measure_from:
+            return
+        if isinstance(status, int):
+            self.latencies.setdefault(endpoint, []).append((time.perf_counter() - start) * 1000)
+        self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+
+class Pacer:
+    """Hands out scenario start times at a fixed rate, shared by all workers."""
+
+    def __init__(self, rate, start):
+        self.interval = 1.0 / rate
+        self.next_start = start
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Sleep until the next slot; return how late (seconds) it was taken."""
+        with self.lock:
+            slot = self.next_start
+            self.next_start += self.interval
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+            return 0.0
+        return -delay
+
+
+class Worker:
+    """Runs scenarios as one logged-in user."""
+
+    def __init__(self, client, username, targets, mix, pacer, rng):
+        self.client = client
+        self.username = username
+        self.targets = targets
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.pacer = pacer
+        self.rng = rng
+        self.lag = []
+
+    def run(self, deadline):
+        try:
+            self.client.request('login', 'POST', '/api/users/me/', {'username': self.username})
+            while time.perf_counter() < deadline:
+                if self.pacer is not None:
+                    lag = self.pacer.wait()
+                    if time.perf_counter() >= deadline:
+                        break
+                    if time.perf_counter() >= self.client.measure_from:
+                        self.lag.append(lag * 1000)
+                scenario = self.rng.choices(self.names, self.weights)[0]
+                SCENARIOS[scenario](self.client, self.targets, self.rng)
+        finally:
+            self.client.close()
+
+
+def scenario_feed(client, targets, rng):
+    _, data = client.request('feed', 'GET', '/api/posts/')
+    for page in range(2, 2 + rng.randint(0, 2)):
+        if not data or not data.get('next'):
+            break
+        _, data = client.request('feed', 'GET', f'/api/posts/?page={page}')
+
+
+def scenario_thread(client, targets, rng):
+    post_id = rng.choice(targets.post_ids)
+    client.request('post-detail', 'GET', f'/api/posts/{post_id}/')
+    client.request('post-comments', 'GET', f'/api/comments/post/{post_id}/')
+
+
+def scenario_like_hot(client, targets, rng):
+    post_id = rng.choice(targets.hot_post_ids)
+    client.request('like-toggle-hot', 'POST', f'/api/likes/post/{post_id}/toggle/')
+
+
+def scenario_like_cold(client, targets, rng):
+    post_id = rng.choice(targets.cold_post_ids)
+    client.request('like-toggle-cold', 'POST', f'/api/likes/post/{post_id}/toggle/')
+
+
+def scenario_post(client, targets, rng):
+    client.request('post-create', 'POST', '/api/posts/', {
+        'content': f'Load test post {rng.randrange(10 ** 9)}'
+    })
+
+
+def scenario_leaderboard(client, targets, rng):
+    client.request('leaderboard', 'GET', '/api/leaderboard/')
+
+
+SCENARIOS = {
+    'feed': scenario_feed,
+    'thread': scenario_thread,
+    'like_hot': scenario_like_hot,
+    'like_cold': scenario_like_cold,
+    'post': scenario_post,
+    'leaderboard': scenario_leaderboard,
+}
+
+
+def parse_mix(value):
+    """Parse 'feed=40,thread=25' into {'feed': 40.0, 'thread': 25.0}."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(
+                f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}'
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Bad weight for {name!r}: {weight!r}')
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise CommandError('--mix needs at least one scenario with a positive weight')
+    return mix
+
+
+def build_report(workers, options, mix):
+    """Merge the workers' samples into per-endpoint and total statistics."""
+    latencies = {}
+    statuses = {}
+    for worker in workers:
+        for endpoint, values in worker.client.latencies.items():
+            latencies.setdefault(endpoint, []).extend(values)
+        for endpoint, counts in worker.client.statuses.items():
+            statuses.setdefault(endpoint, Counter()).update(counts)
+    statuses.pop('login', None)
+    latencies.pop('login', None)
+
+    duration = options['duration']
+    endpoints = {
+        endpoint: _endpoint_stats(latencies.get(endpoint, []), statuses[endpoint], duration)
+        for endpoint in sorted(statuses)
+    }
+    lag = [value for worker in workers for value in worker.lag]
+    return {
+        'meta': run_metadata(
+            url=options['url'],
+            concurrency=options['concurrency'],
+            duration=duration,
+            warmup=options['warmup'],
+            rate=options['rate'],
+            mix=mix,
+            seed=options['seed'],
+        ),
+        'totals': _endpoint_stats(
+            [value for values in latencies.values() for value in values],
+            sum(statuses.values(), Counter()),
+            duration
+        ),
+        'endpoints': endpoints,
+        'schedule_lag_ms': latency_summary(lag) if lag else None,
+    }
+
+
+def _endpoint_stats(latencies, statuses, duration):
+    requests = sum(statuses.values())
+    errors = {
+        str(status): count for status, count in statuses.items()
+        if not isinstance(status, int) or status >= 400
+    }
+    error_count = sum(errors.values())
+    return {
+        'requests': requests,
+        'rps': round(requests / duration, 1),
+        'errors': error_count,
+        'error_rate': round(error_count / requests, 4) if requests else 0.0,
+        'errors_by_status': errors,
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+def _ms(value):
+    return f'{value:>8.1f}' if value is not None else f'{"-":>8}'
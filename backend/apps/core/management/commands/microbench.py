@@ -0,0 +1,145 @@
+"""
+Management command to run the microbenchmarks in apps.core.microbench.
+
+The benchmarks run against a throwaway test database (never the
+configured one), with DEBUG off. Save a baseline on a known-good commit,
+then compare later runs against it on the same machine; the command
+exits with an error if a benchmark got slower (fastest CPU time) or
+peaked higher in memory by more than --tolerance.
+
+Examples:
+    python manage.py microbench --save-baseline microbench.json
+    python manage.py microbench --baseline microbench.json --tolerance 0.15
+    python manage.py microbench --only comment_tree,leaderboard --scales 1000,10000
+"""
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from apps.core.benchmarks import run_metadata
+from apps.core.microbench import BENCHMARKS, SCALES, compare_to_baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run microbenchmarks of hot code paths and compare them with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            help=f'Comma-separated benchmarks to run (default: all of {", ".join(BENCHMARKS)})'
+        )
+        parser.add_argument(
+            '--scales',
+            default=','.join(str(scale) for scale in SCALES),
+            help='Comma-separated fixture sizes'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per benchmark'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Compare with the results stored in this file'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed slowdown / memory growth over the baseline (0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            help='Write the results to this file'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON'
+        )
+
+    def handle(self, *args, **options):
+        names = list(BENCHMARKS)
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',') if name.strip()]
+            unknown = [name for name in names if name not in BENCHMARKS]
+            if unknown:
+                raise CommandError(
+                    f'Unknown benchmark(s) {", ".join(unknown)}; choose from {", ".join(BENCHMARKS)}'
+                )
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError('--scales must be comma-separated integers')
+        if options['repeat'] < 1 or any(scale < 1 for scale in scales):
+            raise CommandError('--repeat and --scales must be positive')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+
+        log = self.stderr.write if options['json'] else self.stdout.write
+        uses_db = any(BENCHMARKS[name].uses_db for name in names)
+        with override_settings(DEBUG=False):
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={'default'}
+            ) if uses_db else None
+            try:
+                results = run_benchmarks(names, scales, options['repeat'], log=log)
+                vendor = connection.vendor
+            finally:
+                if old_config is not None:
+                    teardown_databases(old_config, verbosity=0)
+
+        report = {
+            'meta': run_metadata(database=vendor, repeat=options['repeat'], scales=scales),
+            'results': results,
+        }
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(report, indent=2))
+
+        regressions = []
+        if baseline is not None:
+            regressions = compare_to_baseline(results, baseline, options['tolerance'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_results(results, baseline)
+
+        if regressions:
+            for key, metric, before, after in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f'{key}: {metric} {before} -> {after} '
+                    f'(+{(after - before) / before * 100 if before else float("inf"):.0f}%)'
+                ))
+            raise CommandError(
+                f'{len(regressions)} regression(s) beyond {options["tolerance"]:.0%} tolerance'
+            )
+        if baseline is not None:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def _print_results(self, results, baseline):
+        self.stdout.write(
+            f"{'benchmark':<20} {'scale':>7} {'cpu min':>10} {'median':>10} "
+            f"{'peak KiB':>10} {'kept KiB':>10} {'allocs':>9}"
+            + (f" {'vs base':>8}" if baseline else '')
+        )
+        for key, result in results.items():
+            line = (
+                f"{result['name']:<20} {result['scale']:>7} "
+                f"{result['cpu_ms']['min']:>10.2f} {result['cpu_ms']['median']:>10.2f} "
+                f"{result['peak_kib']:>10.1f} {result['retained_kib']:>10.1f} "
+                f"{result.get('allocations', 0):>9}"
+            )
+            previous = (baseline or {}).get(key)
+            if previous and previous['cpu_ms']['min']:
+                change = result['cpu_ms']['min'] / previous['cpu_ms']['min'] - 1
+                line += f' {change:>+8.0%}'
+            self.stdout.write(line)
+        self.stdout.write('(CPU times in ms)')
@@ -0,0 +1,332 @@
+"""
+Prometheus-style metrics without an external collector.
+
+Each process keeps its counters and histograms in memory and periodically
+writes them to its own JSON file in METRICS_DIR, and once more when it
+exits (e.g. a gunicorn worker recycled after max_requests). The /metrics endpoint
+merges every file in that directory, so the numbers add up across all
+gunicorn workers on the host. When a worker exits, the next scrape folds
+its file into metrics-exited.json and deletes it, so counters stay
+monotonic across worker restarts while the directory holds one file per
+live worker plus one. Clear the directory when the server (not a
+worker) restarts.
+
+/metrics requires METRICS_TOKEN (sent as a bearer token); without one
+configured, every request is refused.
+
+Usage:
+    from apps.core.metrics import registry
+
+    registry.inc('cache_requests_total', {'tier': 'local', 'result': 'hit'})
+    registry.observe('http_request_duration_seconds', 0.042, {'view': 'leaderboard'})
+"""
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are left in place
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Samples of exited workers, merged; also lists the files folded into it
+EXITED_FILE = 'metrics-exited.json'
+MAX_FOLDED_NAMES = 1000
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests served, by URL name, method and status class.', None
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Request latency in seconds, by URL name.', LATENCY_BUCKETS
+    ),
+    'db_queries_per_request': (
+        'histogram', 'Database queries executed per request, by URL name.', QUERY_COUNT_BUCKETS
+    ),
+    'db_time_seconds': (
+        'histogram', 'Time spent in the database per request, by URL name.', LATENCY_BUCKETS
+    ),
+    'query_budget_exceeded_total': (
+        'counter', 'Requests that ran more queries than their view\'s query_budget.', None
+    ),
+    'cache_requests_total': (
+        'counter', 'Cache lookups, by tier and result (hit/miss).', None
+    ),
+    'log_records_dropped_total': (
+        'counter', 'Log records dropped because the logging queue was full, by logger.', None
+    ),
+    'outbox_events_processed_total': (
+        'counter', 'Outbox events applied by the consumer, by event type.', None
+    ),
+    'outbox_events_failed_total': (
+        'counter', 'Outbox event handler failures, by event type.', None
+    ),
+    'outbox_dead_events_total': (
+        'counter', 'Outbox events that used up their attempts and block the outbox, by event type.', None
+    ),
+    'jobs_processed_total': (
+        'counter', 'Background jobs run, by task and outcome (done/retried/failed).', None
+    ),
+    'job_duration_seconds': (
+        'histogram', 'Background job run time in seconds, by task.', LATENCY_BUCKETS
+    ),
+}
+
+
+class MetricsRegistry:
+    """
+    In-process metric storage.
+
+    Samples are keyed by metric name and a rendered label string
+    ('view="leaderboard",method="GET"'), which is also the Prometheus
+    output format, so merging files is a plain sum.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self._flush_at_exit)
+
+    def _reset(self):
+        self._counters = {}
+        self._histograms = {}
+        # Samples recorded since the last flush
+        self._dirty = False
+        self._last_flush = 0.0
+        self._pid = os.getpid()
+        # pid plus start time, so a recycled pid never overwrites a dead worker's file
+        self._file_name = f'metrics-{self._pid}-{int(time.time() * 1000)}.json'
+
+    def inc(self, name, labels=None, value=1):
+        key = _render_labels(labels)
+        with self._lock:
+            samples = self._counters.setdefault(name, {})
+            samples[key] = samples.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, value, labels=None):
+        buckets = METRICS[name][2]
+        key = _render_labels(labels)
+        with self._lock:
+            samples = self._histograms.setdefault(name, {})
+            # [count per bucket..., +Inf count, sum]
+            sample = samples.get(key)
+            if sample is None:
+                sample = samples[key] = [0] * (len(buckets) + 1) + [0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    sample[index] += 1
+                    break
+            else:
+                sample[len(buckets)] += 1
+            sample[-1] += value
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {name: dict(samples) for name, samples in self._counters.items()},
+                'histograms': {
+                    name: {key: list(sample) for key, sample in samples.items()}
+                    for name, samples in self._histograms.items()
+                },
+            }
+
+    def flush(self, force=False):
+        """Write this process's samples to METRICS_DIR (at most every METRICS_FLUSH_INTERVAL)."""
+        if os.getpid() != self._pid:
+            # Forked after import (gunicorn --preload): start a file of our own
+            with self._lock:
+                self._reset()
+
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / self._file_name
+        partial_path = path.with_name(path.name + '.partial')
+        with self._lock:
+            self._dirty = False
+        partial_path.write_text(json.dumps(self.snapshot()))
+        os.replace(partial_path, path)
+
+    def _flush_at_exit(self):
+        # An idle or recycled worker would otherwise take its last
+        # METRICS_FLUSH_INTERVAL of samples with it
+        if self._dirty and os.getpid() == self._pid:
+            self.flush(force=True)
+
+
+registry = MetricsRegistry()
+
+
+def collect():
+    """Merge the samples of every process that wrote to METRICS_DIR."""
+    registry.flush(force=True)
+    directory = Path(settings.METRICS_DIR)
+    _fold_exited_workers(directory)
+
+    merged = _empty_samples()
+    for path in directory.glob('metrics-*.json'):
+        data = _read_samples(path)
+        if data is not None:
+            _merge_samples(merged, data)
+    return merged
+
+
+def _fold_exited_workers(directory):
+    """Move the samples of workers that are no longer running into EXITED_FILE."""
+    if fcntl is None:
+        return
+    with open(directory / '.lock', 'w') as lock:
+        # One scraping worker at a time, or two could fold the same file
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited_path = directory / EXITED_FILE
+        exited = _read_samples(exited_path) or _empty_samples()
+        folded = exited.setdefault('folded', [])
+
+        paths = [path for path in directory.glob('metrics-*-*.json') if not _is_running(path)]
+        if not paths:
+            return
+        for path in paths:
+            # A name listed here was merged before a crash left the file behind
+            if path.name not in folded:
+                data = _read_samples(path)
+                if data is None:
+                    continue
+                _merge_samples(exited, data)
+                folded.append(path.name)
+        del folded[:-MAX_FOLDED_NAMES]
+
+        partial_path = exited_path.with_name(exited_path.name + '.partial')
+        partial_path.write_text(json.dumps(exited))
+        os.replace(partial_path, exited_path)
+        for path in paths:
+            if path.name in folded:
+                path.unlink(missing_ok=True)
+
+
+def _is_running(path):
+    """Whether the worker that writes `path` (metrics-<pid>-<started>.json) is alive."""
+    try:
+        pid = int(path.name.split('-')[1])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_samples(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None  # missing, or being replaced right now
+
+
+def _empty_samples():
+    return {'counters': {}, 'histograms': {}}
+
+
+def _merge_samples(merged, data):
+    for name, samples in data['counters'].items():
+        target = merged['counters'].setdefault(name, {})
+        for key, value in samples.items():
+            target[key] = target.get(key, 0) + value
+
+    for name, samples in data['histograms'].items():
+        target = merged['histograms'].setdefault(name, {})
+        for key, sample in samples.items():
+            if key in target:
+                target[key] = [a + b for a, b in zip(target[key], sample)]
+            else:
+                target[key] = list(sample)
+
+
+def render_prometheus(merged):
+    """Render merged samples in the Prometheus text exposition format."""
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        if metric_type == 'counter':
+            samples = merged['counters'].get(name)
+        else:
+            samples = merged['histograms'].get(name)
+        if not samples:
+            continue
+
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for key in sorted(samples):
+            if metric_type == 'counter':
+                lines.append(f'{name}{_braces(key)} {_number(samples[key])}')
+                continue
+
+            sample = samples[key]
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), sample[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_braces(key + "," + le if key else le)} {cumulative}')
+            lines.append(f'{name}_sum{_braces(key)} {_number(sample[-1])}')
+            lines.append(f'{name}_count{_braces(key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Expose the merged metrics of all local worker processes.
+
+    GET /metrics
+
+    Requests must send `Authorization: Bearer <METRICS_TOKEN>`; with no
+    token configured the endpoint is closed.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def _render_labels(labels):
+    if not labels:
+        return ''
+    return ','.join(
+        f'{name}="{_escape(value)}"'
+        for name, value in sorted(labels.items())
+    )
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _braces(key):
+    return f'{{{key}}}' if key else ''
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
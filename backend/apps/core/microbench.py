@@ -0,0 +1,306 @@
+"""
+Microbenchmarks for hot Python paths.
+
+Each benchmark is a setup function registered with @benchmark. Given a
+scale (1k/10k/100k by default) it builds a fixed fixture and returns the
+callable to measure. The same scale always builds the same fixture:
+
+- comment_tree, flat_comments, post_serializer, comment_serializer run
+  over unsaved model instances built in memory, so they measure Python
+  and DRF code only. comment_tree is only run up to the scale where a
+  run still takes seconds (max_scale)
+- leaderboard and like_toggle run against a throwaway test database
+  seeded with `scale` likes by the bulk seeder
+
+Every benchmark is timed `repeat` times (CPU time and wall time), then
+run once more under tracemalloc for peak and retained memory and the
+number of memory blocks it allocated. Results can
+be saved as a baseline and later runs compared against it; see the
+microbench command.
+"""
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.management import call_command
+from django.test import RequestFactory
+from apps.comments.models import Comment
+from apps.comments.serializers import CommentSerializer
+from apps.comments.utils import build_comment_tree, get_flat_comment_list
+from apps.posts.models import Post
+from apps.posts.serializers import PostSerializer
+from apps.users.models import User
+
+SCALES = (1000, 10000, 100000)
+
+# name -> Benchmark
+BENCHMARKS = {}
+
+# Differences below these are noise, whatever the relative change
+MIN_CPU_DELTA_MS = 0.5
+MIN_MEMORY_DELTA_KIB = 64
+MIN_ALLOCATIONS_DELTA = 1000
+
+FIXTURE_START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Benchmark:
+    """A registered benchmark: its setup function and where it applies."""
+
+    def __init__(self, name, setup, uses_db=False, max_scale=None):
+        self.name = name
+        self.setup = setup
+        self.uses_db = uses_db
+        self.max_scale = max_scale
+        self.description = (setup.__doc__ or '').strip()
+
+
+def benchmark(name, uses_db=False, max_scale=None):
+    """Register `setup(scale) -> callable` as a benchmark."""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, uses_db, max_scale)
+        return setup
+    return register
+
+
+def measure(func, repeat):
+    """
+    Time `func` and measure its memory use.
+
+    Returns:
+        Dict with cpu_ms and wall_ms ({'min', 'median'}), peak_kib (highest
+        traced memory during the call), retained_kib (still allocated
+        after it, i.e. the result and anything cached) and allocations
+        (memory blocks allocated by the call and not freed by its end, from
+        tracemalloc snapshots; CPython keeps no count of blocks allocated
+        and freed in between)
+    """
+    cpu, wall = [], []
+    for _ in range(repeat):
+        gc.collect()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        func()
+        cpu.append((time.process_time() - cpu_start) * 1000)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        blocks_before = _traced_blocks()
+        result = func()  # noqa: F841 - kept alive so it counts as retained
+        retained, peak = tracemalloc.get_traced_memory()
+        blocks_after = _traced_blocks()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'cpu_ms': _spread(cpu),
+        'wall_ms': _spread(wall),
+        'peak_kib': round(peak / 1024, 1),
+        'retained_kib': round(retained / 1024, 1),
+        'allocations': max(blocks_after - blocks_before, 0),
+    }
+
+
+def _traced_blocks():
+    return sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+
+
+def run_benchmarks(names, scales, repeat=3, log=None):
+    """
+    Run the named benchmarks at every scale they support.
+
+    Database benchmarks need a database they may fill; the microbench
+    command provides a throwaway test database.
+
+    Returns:
+        Dict of '<name>@<scale>' -> result of measure()
+    """
+    log = log or (lambda message: None)
+    selected = [BENCHMARKS[name] for name in names]
+    results = {}
+    for scale in scales:
+        runnable = [bench for bench in selected if not bench.max_scale or scale <= bench.max_scale]
+        if any(bench.uses_db for bench in runnable):
+            log(f'Seeding the database for scale {scale}...')
+            seed_database(scale)
+        for bench in runnable:
+            log(f'{bench.name} @ {scale}')
+            results[f'{bench.name}@{scale}'] = {
+                'name': bench.name,
+                'scale': scale,
+                **measure(bench.setup(scale), repeat),
+            }
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Find results that got worse than the baseline by more than `tolerance`.
+
+    CPU time is compared on the fastest run, which is the least noisy;
+    memory on peak usage and allocated blocks. Changes below
+    MIN_CPU_DELTA_MS / MIN_MEMORY_DELTA_KIB / MIN_ALLOCATIONS_DELTA are
+    ignored, as are metrics missing from an older baseline.
+
+    Returns:
+        List of (key, metric, baseline value, current value)
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        checks = (
+            ('cpu_ms', previous['cpu_ms']['min'], result['cpu_ms']['min'], MIN_CPU_DELTA_MS),
+            ('peak_kib', previous['peak_kib'], result['peak_kib'], MIN_MEMORY_DELTA_KIB),
+            (
+                'allocations', previous.get('allocations'), result.get('allocations'),
+                MIN_ALLOCATIONS_DELTA
+            ),
+        )
+        for metric, before, after, min_delta in checks:
+            if before is None or after is None:
+                continue
+            if after - before > max(before * tolerance, min_delta):
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+def seed_database(scale):
+    """Replace the database contents with the fixture for `scale`."""
+    # Imported here: the seeder pulls in NumPy, which the in-memory benchmarks do not need
+    from apps.users.bulk_seed import BulkSeeder
+
+    call_command('flush', interactive=False, verbosity=0)
+    BulkSeeder(
+        users=max(100, scale // 50),
+        posts=max(10, scale // 20),
+        comments=0,
+        post_likes=scale,
+        comment_likes=0,
+        days=1,
+        seed=scale,
+    ).run()
+
+
+# One serializer per comment: 100k comments take minutes and gigabytes per run
+@benchmark('comment_tree', max_scale=10000)
+def bench_comment_tree(scale):
+    """build_comment_tree over one post with `scale` comments."""
+    comments = _comment_fixture(scale)
+    context = _serializer_context()
+    return lambda: build_comment_tree(comments, CommentSerializer, context)
+
+
+@benchmark('flat_comments')
+def bench_flat_comments(scale):
+    """get_flat_comment_list over one post with `scale` comments."""
+    comments = _comment_fixture(scale)
+    context = _serializer_context()
+    return lambda: get_flat_comment_list(comments, CommentSerializer, context)
+
+
+@benchmark('post_serializer')
+def bench_post_serializer(scale):
+    """PostSerializer(many=True) over `scale` posts."""
+    rng = random.Random(scale)
+    authors = _user_fixture(100)
+    posts = []
+    for index in range(scale):
+        created = FIXTURE_START + timedelta(seconds=index)
+        post = Post(
+            id=index + 1,
+            author=authors[index % len(authors)],
+            content=f'Benchmark post {index}',
+            like_count=rng.randrange(100),
+            created_at=created,
+            updated_at=created,
+        )
+        post.comment_count_annotated = rng.randrange(20)
+        post.prefetched_likes = []
+        posts.append(post)
+    context = _serializer_context()
+    return lambda: PostSerializer(posts, many=True, context=context).data
+
+
+@benchmark('comment_serializer')
+def bench_comment_serializer(scale):
+    """CommentSerializer(many=True) over `scale` comments, without nesting."""
+    comments = _comment_fixture(scale)
+    for comment in comments:
+        comment._replies_data = []
+        comment._reply_count = 0
+    context = _serializer_context()
+    return lambda: CommentSerializer(comments, many=True, context=context).data
+
+
+@benchmark('leaderboard', uses_db=True)
+def bench_leaderboard(scale):
+    """get_leaderboard over `scale` karma transactions from the last 24 hours."""
+    from apps.leaderboard.services import get_leaderboard
+    return get_leaderboard
+
+
+@benchmark('like_toggle', uses_db=True)
+def bench_like_toggle(scale):
+    """100 like + unlike pairs through toggle_post_like, with `scale` likes in the table."""
+    from apps.likes.services import toggle_post_like
+
+    rng = random.Random(scale)
+    users = list(User.objects.order_by('id')[:200])
+    post_ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+    pairs = [(rng.choice(users), rng.choice(post_ids)) for _ in range(100)]
+
+    def toggle_pairs():
+        # Toggling twice leaves the fixture as it was
+        for user, post_id in pairs:
+            toggle_post_like(user, post_id)
+            toggle_post_like(user, post_id)
+    return toggle_pairs
+
+
+def _user_fixture(count):
+    return [User(id=index + 1, username=f'bench_user_{index + 1}') for index in range(count)]
+
+
+def _comment_fixture(scale):
+    """`scale` comments on one post, with reply chains like the bulk seeder's."""
+    rng = random.Random(scale)
+    authors = _user_fixture(100)
+    comments = []
+    for index in range(scale):
+        parent = None
+        if comments and rng.random() >= 0.3:
+            parent = comments[-1] if rng.random() < 0.7 else rng.choice(comments)
+            if parent.depth >= 32:
+                parent = None
+        created = FIXTURE_START + timedelta(seconds=index)
+        comment = Comment(
+            id=index + 1,
+            post_id=1,
+            author=authors[index % len(authors)],
+            parent_id=parent.id if parent else None,
+            depth=parent.depth + 1 if parent else 0,
+            content=f'Benchmark comment {index}',
+            like_count=rng.randrange(10),
+            created_at=created,
+            updated_at=created,
+        )
+        comment.prefetched_likes = []
+        comments.append(comment)
+    return comments
+
+
+def _serializer_context():
+    """A request from a logged-in user, as the views pass to serializers."""
+    request = RequestFactory().get('/')
+    request.session = {'user_id': 1}
+    return {'request': request}
+
+
+def _spread(values):
+    return {'min': round(min(values), 3), 'median': round(statistics.median(values), 3)}
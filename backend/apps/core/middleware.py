@@ -0,0 +1,351 @@
+"""
+Request instrumentation middleware.
+
+Everything except the sampling profiler works natively in both sync
+(WSGI) and async (ASGI) middleware chains, so async views are not
+forced through a thread per middleware.
+"""
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from .compression import choose_encoding, compress_body, should_compress
+from .budgets import check_query_budget
+from .instrumentation import request_stats
+from .log import current_request_context, new_request_id
+from .metrics import registry
+from .profiling import StackSampler, should_profile, write_collapsed
+from .routers import replica_reads_allowed, view_allows_replica_reads
+from .query_profile import build_profile, is_staff_user, store_profile, wants_profile
+
+
+class HybridMiddleware:
+    """
+    Base for middleware usable in both sync and async chains.
+
+    Subclasses implement handle(request) and ahandle(request); the one
+    matching the chain Django built is used.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
+
+
+class RequestIdMiddleware(HybridMiddleware):
+    """
+    Give every request an id, available to log records and echoed back.
+
+    Reuses a sane incoming X-Request-ID header (e.g. set by the load
+    balancer) so logs can be correlated across services. Place first in
+    MIDDLEWARE so every log line of the request carries the id.
+    """
+
+    def handle(self, request):
+        request_id, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_context.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def ahandle(self, request):
+        request_id, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_context.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    def start(self, request):
+        request_id = new_request_id(request.headers.get('X-Request-ID'))
+        request.request_id = request_id
+        return request_id, current_request_context.set((request_id, request))
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Record request count, latency, DB query count and DB time per URL name.
+
+    Should be placed first in MIDDLEWARE so the latency covers the
+    whole stack. Queries are counted by the execute wrapper installed
+    on every connection (see instrumentation.py). With QUERY_BUDGET_LOG
+    enabled, requests over their view's query_budget are logged.
+    """
+
+    def handle(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        with request_stats() as stats:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - start
+
+        self.record(request, response, stats, duration)
+        return response
+
+    async def ahandle(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        with request_stats() as stats:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            duration = time.perf_counter() - start
+
+        self.record(request, response, stats, duration)
+        return response
+
+    def record(self, request, response, stats, duration):
+        view = _view_name(request)
+        registry.inc('http_requests_total', {
+            'view': view,
+            'method': request.method,
+            'status': f'{response.status_code // 100}xx',
+        })
+        labels = {'view': view}
+        registry.observe('http_request_duration_seconds', duration, labels)
+        registry.observe('db_queries_per_request', stats.queries, labels)
+        registry.observe('db_time_seconds', stats.db_time, labels)
+        # Profiled requests run extra queries (the staff check), so skip their budget
+        if (settings.QUERY_BUDGET_LOG and not wants_profile(request)
+                and check_query_budget(request, view, stats.queries)):
+            registry.inc('query_budget_exceeded_total', labels)
+        registry.flush()
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """
+    Add a Server-Timing header (db, serialize, app, total) when SERVER_TIMING is on.
+
+    Place right after MetricsMiddleware. 'serialize' is the time spent in
+    TimedJSONRenderer and 'app' is everything else outside the database.
+    """
+
+    def handle(self, request):
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+
+        with request_stats() as stats:
+            before = (stats.db_time, stats.queries, stats.render_time)
+            start = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - start
+
+        self.add_header(response, stats, before, total)
+        return response
+
+    async def ahandle(self, request):
+        if not settings.SERVER_TIMING:
+            return await self.get_response(request)
+
+        with request_stats() as stats:
+            before = (stats.db_time, stats.queries, stats.render_time)
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            total = time.perf_counter() - start
+
+        self.add_header(response, stats, before, total)
+        return response
+
+    def add_header(self, response, stats, before, total):
+        db_before, queries_before, render_before = before
+        db = stats.db_time - db_before
+        queries = stats.queries - queries_before
+        serialize = stats.render_time - render_before
+        app = max(total - db - serialize, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db * 1000:.2f};desc="{queries} queries"',
+            f'serialize;dur={serialize * 1000:.2f}',
+            f'app;dur={app * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compress large JSON/text responses with gzip, brotli or zstd.
+
+    Place after ServerTimingMiddleware and before anything that reads or
+    changes the body. See compression.py.
+    """
+
+    def handle(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def ahandle(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if not settings.COMPRESS_ENABLED or not should_compress(response):
+            return response
+
+        # The representation depends on Accept-Encoding even if we end up not compressing
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        compressed = compress_body(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Same semantics, different bytes: a strong ETag must not be reused
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class ProfileMiddleware(HybridMiddleware):
+    """
+    Record every SQL statement of requests that ask for a profile.
+
+    Only staff users (Django auth) can profile; for anyone else the switch is ignored.
+    Must come after SessionMiddleware and AuthenticationMiddleware.
+    See query_profile.py.
+    """
+
+    def handle(self, request):
+        if not wants_profile(request) or not is_staff_user(request):
+            return self.get_response(request)
+
+        with request_stats() as stats:
+            stats.query_log = []
+            start = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                query_log, stats.query_log = stats.query_log, None
+            total = time.perf_counter() - start
+
+        response['X-Profile-Id'] = store_profile(build_profile(request, query_log, total))
+        return response
+
+    async def ahandle(self, request):
+        if not wants_profile(request) or not await sync_to_async(is_staff_user)(request):
+            return await self.get_response(request)
+
+        with request_stats() as stats:
+            stats.query_log = []
+            start = time.perf_counter()
+            try:
+                response = await self.get_response(request)
+            finally:
+                query_log, stats.query_log = stats.query_log, None
+            total = time.perf_counter() - start
+
+        profile = build_profile(request, query_log, total)
+        response['X-Profile-Id'] = await sync_to_async(store_profile)(profile)
+        return response
+
+
+class SamplingProfilerMiddleware(HybridMiddleware):
+    """
+    Sample the Python stack of selected requests into flame-graph files.
+
+    Place right after MetricsMiddleware so the samples cover the whole
+    stack. See profiling.py for how requests are selected.
+
+    Only sync (WSGI) requests are sampled: under ASGI the event loop
+    thread interleaves many requests, so its stack is not one request's.
+    """
+
+    def handle(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        write_collapsed(stacks, _view_name(request), time.perf_counter() - start)
+        return response
+
+    async def ahandle(self, request):
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Allow replica reads for safe requests to views with `replica_reads = True`.
+
+    Clients that made a write request within REPLICA_STICKY_SECONDS carry
+    the REPLICA_PIN_COOKIE and keep reading from the primary. See
+    routers.py.
+    """
+
+    def handle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        token = replica_reads_allowed.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads_allowed.reset(token)
+
+        self.pin_writer(request, response)
+        return response
+
+    async def ahandle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        token = replica_reads_allowed.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads_allowed.reset(token)
+
+        self.pin_writer(request, response)
+        return response
+
+    def pin_writer(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and settings.REPLICA_STICKY_SECONDS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+                and view_allows_replica_reads(view_func)):
+            replica_reads_allowed.set(True)
+
+
+def _view_name(request):
+    """The resolved URL name, e.g. 'post-list-create', or a fallback for unnamed routes."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
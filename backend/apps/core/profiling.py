@@ -0,0 +1,128 @@
+"""
+In-process sampling profiler with flame-graph output.
+
+For intermittent latency spikes that never show up locally. While a
+request is being profiled, a background thread looks at the request
+thread's Python stack every PROFILER_INTERVAL seconds and counts each
+distinct stack. When the request finishes, the counts are written to
+PROFILER_DIR in the "collapsed stack" format read by flamegraph.pl,
+speedscope and inferno:
+
+    post-detail;apps.posts.views:PostDetailView.retrieve;... 12
+
+The first frame of every stack is the URL name, so files from different
+views can be concatenated into one flame graph and still be told apart.
+
+A request is profiled if it sends `X-Sample-Profile: <PROFILER_TOKEN>`
+(only when a token is configured) or falls into the random
+PROFILER_SAMPLE_RATE fraction. Requests that are not profiled pay one
+header lookup and one random() call. Each view keeps its newest
+PROFILER_MAX_FILES files; older ones are deleted as new ones are written.
+"""
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+
+MAX_STACK_DEPTH = 128
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread from a background thread.
+
+    Usage:
+        sampler = StackSampler(threading.get_ident(), interval=0.005)
+        sampler.start()
+        ...  # work on the sampled thread
+        stacks = sampler.stop()  # Counter of collapsed stack -> samples
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[collapse_stack(frame)] += 1
+            del frame
+
+
+def collapse_stack(frame):
+    """Render a frame's stack root-first as 'module:func;module:func'."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{getattr(code, "co_qualname", code.co_name)}')
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+def should_profile(request):
+    header = request.headers.get('X-Sample-Profile')
+    token = settings.PROFILER_TOKEN
+    if header is not None and token and hmac.compare_digest(header.encode(), token.encode()):
+        return True
+    rate = settings.PROFILER_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def write_collapsed(stacks, tag, duration):
+    """
+    Write stacks to PROFILER_DIR/<tag>/ as a collapsed-stack file.
+
+    Returns:
+        Path of the file, or None if no samples were taken
+    """
+    if not stacks:
+        return None
+
+    directory = Path(settings.PROFILER_DIR) / tag
+    directory.mkdir(parents=True, exist_ok=True)
+    # Duration first, so `ls` sorts the slowest requests together
+    name = f'{int(duration * 1000):07d}ms-{int(time.time() * 1000)}-{os.getpid()}.collapsed'
+    path = directory / name
+    path.write_text(''.join(
+        f'{tag};{stack} {count}\n' for stack, count in stacks.most_common()
+    ))
+    _prune(directory, settings.PROFILER_MAX_FILES)
+    return path
+
+
+def _prune(directory, keep):
+    """Delete all but the `keep` newest collapsed-stack files in `directory`."""
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.collapsed'):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    files.sort(reverse=True)
+    for _, stale in files[keep:]:
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
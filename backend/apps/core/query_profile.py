@@ -0,0 +1,92 @@
+"""
+Opt-in per-request SQL profiles.
+
+A staff user (logged in with Django auth) can ask for a profile of any request with `?_profile=1`
+or the `X-Profile: 1` header. ProfileMiddleware then keeps every query
+the request runs (SQL, parameters, duration and the project code that
+issued it), stores the resulting profile in the cache, and returns its id
+in the `X-Profile-Id` response header. Fetch it from /api/profile/<id>/.
+
+This replaces turning on DEBUG to see queries, which logs every query of
+every request.
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+PROFILE_CACHE_PREFIX = 'profile:'
+MAX_PARAMS_LENGTH = 200
+
+
+def wants_profile(request):
+    return request.GET.get('_profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def is_staff_user(request):
+    """
+    Whether the request is authenticated (Django auth) as a staff user.
+
+    The demo session (`session['user_id']`) is not enough: /api/users/me/
+    logs anyone in by username alone, and profiles include query parameters.
+    """
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and user.is_staff
+
+
+def build_profile(request, query_log, total_time):
+    """
+    Turn a request's query log into a JSON-serializable profile.
+
+    Queries with identical SQL (only the parameters differ) are reported
+    under 'duplicates', which is what an N+1 looks like.
+    """
+    queries = []
+    by_sql = {}
+    for sql, params, duration, call_site in query_log:
+        queries.append({
+            'sql': sql,
+            'params': _format_params(params),
+            'duration_ms': round(duration * 1000, 3),
+            'call_site': call_site,
+        })
+        group = by_sql.setdefault(sql, {'sql': sql, 'count': 0, 'duration_ms': 0.0, 'call_sites': []})
+        group['count'] += 1
+        group['duration_ms'] += duration * 1000
+        if call_site and call_site not in group['call_sites']:
+            group['call_sites'].append(call_site)
+
+    duplicates = sorted(
+        (group for group in by_sql.values() if group['count'] > 1),
+        key=lambda group: group['count'],
+        reverse=True
+    )
+    for group in duplicates:
+        group['duration_ms'] = round(group['duration_ms'], 3)
+
+    return {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'total_ms': round(total_time * 1000, 3),
+        'query_count': len(queries),
+        'db_ms': round(sum(query['duration_ms'] for query in queries), 3),
+        'queries': queries,
+        'duplicates': duplicates,
+    }
+
+
+def store_profile(profile):
+    """Cache a profile for PROFILE_TTL seconds and return its id."""
+    profile_id = uuid.uuid4().hex
+    cache.set(PROFILE_CACHE_PREFIX + profile_id, profile, settings.PROFILE_TTL)
+    return profile_id
+
+
+def load_profile(profile_id):
+    return cache.get(PROFILE_CACHE_PREFIX + profile_id)
+
+
+def _format_params(params):
+    text = repr(params)
+    if len(text) > MAX_PARAMS_LENGTH:
+        text = text[:MAX_PARAMS_LENGTH] + '...'
+    return text
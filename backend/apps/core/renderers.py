@@ -0,0 +1,20 @@
+import time
+from rest_framework.renderers import JSONRenderer
+from .instrumentation import current_request_stats
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that records how long rendering took.
+
+    The time is reported as the 'serialize' entry of the Server-Timing header.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.render_time += time.perf_counter() - start
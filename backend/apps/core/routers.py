@@ -0,0 +1,65 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Views opt in to replica reads with a class attribute:
+
+    class LeaderboardView(APIView):
+        replica_reads = True
+
+For GET/HEAD requests to such views, ReplicaRoutingMiddleware lets
+ReplicaRouter send reads to a random alias in DATABASE_REPLICAS. Every
+other read, every write, and every query inside a transaction on the
+primary (so select_for_update in apps/likes/services.py) goes to
+'default'.
+
+After a write request the client gets a short-lived cookie that pins it
+to the primary for REPLICA_STICKY_SECONDS, so users see their own like
+or comment even while the replicas lag behind.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# True while the current request may read from replicas
+replica_reads_allowed = ContextVar('replica_reads_allowed', default=False)
+
+
+class ReplicaRouter:
+    """Send opted-in reads to a replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not replica_reads_allowed.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a write transaction must see its own changes
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Force every read in the block to the primary."""
+    token = replica_reads_allowed.set(False)
+    try:
+        yield
+    finally:
+        replica_reads_allowed.reset(token)
+
+
+def view_allows_replica_reads(view_func):
+    # DRF's as_view() sets .cls, Django's sets .view_class
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'replica_reads', False)
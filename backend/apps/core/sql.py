@@ -0,0 +1,60 @@
+"""
+Query helpers for statements the ORM cannot express.
+"""
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import connections, router
+
+
+def supports_returning(connection):
+    """Whether the database has DELETE ... RETURNING (PostgreSQL, SQLite 3.35+)."""
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def delete_returning(queryset, *fields):
+    """
+    Delete the rows matched by `queryset` and return the given fields of each.
+
+    One DELETE ... RETURNING statement where the database supports it,
+    else a SELECT followed by a DELETE by primary key. Like
+    QuerySet.update(), it sends no signals and runs no Python-side
+    cascades, so only use it on models nothing references.
+
+    Returns:
+        List of tuples, one per deleted row, with the values of `fields`
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    connection = connections[using]
+
+    if not supports_returning(connection):
+        rows = list(queryset.using(using).values_list('pk', *fields))
+        model._base_manager.using(using).filter(pk__in=[row[0] for row in rows]).delete()
+        return [row[1:] for row in rows]
+
+    query = queryset.query
+    where, params = query.get_compiler(using).compile(query.where)
+    model_fields = [model._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} RETURNING {}'.format(
+        quote(model._meta.db_table),
+        where,
+        ', '.join(quote(field.column) for field in model_fields)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        tuple(_to_python(field, value) for field, value in zip(model_fields, row))
+        for row in rows
+    ]
+
+
+def _to_python(field, value):
+    # Raw cursors skip the backend's converters (SQLite returns datetimes as text)
+    value = field.to_python(value)
+    if isinstance(value, datetime) and settings.USE_TZ and value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
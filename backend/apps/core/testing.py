@@ -0,0 +1,77 @@
+"""
+Test helpers: the project's test runner and per-view query budget checks.
+"""
+import copy
+import shutil
+import tempfile
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from .budgets import get_query_budget
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that gives the test run its own shared file cache.
+
+    Without it, tests and a running dev server would read and invalidate
+    each other's entries in CACHE_SHARED_LOCATION.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = None
+        self._cache_override = None
+        shared = settings.CACHES.get('shared', {})
+        if shared.get('BACKEND') != 'django.core.cache.backends.filebased.FileBasedCache':
+            return
+        self._cache_dir = tempfile.mkdtemp(prefix='community-feed-test-cache-')
+        caches_setting = copy.deepcopy(settings.CACHES)
+        caches_setting['shared']['LOCATION'] = self._cache_dir
+        self._cache_override = override_settings(CACHES=caches_setting)
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        if self._cache_override is not None:
+            self._cache_override.disable()
+            shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that fails when a view's query count grows with data size.
+
+    Usage:
+        self.assertQueryBudget('/api/posts/', self.add_posts, sizes=(1, 10, 40))
+
+    `seed(n)` is called before each measurement to add n more rows; the
+    request must run the same number of queries at every size, and no
+    more than the view's declared query_budget.
+    """
+
+    def assertQueryBudget(self, path, seed, sizes=(1, 10, 40)):
+        match = resolve(urlsplit(path).path)
+        budget = get_query_budget(match)
+        self.assertIsNotNone(budget, f'{match.view_name} declares no query_budget')
+
+        counts = []
+        for size in sizes:
+            seed(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            counts.append(len(queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'{path} query count grows with data size: {dict(zip(sizes, counts))}'
+        )
+        self.assertLessEqual(
+            counts[0], budget,
+            f'{path} ran {counts[0]} queries, budget is {budget}'
+        )
+        return counts[0]
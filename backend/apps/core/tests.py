@@ -0,0 +1,771 @@
+"""
+Tests for request instrumentation, the metrics endpoint, query budgets,
+profiling, replica routing, the tiered cache, the async views, logging,
+compression and the load-test and microbenchmark tools.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import resolve
+from django.utils import timezone
+from apps.core.budgets import check_query_budget
+from apps.core.cache import CacheNamespace
+from apps.core.compression import COMPRESSORS, choose_encoding, compress_body
+from apps.core.management.commands.loadtest import parse_mix
+from apps.core.microbench import compare_to_baseline, run_benchmarks
+from apps.core.log import (
+    JsonFormatter, QueueLogHandler, RequestContextFilter, SamplingFilter, current_request_context
+)
+from apps.core.metrics import collect, registry
+from apps.core.middleware import ReplicaRoutingMiddleware, SamplingProfilerMiddleware
+from apps.core.profiling import StackSampler, write_collapsed
+from apps.core.routers import ReplicaRouter, replica_reads_allowed, use_primary
+from apps.comments import views_async as comments_async
+from apps.leaderboard import views_async as leaderboard_async
+from apps.leaderboard.views import LeaderboardView
+from apps.likes.views import PostLikeToggleView
+from apps.posts import views_async as posts_async
+from apps.posts.views import PostListCreateView
+from apps.users import views_async as users_async
+from apps.core.testing import QueryBudgetMixin
+from apps.users.models import User, KarmaTransaction
+from apps.users.services import award_karma
+from apps.posts.models import Post
+from apps.comments.models import Comment
+from apps.likes.services import like_comment, like_post
+
+
+class MetricsTests(TestCase):
+    """Test per-view metrics and their aggregation across worker processes."""
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        override = override_settings(METRICS_DIR=self.metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _leaderboard_requests(self, merged):
+        key = 'method="GET",status="2xx",view="leaderboard"'
+        return merged['counters'].get('http_requests_total', {}).get(key, 0)
+
+    def test_requests_are_recorded_per_url_name(self):
+        """Test that request counts and DB query histograms are labelled by URL name."""
+        before = self._leaderboard_requests(collect())
+        
+        self.client.get('/api/leaderboard/')
+        self.client.get('/api/leaderboard/')
+        
+        merged = collect()
+        self.assertEqual(self._leaderboard_requests(merged), before + 2)
+        queries = merged['histograms']['db_queries_per_request']['view="leaderboard"']
+        self.assertGreater(queries[-1], 0)  # total queries observed
+
+    def test_metrics_merge_other_workers(self):
+        """Test that samples written by other processes are summed in /metrics."""
+        self.client.get('/api/leaderboard/')
+        before = self._leaderboard_requests(collect())
+        
+        other_worker = {
+            'counters': {
+                'http_requests_total': {'method="GET",status="2xx",view="leaderboard"': 40},
+            },
+            'histograms': {},
+        }
+        Path(self.metrics_dir, 'metrics-99999999-1.json').write_text(json.dumps(other_worker))
+        
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            f'http_requests_total{{method="GET",status="2xx",view="leaderboard"}} {before + 40}',
+            response.content.decode()
+        )
+        self.assertIn('http_request_duration_seconds_bucket', response.content.decode())
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        """Test that files of exited workers are merged away without losing counts."""
+        before = self._leaderboard_requests(collect())
+        sample = {
+            'counters': {'http_requests_total': {'method="GET",status="2xx",view="leaderboard"': 5}},
+            'histograms': {},
+        }
+        # pids above the kernel's pid_max never belong to a running process
+        for name in ('metrics-99999999-1.json', 'metrics-99999998-1.json'):
+            Path(self.metrics_dir, name).write_text(json.dumps(sample))
+        
+        self.assertEqual(self._leaderboard_requests(collect()), before + 10)
+        self.assertEqual(self._leaderboard_requests(collect()), before + 10)
+        
+        names = sorted(path.name for path in Path(self.metrics_dir).glob('metrics-*.json'))
+        self.assertEqual(len(names), 2)  # this process and the exited workers
+        self.assertIn('metrics-exited.json', names)
+
+    def test_exiting_worker_flushes_its_last_samples(self):
+        """Test that samples a worker never flushed reach /metrics after it exits."""
+        before = self._leaderboard_requests(collect())
+        script = (
+            'import django; django.setup()\n'
+            'from apps.core.metrics import registry\n'
+            'registry.inc("http_requests_total", '
+            '{"view": "leaderboard", "method": "GET", "status": "2xx"}, 3)\n'
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings', 'METRICS_DIR': self.metrics_dir}
+        subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True)
+        
+        self.assertEqual(self._leaderboard_requests(collect()), before + 3)
+        self.assertTrue(Path(self.metrics_dir, 'metrics-exited.json').exists())
+
+    def test_metrics_closed_without_token(self):
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer nope').status_code, 403)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test that read endpoints run a constant number of queries, within budget."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123'
+        )
+        self.viewer = User.objects.create_user(
+            username='viewer',
+            email='viewer@test.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.author, content='Hot post')
+        self.client.post('/api/users/me/', {'username': 'viewer'})
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.author, content=f'Post {i}')
+            Comment.objects.create(post=post, author=self.viewer, content='Nice')
+            if i % 2:
+                like_post(self.viewer, post.id)
+
+    def add_comments(self, count):
+        for i in range(count):
+            parent = Comment.objects.create(post=self.post, author=self.author, content=f'Top {i}')
+            reply = Comment.objects.create(post=self.post, parent=parent, author=self.viewer, content='Reply')
+            like_comment(self.viewer, parent.id)
+            Comment.objects.create(post=self.post, parent=reply, author=self.author, content='Deeper')
+
+    def add_karma(self, count):
+        for _ in range(count):
+            user = User.objects.create_user(username=f'earner{User.objects.count()}')
+            award_karma(user.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', user.id, actor_id=self.viewer.id)
+            award_karma(self.author.id, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE, 'comment', user.id, actor_id=user.id)
+
+    def test_feed_budget(self):
+        self.assertQueryBudget('/api/posts/', self.add_posts)
+
+    def test_post_detail_budget(self):
+        self.assertQueryBudget(f'/api/posts/{self.post.id}/', self.add_comments)
+
+    def test_comment_tree_budget(self):
+        self.assertQueryBudget(f'/api/comments/post/{self.post.id}/', self.add_comments)
+
+    def test_new_comments_budget(self):
+        path = f'/api/comments/post/{self.post.id}/?since=2000-01-01T00:00:00Z'
+        self.assertQueryBudget(path, self.add_comments)
+
+    def test_leaderboard_budget(self):
+        self.assertQueryBudget('/api/leaderboard/', self.add_karma)
+
+    def test_user_karma_budget(self):
+        self.assertQueryBudget(f'/api/leaderboard/user/{self.author.id}/', self.add_karma)
+
+    def test_user_karma_series_budget(self):
+        self.assertQueryBudget(f'/api/leaderboard/user/{self.author.id}/series/', self.add_karma)
+
+    def test_user_list_budget(self):
+        self.assertQueryBudget('/api/users/', self.add_karma)
+
+    def test_over_budget_request_is_logged(self):
+        """Test the runtime check that flags requests over their view's budget."""
+        request = RequestFactory().get('/api/leaderboard/')
+        request.resolver_match = resolve('/api/leaderboard/')
+        
+        with self.assertLogs('apps.core.budgets', level='WARNING'):
+            self.assertTrue(check_query_budget(request, 'leaderboard', 50))
+        self.assertFalse(check_query_budget(request, 'leaderboard', 2))
+
+
+class ProfilingTests(TestCase):
+    """Test the Server-Timing header and staff SQL profiles."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        for i in range(3):
+            Comment.objects.create(post=self.post, author=self.author, content=f'Comment {i}')
+
+    def login(self, username, is_staff=False):
+        self.client.force_login(User.objects.create_user(username=username, is_staff=is_staff))
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test that db, serialize and total timings are reported."""
+        response = self.client.get('/api/posts/')
+        
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_server_timing_off_by_default(self):
+        response = self.client.get('/api/posts/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_staff_profile(self):
+        """Test that a staff profile lists queries with call sites and duplicates."""
+        self.login('admin', is_staff=True)
+        
+        response = self.client.get(f'/api/posts/{self.post.id}/?_profile=1')
+        
+        self.assertEqual(response.status_code, 200)
+        profile = self.client.get(f'/api/profile/{response["X-Profile-Id"]}/').json()
+        self.assertEqual(profile['query_count'], len(profile['queries']))
+        self.assertGreater(profile['query_count'], 0)
+        self.assertTrue(all(query['call_site'] for query in profile['queries']))
+
+    def test_duplicate_queries_are_grouped(self):
+        """Test that an N+1 pattern shows up under duplicates."""
+        self.login('admin', is_staff=True)
+        
+        def n_plus_one(request):
+            for comment in Comment.objects.all():
+                comment.author.username
+            return None
+        
+        from apps.core.query_profile import build_profile
+        from apps.core.instrumentation import request_stats
+        with request_stats() as stats:
+            stats.query_log = []
+            n_plus_one(None)
+            profile = build_profile(RequestFactory().get('/'), stats.query_log, 0.01)
+        
+        self.assertEqual(profile['query_count'], 4)
+        self.assertEqual(profile['duplicates'][0]['count'], 3)
+        self.assertIn('in n_plus_one', profile['duplicates'][0]['call_sites'][0])
+
+    def test_profile_requires_staff(self):
+        """Test that non-staff sessions cannot profile or read profiles."""
+        self.login('regular')
+        
+        response = self.client.get('/api/posts/?_profile=1', HTTP_X_PROFILE='1')
+        
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get('/api/profile/abc/').status_code, 403)
+
+    def test_demo_session_is_not_staff(self):
+        """Test that logging in by username as a staff user does not grant profiles."""
+        User.objects.create_user(username='admin', is_staff=True)
+        self.client.post('/api/users/me/', {'username': 'admin'})
+        
+        response = self.client.get('/api/posts/?_profile=1')
+        
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get('/api/profile/abc/').status_code, 403)
+
+
+class SamplingProfilerTests(TestCase):
+    """Test the sampling profiler and its collapsed-stack output."""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+
+    def busy(self, seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    def test_sampler_collects_the_target_thread(self):
+        sampler = StackSampler(threading.get_ident(), interval=0.001)
+        sampler.start()
+        self.busy(0.05)
+        stacks = sampler.stop()
+        
+        busy_samples = sum(count for stack, count in stacks.items() if stack.endswith('SamplingProfilerTests.busy'))
+        self.assertGreater(busy_samples, 5)
+
+    @override_settings(PROFILER_TOKEN='secret', PROFILER_INTERVAL=0.001)
+    def test_header_writes_collapsed_file_tagged_by_url_name(self):
+        """Test that a profiled request leaves a flame-graph file under its URL name."""
+        request = RequestFactory().get('/api/leaderboard/', HTTP_X_SAMPLE_PROFILE='secret')
+        request.resolver_match = resolve('/api/leaderboard/')
+        middleware = SamplingProfilerMiddleware(lambda request: self.busy(0.05) or HttpResponse())
+        
+        with override_settings(PROFILER_DIR=self.profile_dir):
+            middleware(request)
+        
+        files = list(Path(self.profile_dir, 'leaderboard').glob('*.collapsed'))
+        self.assertEqual(len(files), 1)
+        for line in files[0].read_text().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('leaderboard;'))
+            self.assertGreater(int(count), 0)
+
+    @override_settings(PROFILER_TOKEN='secret', PROFILER_SAMPLE_RATE=0.0)
+    def test_not_profiled_without_valid_header(self):
+        with override_settings(PROFILER_DIR=self.profile_dir):
+            self.client.get('/api/leaderboard/', HTTP_X_SAMPLE_PROFILE='1')
+        
+        self.assertEqual(list(Path(self.profile_dir).iterdir()), [])
+
+    @override_settings(PROFILER_TOKEN='', DEBUG=True, PROFILER_SAMPLE_RATE=0.0)
+    def test_header_needs_a_configured_token(self):
+        with override_settings(PROFILER_DIR=self.profile_dir):
+            self.client.get('/api/leaderboard/', HTTP_X_SAMPLE_PROFILE='1')
+        
+        self.assertEqual(list(Path(self.profile_dir).iterdir()), [])
+
+    @override_settings(PROFILER_MAX_FILES=2)
+    def test_old_files_are_pruned(self):
+        with override_settings(PROFILER_DIR=self.profile_dir):
+            for duration in range(4):
+                write_collapsed(Counter({'a;b': 1}), 'leaderboard', duration)
+                time.sleep(0.01)
+        
+        files = sorted(path.name for path in Path(self.profile_dir, 'leaderboard').iterdir())
+        self.assertEqual([name[:9] for name in files], ['0002000ms', '0003000ms'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test read-replica routing and read-your-writes stickiness."""
+    # Not TestCase: its wrapping transaction would keep every read on the primary
+
+    def route(self, request, view_class):
+        """Run the middleware around a view and return where a read was routed."""
+        routed = []
+        
+        def get_response(request):
+            middleware.process_view(request, view_class.as_view(), (), {})
+            routed.append(ReplicaRouter().db_for_read(Post))
+            return HttpResponse()
+        
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return routed[0], response
+
+    def test_opted_in_reads_go_to_replica(self):
+        alias, _ = self.route(RequestFactory().get('/api/leaderboard/'), LeaderboardView)
+        self.assertEqual(alias, 'replica_1')
+
+    def test_other_views_read_from_primary(self):
+        alias, _ = self.route(RequestFactory().get('/api/likes/post/1/'), PostLikeToggleView)
+        self.assertEqual(alias, 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """Test that a write sets the pin cookie and pinned clients read the primary."""
+        alias, response = self.route(RequestFactory().post('/api/posts/'), PostListCreateView)
+        
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        
+        request = RequestFactory().get('/api/posts/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        alias, _ = self.route(request, PostListCreateView)
+        self.assertEqual(alias, 'default')
+
+    def test_reads_in_transactions_use_primary(self):
+        token = replica_reads_allowed.set(True)
+        self.addCleanup(replica_reads_allowed.reset, token)
+        router = ReplicaRouter()
+        
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Post), 'default')
+        with use_primary():
+            self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'apps.core.cache.TieredCache',
+        'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 3, 'LOCAL_TIMEOUT': 60},
+    },
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cache-tests'},
+})
+class TieredCacheTests(TestCase):
+    """Test the per-process LRU in front of the shared cache."""
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def cache_requests(self, tier, result):
+        key = f'result="{result}",tier="{tier}"'
+        return registry.snapshot()['counters'].get('cache_requests_total', {}).get(key, 0)
+
+    def test_reads_fill_the_local_tier(self):
+        """Test that a shared hit is served locally afterwards."""
+        self.shared.set('greeting', 'hello')
+        local_hits = self.cache_requests('local', 'hit')
+        
+        self.assertEqual(self.cache.get('greeting'), 'hello')
+        self.shared.delete('greeting')  # e.g. deleted by another worker
+        
+        self.assertEqual(self.cache.get('greeting'), 'hello')
+        self.assertEqual(self.cache_requests('local', 'hit'), local_hits + 1)
+
+    def test_writes_go_to_both_tiers(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+        
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.shared.get('key'))
+
+    def test_local_tier_is_bounded(self):
+        for i in range(5):
+            self.cache.set(f'key{i}', i)
+        
+        self.assertEqual(len(self.cache.local), 3)
+        self.assertEqual(self.cache.get('key0'), 0)  # still in the shared tier
+
+    def test_namespace_invalidation(self):
+        """Test that bumping a namespace version orphans all of its keys."""
+        posts = CacheNamespace('posts')
+        comments = CacheNamespace('comments')
+        posts.set('feed:1', ['post'])
+        comments.set('tree:1', ['comment'])
+        
+        posts.invalidate()
+        
+        self.assertIsNone(posts.get('feed:1'))
+        self.assertEqual(comments.get('tree:1'), ['comment'])
+        self.assertEqual(posts.get_or_set('feed:1', lambda: ['fresh']), ['fresh'])
+        self.assertEqual(posts.get('feed:1'), ['fresh'])
+
+    def test_namespace_version_skips_the_local_tier(self):
+        """Test that another worker's invalidation is seen without waiting for the LRU."""
+        posts = CacheNamespace('posts')
+        posts.set('feed:1', ['post'])
+        # Another worker bumps the version in the shared tier
+        self.shared.incr(posts.version_key)
+
+        self.assertIsNone(posts.get('feed:1'))
+        self.assertIsNone(self.cache.local.get(
+            self.cache.make_and_validate_key(posts.version_key), None
+        ))
+
+
+class AsyncViewTests(TestCase):
+    """Test that the async read views match their sync counterparts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.viewer = User.objects.create_user(username='viewer')
+        self.post = Post.objects.create(author=self.author, content='Hello')
+        parent = Comment.objects.create(post=self.post, author=self.author, content='Top')
+        Comment.objects.create(post=self.post, parent=parent, author=self.viewer, content='Reply')
+        like_post(self.viewer, self.post.id)
+        like_comment(self.viewer, parent.id)
+        self.client.post('/api/users/me/', {'username': 'viewer'})
+
+    async def call_async(self, view_class, path, **kwargs):
+        request = AsyncRequestFactory().get(path)
+        request.session = SessionStore(session_key=self.client.cookies['sessionid'].value)
+        return await view_class.as_view()(request, **kwargs)
+
+    async def assertSameResponse(self, view_class, path, **kwargs):
+        expected = await sync_to_async(self.client.get)(path)
+        response = await self.call_async(view_class, path, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_leaderboard(self):
+        await self.assertSameResponse(leaderboard_async.LeaderboardView, '/api/leaderboard/')
+
+    async def test_comment_tree(self):
+        path = f'/api/comments/post/{self.post.id}/'
+        # Fix the clock: the response's cursor is based on the current time
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+            await self.assertSameResponse(comments_async.PostCommentsView, path, post_id=self.post.id)
+            await self.assertSameResponse(
+                comments_async.PostCommentsView, f'{path}?since=2000-01-01T00:00:00Z', post_id=self.post.id
+            )
+        await self.assertSameResponse(comments_async.PostCommentsView, f'{path}?since=yesterday', post_id=self.post.id)
+        await self.assertSameResponse(comments_async.PostCommentsView, '/api/comments/post/999/', post_id=999)
+
+    async def test_post_detail(self):
+        await self.assertSameResponse(posts_async.PostDetailView, f'/api/posts/{self.post.id}/', pk=self.post.id)
+        await self.assertSameResponse(posts_async.PostDetailView, '/api/posts/999/', pk=999)
+
+    async def test_health(self):
+        response = await self.call_async(users_async.HealthCheckView, '/api/health/')
+        self.assertEqual(json.loads(response.content)['status'], 'healthy')
+
+    async def test_middleware_runs_in_async_chain(self):
+        """Test that the instrumentation middleware works under ASGI."""
+        with override_settings(SERVER_TIMING=True):
+            response = await self.async_client.get('/api/leaderboard/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+
+class LoggingPipelineTests(TestCase):
+    """Test the queued, structured and sampled logging pipeline."""
+
+    def make_record(self, name='apps.test', level=logging.INFO, msg='hello %s', args=('world',)):
+        return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+    def test_request_id_is_echoed_and_generated(self):
+        response = self.client.get('/api/leaderboard/', HTTP_X_REQUEST_ID='lb-request-1')
+        self.assertEqual(response['X-Request-ID'], 'lb-request-1')
+        
+        response = self.client.get('/api/leaderboard/')
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+    def test_json_formatter_carries_request_context(self):
+        request = RequestFactory().get('/api/leaderboard/')
+        request.resolver_match = resolve('/api/leaderboard/')
+        record = self.make_record()
+        record.karma = 5
+        
+        token = current_request_context.set(('req-1', request))
+        try:
+            RequestContextFilter().filter(record)
+        finally:
+            current_request_context.reset(token)
+        data = json.loads(JsonFormatter().format(record))
+        
+        self.assertEqual(data['message'], 'hello world')
+        self.assertEqual(data['request_id'], 'req-1')
+        self.assertEqual(data['view'], 'leaderboard')
+        self.assertEqual(data['karma'], 5)
+
+    def test_full_queue_drops_and_counts(self):
+        """Test that a full queue drops records instead of blocking."""
+        handler = QueueLogHandler(maxsize=2)
+        handler._ensure_listener = lambda: None  # nothing drains the queue
+        
+        for _ in range(5):
+            handler.handle(self.make_record(name='apps.noisy'))
+        
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped['apps.noisy'], 3)
+
+    def test_listener_writes_in_background(self):
+        stream = StringIO()
+        handler = QueueLogHandler(stream=stream)
+        handler.setFormatter(JsonFormatter())
+        
+        handler.handle(self.make_record())
+        handler.flush()
+        
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'hello world')
+        # Flushing drains the queue without stopping the listener
+        listener = handler._listener
+        handler.handle(self.make_record())
+        handler.flush()
+        self.assertIs(handler._listener, listener)
+        self.assertEqual(len(stream.getvalue().splitlines()), 2)
+        handler.close()
+
+    def test_close_waits_for_room_in_a_full_queue(self):
+        """Test that stopping the listener does not fail on a full queue."""
+        release = threading.Event()
+        
+        class SlowStream(StringIO):
+            def write(self, text):
+                release.wait()
+                return super().write(text)
+        
+        stream = SlowStream()
+        handler = QueueLogHandler(maxsize=2, stream=stream)
+        handler.handle(self.make_record())
+        while handler.queue.qsize():  # the listener is now stuck writing it
+            time.sleep(0.01)
+        for _ in range(3):
+            handler.handle(self.make_record())
+        self.assertEqual(handler.dropped['apps.test'], 1)
+        
+        threading.Timer(0.2, release.set).start()
+        handler.close()
+        
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+        self.assertIsNone(handler._listener)
+
+    def test_sampling_filter(self):
+        """Test per-logger sampling, with errors always kept."""
+        sampler = SamplingFilter('django.db.backends=0,apps.noisy=0.5')
+        
+        self.assertFalse(sampler.filter(self.make_record(name='django.db.backends.schema')))
+        self.assertTrue(sampler.filter(self.make_record(name='django.db.backends', level=logging.ERROR)))
+        self.assertTrue(sampler.filter(self.make_record(name='apps.quiet')))
+        kept = sum(sampler.filter(self.make_record(name='apps.noisy')) for _ in range(2000))
+        self.assertTrue(800 < kept < 1200)
+
+
+class CompressionTests(TestCase):
+    """Test negotiated compression of API responses."""
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create([Post(author=author, content=f'Post {i}') for i in range(20)])
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 20)
+
+    def test_small_or_unaccepted_responses_are_not_compressed(self):
+        small = self.client.get('/livez', HTTP_ACCEPT_ENCODING='gzip')
+        refused = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        
+        self.assertNotIn('Content-Encoding', small)
+        self.assertNotIn('Content-Encoding', refused)
+        self.assertEqual(refused.json()['count'], 20)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('*'), next(iter(COMPRESSORS)))
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding(''))
+
+    def test_compressed_bodies_are_reused(self):
+        """Test that an identical body is compressed once."""
+        body = b'{"posts": [' + b'{"author": "someone"},' * 200 + b'{}]}'
+        misses = registry.snapshot()['counters'].get('cache_requests_total', {}).get(
+            'result="miss",tier="compression"', 0
+        )
+        
+        first = compress_body(body, 'gzip')
+        second = compress_body(body, 'gzip')
+        
+        self.assertIs(first, second)
+        self.assertEqual(gzip.decompress(first), body)
+        self.assertEqual(
+            registry.snapshot()['counters']['cache_requests_total']['result="miss",tier="compression"'],
+            misses + 1
+        )
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    """Test the HTTP load generator against a live test server."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        for index in range(3):
+            Post.objects.create(author=self.author, content=f'Post {index}', like_count=index)
+
+    def test_reports_every_endpoint_of_the_mix(self):
+        """Test that a short run reports latency percentiles per endpoint without errors."""
+        out = StringIO()
+        call_command(
+            'loadtest', '--url', self.live_server_url, '--concurrency', '1',
+            '--duration', '1', '--warmup', '0', '--hot-posts', '1',
+            '--mix', 'feed=1,thread=1,like_hot=1,like_cold=1,leaderboard=1', '--json',
+            stdout=out
+        )
+        report = json.loads(out.getvalue())
+        
+        self.assertEqual(report['totals']['errors'], 0)
+        self.assertGreater(report['totals']['requests'], 5)
+        self.assertLessEqual(
+            {'feed', 'post-detail', 'post-comments', 'like-toggle-hot', 'leaderboard'},
+            set(report['endpoints'])
+        )
+        self.assertIsNotNone(report['endpoints']['feed']['latency_ms']['p99'])
+        self.assertEqual(report['meta']['concurrency'], 1)
+
+    def test_mix_is_validated(self):
+        """Test that unknown scenarios and empty mixes are rejected."""
+        self.assertEqual(parse_mix('feed=3, post=1'), {'feed': 3.0, 'post': 1.0})
+        with self.assertRaises(CommandError):
+            parse_mix('feed=1,browse=2')
+        with self.assertRaises(CommandError):
+            parse_mix('feed=0')
+
+
+class MicrobenchTests(TestCase):
+    """Test the microbenchmark runner and the baseline comparison."""
+
+    def test_runs_in_memory_benchmarks(self):
+        """Test that each benchmark reports CPU time and memory at each scale."""
+        results = run_benchmarks(['comment_tree', 'post_serializer'], [10, 20], repeat=1)
+        
+        self.assertEqual(
+            set(results),
+            {'comment_tree@10', 'comment_tree@20', 'post_serializer@10', 'post_serializer@20'}
+        )
+        result = results['comment_tree@20']
+        self.assertGreater(result['cpu_ms']['min'], 0)
+        self.assertGreater(result['peak_kib'], 0)
+        self.assertGreaterEqual(result['peak_kib'], result['retained_kib'])
+        self.assertGreater(result['allocations'], 0)
+
+    def test_skips_scales_above_max_scale(self):
+        """Test that slow benchmarks are not run above their max_scale."""
+        results = run_benchmarks(['comment_tree'], [10, 20000], repeat=1)
+        self.assertEqual(list(results), ['comment_tree@10'])
+
+    def test_compare_flags_only_regressions_beyond_tolerance(self):
+        """Test that slowdowns beyond the tolerance fail and small noise does not."""
+        def result(cpu_ms, peak_kib, allocations=10000):
+            return {
+                'cpu_ms': {'min': cpu_ms, 'median': cpu_ms},
+                'peak_kib': peak_kib,
+                'allocations': allocations,
+            }
+
+        baseline = {
+            'a@1000': result(100.0, 1000.0),
+            'b@1000': result(0.2, 10.0),
+            'c@1000': result(50.0, 1000.0),
+            'e@1000': result(50.0, 1000.0),
+        }
+        current = {
+            'a@1000': result(130.0, 1000.0),  # 30% slower
+            'b@1000': result(0.4, 10.0),      # doubled, but within the noise floor
+            'c@1000': result(55.0, 2000.0),   # fast enough, but twice the memory
+            'd@1000': result(1.0, 1.0),       # not in the baseline
+            'e@1000': result(50.0, 1000.0, allocations=20000),  # same peak, more objects
+        }
+        
+        regressions = compare_to_baseline(current, baseline, tolerance=0.2)
+        
+        self.assertEqual(
+            [(key, metric) for key, metric, _, _ in regressions],
+            [('a@1000', 'cpu_ms'), ('c@1000', 'peak_kib'), ('e@1000', 'allocations')]
+        )
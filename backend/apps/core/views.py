@@ -0,0 +1,29 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .query_profile import is_staff_user, load_profile
+
+
+class ProfileDetailView(APIView):
+    """
+    Fetch a stored SQL profile (staff only).
+
+    GET /api/profile/<profile_id>/
+
+    Profile ids come from the X-Profile-Id header of a profiled request.
+    """
+
+    def get(self, request, profile_id):
+        if not is_staff_user(request):
+            return Response(
+                {'error': 'Staff only'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        profile = load_profile(profile_id)
+        if profile is None:
+            return Response(
+                {'error': 'Profile not found or expired'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(profile)
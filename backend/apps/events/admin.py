@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'attempts', 'created_at']
+    list_filter = ['event_type']
+    ordering = ['id']
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class EventsConfig(AppConfig):
+    """
+    Transactional outbox: domain events and the handlers that consume them.
+    """
+    name = 'apps.events'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # Each app registers its handlers in <app>/handlers.py
+        autodiscover_modules('handlers')
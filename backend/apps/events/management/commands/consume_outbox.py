@@ -0,0 +1,94 @@
+"""
+Management command to apply pending outbox events.
+
+Run it alongside the web workers when OUTBOX_DEFERRED is on. It polls
+the outbox, applies events in batches and sleeps while the outbox is
+empty. One consumer is enough; extra consumers queue behind each
+other's batches (see process_outbox).
+
+An event that fails OUTBOX_MAX_ATTEMPTS times blocks every later one,
+so the command exits with an error instead of polling behind it. Fix the
+cause, then restart with --retry-dead.
+
+Examples:
+    python manage.py consume_outbox
+    python manage.py consume_outbox --once        # drain and exit
+    python manage.py consume_outbox --batch-size 500 --interval 0.2
+    python manage.py consume_outbox --retry-dead  # after fixing a dead event
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.core.metrics import registry
+from apps.events.services import (
+    dead_event, drain_outbox, pending_events, process_outbox, retry_dead_events
+)
+
+
+class Command(BaseCommand):
+    help = 'Apply pending outbox events in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help='Events applied per transaction'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep while the outbox is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Apply everything pending, then exit'
+        )
+        parser.add_argument(
+            '--retry-dead',
+            action='store_true',
+            help='Reset the attempts of dead events before consuming'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            self.stdout.write(f'Retrying {retry_dead_events()} dead events')
+
+        if options['once']:
+            start = time.perf_counter()
+            processed = drain_outbox(options['batch_size'])
+            registry.flush(force=True)
+            self.stdout.write(
+                f'Applied {processed} events in {time.perf_counter() - start:.2f}s, '
+                f'{pending_events()} pending'
+            )
+            self.check_dead_event()
+            return
+
+        self.stdout.write('Consuming outbox events (Ctrl+C to stop)...')
+        try:
+            while True:
+                processed, failed = process_outbox(options['batch_size'])
+                registry.flush()
+                if failed:
+                    self.check_dead_event()
+                    self.stderr.write('An event failed; retrying after the interval')
+                if failed or not processed:
+                    # Let the connection go while idle, as a web request would
+                    connection.close_if_unusable_or_obsolete()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            registry.flush(force=True)
+
+    def check_dead_event(self):
+        event = dead_event()
+        if event is not None:
+            registry.flush(force=True)
+            raise CommandError(
+                f'Outbox blocked by event #{event.id} ({event.event_type}), which failed '
+                f'{event.attempts} times: {event.last_error}. Fix the cause and run '
+                f'consume_outbox --retry-dead, or delete the event.'
+            )
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event waiting to be handled.
+
+    Written by events.services.publish() in the same transaction as the
+    change it describes, so an event exists if and only if that change
+    committed. The consumer deletes the row in the transaction that
+    applies its handlers, so each event is handled exactly once.
+    """
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Failed handler runs; an event that fails OUTBOX_MAX_ATTEMPTS times blocks the outbox
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
@@ -0,0 +1,169 @@
+"""
+Transactional outbox service module.
+
+Write paths publish domain events ('post_liked', 'comment_created', ...)
+instead of updating derived data themselves; handlers registered with
+@handler update it. How handlers run depends on OUTBOX_DEFERRED:
+
+- False (default): publish() runs the handlers right away, inside the
+  caller's transaction, so derived data is updated before the request
+  returns, as if the write path had done it itself
+- True: publish() only inserts an OutboxEvent row in the caller's
+  transaction. The consume_outbox command applies events in batches.
+  Only handler work moves out of the request: the write path's own
+  updates (a like's like_count, say) and the OutboxEvent insert still
+  run in its transaction
+
+Handlers must not depend on anything but the payload: in deferred mode
+they run later, in another process.
+"""
+import logging
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from apps.core.metrics import registry
+from .models import OutboxEvent
+
+logger = logging.getLogger('apps.events')
+
+# event type -> list of handler functions, in registration order
+HANDLERS = {}
+
+
+def handler(event_type):
+    """Register `func(payload)` to be called for every `event_type` event."""
+    def register(func):
+        HANDLERS.setdefault(event_type, []).append(func)
+        return func
+    return register
+
+
+def publish(event_type, **payload):
+    """
+    Publish a domain event as part of the current transaction.
+
+    Events without handlers are dropped, so publishing is free until
+    something subscribes. The payload must be JSON-serializable.
+    """
+    if not HANDLERS.get(event_type):
+        return
+    if settings.OUTBOX_DEFERRED:
+        OutboxEvent.objects.create(event_type=event_type, payload=payload)
+    else:
+        dispatch(event_type, payload)
+
+
+def dispatch(event_type, payload):
+    """Run every handler registered for `event_type`."""
+    for func in HANDLERS.get(event_type, ()):
+        func(payload)
+
+
+def process_outbox(batch_size=None):
+    """
+    Apply one batch of pending outbox events, oldest first.
+
+    The batch runs in one transaction: handler effects and the deletion
+    of the handled events commit together, so a crash never applies an
+    event twice. Events are applied strictly in order (an unlike must not
+    overtake its like), so the batch stops at the first failing event;
+    that event's attempt is recorded and it is retried on the next call.
+    Once it has failed OUTBOX_MAX_ATTEMPTS times it is dead: it is no
+    longer run, and no later event is applied either until it is fixed
+    and retried (consume_outbox --retry-dead) or deleted.
+
+    Concurrent consumers queue up on the batch's row locks rather than
+    skipping them, which would let a later event overtake an earlier one.
+
+    Returns:
+        tuple: (events_processed: int, failed: bool), where failed is also
+        set when the batch is blocked by a dead event
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+    processed = []
+    failed = None
+    blocked = False
+
+    with transaction.atomic():
+        events = list(OutboxEvent.objects.select_for_update().order_by('id')[:batch_size])
+        for event in events:
+            if event.attempts >= max_attempts:
+                blocked = True
+                logger.error(
+                    'Outbox blocked by dead event %s (%s): %s',
+                    event.id, event.event_type, event.last_error
+                )
+                break
+            try:
+                # Savepoint: a failing handler must not undo the rest of the batch
+                with transaction.atomic():
+                    dispatch(event.event_type, event.payload)
+            except Exception as exc:
+                failed = event
+                logger.exception('Outbox event %s (%s) failed', event.id, event.event_type)
+                OutboxEvent.objects.filter(id=event.id).update(
+                    attempts=F('attempts') + 1,
+                    last_error=f'{type(exc).__name__}: {exc}'
+                )
+                if event.attempts + 1 >= max_attempts:
+                    logger.critical(
+                        'Outbox event %s (%s) failed %s times; no later event is applied '
+                        'until it is fixed', event.id, event.event_type, max_attempts
+                    )
+                    registry.inc('outbox_dead_events_total', {'event_type': event.event_type})
+                break
+            processed.append(event)
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in processed]).delete()
+
+    for event in processed:
+        registry.inc('outbox_events_processed_total', {'event_type': event.event_type})
+    if failed is not None:
+        registry.inc('outbox_events_failed_total', {'event_type': failed.event_type})
+    return len(processed), failed is not None or blocked
+
+
+def drain_outbox(batch_size=None, timeout=None):
+    """
+    Process batches until no pending event is left (or a batch fails).
+
+    Returns:
+        Number of events processed
+    """
+    total = 0
+    deadline = time.monotonic() + timeout if timeout else None
+    while deadline is None or time.monotonic() < deadline:
+        processed, failed = process_outbox(batch_size)
+        total += processed
+        if failed or not processed:
+            break
+    return total
+
+
+def pending_events():
+    """Number of events still waiting to be applied (including dead ones)."""
+    return OutboxEvent.objects.count()
+
+
+def dead_event():
+    """The oldest event that has used up its attempts, or None."""
+    return (
+        OutboxEvent.objects
+        .filter(attempts__gte=settings.OUTBOX_MAX_ATTEMPTS)
+        .order_by('id')
+        .first()
+    )
+
+
+def retry_dead_events():
+    """
+    Give dead events a fresh set of attempts, after their cause is fixed.
+
+    Returns:
+        Number of events reset
+    """
+    return OutboxEvent.objects.filter(attempts__gte=settings.OUTBOX_MAX_ATTEMPTS).update(
+        attempts=0
+    )
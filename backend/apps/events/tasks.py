@@ -0,0 +1,11 @@
+"""
+Background tasks for the outbox (see apps.jobs).
+"""
+from apps.jobs.services import task
+from .services import drain_outbox
+
+
+@task('events.drain_outbox')
+def drain(batch_size=None, timeout=60):
+    """Apply pending outbox events, for deployments without a consume_outbox process."""
+    drain_outbox(batch_size, timeout=timeout)
@@ -0,0 +1,100 @@
+"""
+Tests for the transactional outbox.
+"""
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from apps.events.models import OutboxEvent
+from apps.events.services import HANDLERS, handler, process_outbox, publish
+from apps.likes.services import like_post, unlike_post, like_comment
+from apps.posts.models import Post
+from apps.comments.models import Comment
+from apps.users.models import User, KarmaTransaction, KarmaCounter
+
+
+class OutboxTests(TestCase):
+    """Test publishing and consuming outbox events."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.liker = User.objects.create_user(username='liker')
+        self.post = Post.objects.create(author=self.author, content='Post')
+
+    def test_inline_mode_applies_karma_in_the_request(self):
+        like_post(self.liker, self.post.id)
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(KarmaCounter.objects.get(user=self.author).total_karma, 5)
+
+    @override_settings(OUTBOX_DEFERRED=True)
+    def test_deferred_mode_applies_karma_in_the_consumer(self):
+        success, _, like_count = like_post(self.liker, self.post.id)
+
+        self.assertTrue(success)
+        self.assertEqual(like_count, 1)
+        self.assertFalse(KarmaTransaction.objects.exists())
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, 'post_liked')
+        self.assertEqual(event.payload['actor_id'], self.liker.id)
+
+        self.assertEqual(process_outbox(), (1, False))
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(KarmaCounter.objects.get(user=self.author).total_karma, 5)
+
+    @override_settings(OUTBOX_DEFERRED=True)
+    def test_events_are_applied_in_order(self):
+        like_post(self.liker, self.post.id)
+        unlike_post(self.liker, self.post.id)
+        like_post(self.liker, self.post.id)
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Hi')
+        like_comment(self.author, comment.id)  # self-like: no karma
+
+        process_outbox(batch_size=2)
+        call_command('consume_outbox', once=True, stdout=StringIO())
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+        self.assertEqual(KarmaCounter.objects.get(user=self.author).total_karma, 5)
+
+    @override_settings(OUTBOX_DEFERRED=True, OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_event_stops_the_batch_and_is_retried(self):
+        calls = []
+
+        @handler('test_event')
+        def flaky(payload):
+            calls.append(payload['n'])
+            if payload['n'] == 2:
+                raise ValueError('boom')
+        self.addCleanup(HANDLERS.pop, 'test_event')
+
+        for n in (1, 2, 3):
+            publish('test_event', n=n)
+
+        with self.assertLogs('apps.events', 'ERROR'):
+            self.assertEqual(process_outbox(), (1, True))
+        failed = OutboxEvent.objects.order_by('id').first()
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('boom', failed.last_error)
+
+        # The second failure exhausts its attempts; later events wait behind it
+        with self.assertLogs('apps.events', 'CRITICAL'):
+            self.assertEqual(process_outbox(), (0, True))
+        with self.assertLogs('apps.events', 'ERROR'):
+            self.assertEqual(process_outbox(), (0, True))
+        self.assertEqual(calls, [1, 2, 2])
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+        with self.assertLogs('apps.events', 'ERROR'), self.assertRaises(CommandError):
+            call_command('consume_outbox', once=True, stdout=StringIO())
+
+        # Once the cause is fixed, the dead event and the ones behind it run in order
+        HANDLERS['test_event'] = [lambda payload: calls.append(payload['n'])]
+        call_command('consume_outbox', once=True, retry_dead=True, stdout=StringIO())
+        self.assertEqual(calls, [1, 2, 2, 2, 3])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_DEFERRED=True)
+    def test_events_without_handlers_are_not_stored(self):
+        publish('nobody_listens', value=1)
+
+        self.assertFalse(OutboxEvent.objects.exists())
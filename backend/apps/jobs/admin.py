@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import Job, JobSchedule
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'task']
+    ordering = ['-id']
+
+
+@admin.register(JobSchedule)
+class JobScheduleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'next_run_at']
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Database-backed background job queue, run by `manage.py runworker`.
+    """
+    name = 'apps.jobs'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # Each app registers its tasks in <app>/tasks.py
+        autodiscover_modules('tasks')
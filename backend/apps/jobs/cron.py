@@ -0,0 +1,89 @@
+"""
+Minimal cron expression parser for scheduled jobs.
+
+Supports the five standard fields (minute hour day-of-month month
+day-of-week) with '*', single values, ranges ('1-5'), steps ('*/15',
+'0-30/10') and lists ('1,15,30'). Day of week is 0-6 with Sunday as 0
+(7 is accepted as Sunday too). As in cron, when both day fields are
+restricted a day matches if either does.
+
+    >>> CronSchedule('*/15 * * * *').next_after(now)
+"""
+from datetime import timedelta
+
+# (name, lowest, highest) of each field, in expression order
+FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+)
+
+# Longest gap to search for a match (covers 29 February)
+MAX_SEARCH = timedelta(days=366 * 5)
+
+
+class CronSchedule:
+    """A parsed cron expression."""
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != len(FIELDS):
+            raise ValueError(f'Cron expression needs {len(FIELDS)} fields: {expression!r}')
+        self.expression = expression
+        (self.minutes, self.hours, self.days, self.months, weekdays) = (
+            _parse_field(part, low, high, name)
+            for part, (name, low, high) in zip(parts, FIELDS)
+        )
+        # Sunday is both 0 and 7
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    def __repr__(self):
+        return f'CronSchedule({self.expression!r})'
+
+    def matches_day(self, value):
+        # cron weekdays count from Sunday, Python's from Monday
+        day_match = value.day in self.days
+        weekday_match = (value.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_after(self, value):
+        """First matching minute strictly after `value` (an aware datetime)."""
+        current = value.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = value + MAX_SEARCH
+        while current <= limit:
+            if current.month not in self.months:
+                # First minute of the next month
+                current = (current.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.matches_day(current):
+                current = current.replace(hour=0, minute=0) + timedelta(days=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+            elif current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+            else:
+                return current
+        raise ValueError(f'Cron expression {self.expression!r} never matches')
+
+
+def _parse_field(text, low, high, name):
+    values = set()
+    for part in text.split(','):
+        range_text, _, step_text = part.partition('/')
+        step = int(step_text) if step_text else 1
+        if range_text == '*':
+            start, end = low, high
+        elif '-' in range_text:
+            start, end = (int(bound) for bound in range_text.split('-', 1))
+        else:
+            start = int(range_text)
+            end = high if step_text else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f'Invalid cron {name} field: {text!r}')
+        values.update(range(start, end + 1, step))
+    return values
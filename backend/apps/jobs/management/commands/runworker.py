@@ -0,0 +1,237 @@
+"""
+Management command to run background jobs.
+
+Starts --concurrency worker loops, as threads (for I/O-bound tasks) or
+processes (for CPU-bound ones), that claim and run due jobs from the
+jobs table. The main process runs the scheduler: it enqueues
+JOB_SCHEDULES entries when they are due and re-queues jobs whose worker
+died. Any number of runworker commands can share one database.
+
+Throughput (jobs/s, outcomes and run-time percentiles per task) is
+printed every --stats-interval seconds and on exit; workers also export
+jobs_processed_total and job_duration_seconds to /metrics.
+
+Examples:
+    python manage.py runworker
+    python manage.py runworker --concurrency 4 --pool processes
+    python manage.py runworker --burst       # run what is due, then exit
+"""
+import logging
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from apps.core.benchmarks import init_worker_process, latency_summary, worker_process_context
+from apps.core.metrics import registry
+from apps.jobs.services import claim_jobs, enqueue_due_schedules, requeue_stale_jobs, run_job
+
+logger = logging.getLogger('apps.jobs')
+
+# Seconds between scheduler runs
+SCHEDULER_INTERVAL = 10.0
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Worker loops to run'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['threads', 'processes'],
+            default='threads',
+            help='Run worker loops as threads or as separate processes'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds a worker sleeps when no job is due'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due'
+        )
+        parser.add_argument(
+            '--no-scheduler',
+            action='store_true',
+            help='Do not enqueue scheduled jobs from this process'
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            default=60.0,
+            help='Seconds between throughput reports (0 to only report on exit)'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive')
+
+        if not options['no_scheduler']:
+            self._schedule()
+
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        if options['pool'] == 'threads':
+            stop = threading.Event()
+            results = queue.Queue()
+            workers = [
+                threading.Thread(
+                    target=work,
+                    args=(f'{worker_name}:{index}', stop, results, options['interval'], options['burst']),
+                    daemon=True
+                )
+                for index in range(options['concurrency'])
+            ]
+        else:
+            context = worker_process_context()
+            stop = context.Event()
+            results = context.Queue()
+            # Children must not inherit (and share) this process's connection
+            connections.close_all()
+            workers = [
+                context.Process(
+                    target=_work_in_process,
+                    args=(f'{worker_name}:{index}', stop, results, options['interval'], options['burst'])
+                )
+                for index in range(options['concurrency'])
+            ]
+
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        for worker in workers:
+            worker.start()
+        if not options['burst']:
+            self.stdout.write(
+                f"Running {options['concurrency']} worker {options['pool']} (Ctrl+C to stop)..."
+            )
+
+        stats = JobStats()
+        window = JobStats()
+        last_schedule = last_report = time.monotonic()
+        try:
+            while any(worker.is_alive() for worker in workers):
+                window.collect(results, timeout=0.5)
+                now = time.monotonic()
+                if not options['no_scheduler'] and now - last_schedule >= SCHEDULER_INTERVAL:
+                    self._schedule()
+                    last_schedule = now
+                if options['stats_interval'] and now - last_report >= options['stats_interval']:
+                    self.stdout.write(window.summary(now - last_report))
+                    stats.merge(window)
+                    window = JobStats()
+                    last_report = now
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current jobs...')
+        finally:
+            stop.set()
+            # Keep draining: a process cannot exit while its results are unread
+            while any(worker.is_alive() for worker in workers):
+                window.collect(results, timeout=0.2)
+            for worker in workers:
+                worker.join()
+            signal.signal(signal.SIGTERM, previous_handler)
+
+        window.collect(results)
+        stats.merge(window)
+        self.stdout.write(stats.summary(stats.elapsed()))
+
+    def _schedule(self):
+        for job in enqueue_due_schedules():
+            self.stdout.write(f'Scheduled {job.task} (job {job.id})')
+        requeue_stale_jobs()
+        connection.close_if_unusable_or_obsolete()
+
+
+def work(worker_id, stop, results, interval, burst):
+    """
+    Worker loop: claim a due job, run it, report (task, outcome, seconds).
+
+    Stops when `stop` is set, or in burst mode when nothing is due.
+    """
+    try:
+        while not stop.is_set():
+            try:
+                jobs = claim_jobs(worker_id)
+                for job in jobs:
+                    outcome, seconds = run_job(job)
+                    results.put((job.task, outcome, seconds))
+            except DatabaseError as exc:
+                # Database restarting or locked: back off and carry on. A job
+                # left running is re-queued by the scheduler after JOB_LOCK_TIMEOUT
+                logger.warning('Worker %s: %s', worker_id, exc)
+                connection.close()
+                stop.wait(interval)
+                continue
+            if not jobs:
+                if burst:
+                    break
+                # Let the connection go while idle, as a web request would
+                connection.close_if_unusable_or_obsolete()
+                stop.wait(interval)
+                continue
+            registry.flush()
+    finally:
+        registry.flush(force=True)
+        connection.close()
+
+
+def _work_in_process(*args):
+    # The parent handles Ctrl+C and stops the workers between jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_worker_process()
+    work(*args)
+
+
+class JobStats:
+    """Outcomes and run times of the jobs reported by the workers."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.outcomes = Counter()
+        self.seconds = {}
+
+    def collect(self, results, timeout=None):
+        """Take every reported job off the queue, waiting up to `timeout` for the first."""
+        block = timeout is not None
+        while True:
+            try:
+                task_name, outcome, seconds = results.get(block=block, timeout=timeout)
+            except queue.Empty:
+                return
+            block = False
+            self.outcomes[(task_name, outcome)] += 1
+            self.seconds.setdefault(task_name, []).append(seconds * 1000)
+
+    def merge(self, other):
+        self.outcomes.update(other.outcomes)
+        for task_name, values in other.seconds.items():
+            self.seconds.setdefault(task_name, []).extend(values)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self, elapsed):
+        total = sum(self.outcomes.values())
+        lines = [f'{total} jobs in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} jobs/s)']
+        for task_name, values in sorted(self.seconds.items()):
+            outcomes = ', '.join(
+                f'{count} {outcome}'
+                for (name, outcome), count in sorted(self.outcomes.items()) if name == task_name
+            )
+            latency = latency_summary(values)
+            lines.append(
+                f"  {task_name}: {outcomes}; ms p50 {latency['p50']}, "
+                f"p95 {latency['p95']}, max {latency['max']}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,293 @@
+"""
+Background job queue service module.
+
+Tasks are plain functions registered with @task in an app's tasks.py and
+called with the JSON keyword arguments given to enqueue():
+
+    @task('users.rebuild_karma_counters', max_attempts=1)
+    def rebuild_counters():
+        ...
+
+    enqueue('users.rebuild_karma_counters')
+
+Jobs are rows in the jobs table. Workers (`manage.py runworker`) claim
+due jobs so that no two workers run the same job:
+
+- PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers
+  take different jobs instead of queueing behind each other's locks
+- SQLite (and other databases): one UPDATE that flips the oldest due
+  jobs from queued to running under a per-claim token. SQLite runs one
+  write transaction at a time, so two claims never overlap
+
+A failing job is retried with exponential backoff until it has used
+max_attempts. While a job runs, a heartbeat thread refreshes its lock
+every JOB_HEARTBEAT_INTERVAL seconds; jobs whose lock has not been
+refreshed for JOB_LOCK_TIMEOUT (their worker died) are put back.
+JOB_SCHEDULES enqueues tasks on cron expressions.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.core.metrics import registry
+from .cron import CronSchedule
+from .models import Job, JobSchedule
+
+logger = logging.getLogger('apps.jobs')
+
+# task name -> Task
+TASKS = {}
+
+
+class Task:
+    """A registered task function and its retry policy."""
+
+    def __init__(self, name, func, max_attempts, backoff):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def retry_delay(self, attempts):
+        """Seconds to wait after the `attempts`-th failure: doubling, capped, with jitter."""
+        delay = min(self.backoff * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+        return delay * random.uniform(0.8, 1.2)
+
+
+def task(name, max_attempts=3, backoff=None):
+    """
+    Register `func(**kwargs)` as a task.
+
+    Args:
+        name: Name jobs refer to the task by ('<app>.<action>')
+        max_attempts: Runs before a failing job is given up on
+        backoff: Seconds before the first retry (default JOB_RETRY_BACKOFF),
+            doubled after every further failure
+    """
+    def register(func):
+        TASKS[name] = Task(
+            name, func, max_attempts,
+            settings.JOB_RETRY_BACKOFF if backoff is None else backoff
+        )
+        return func
+    return register
+
+
+def enqueue(task_name, run_at=None, delay=None, **kwargs):
+    """
+    Queue a run of a registered task.
+
+    Args:
+        run_at: Earliest time to run it (default: now)
+        delay: Or seconds from now
+        **kwargs: JSON-serializable arguments for the task
+
+    Returns:
+        The created Job
+    """
+    registered = TASKS.get(task_name)
+    if registered is None:
+        raise ValueError(f'Unknown task {task_name!r}')
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        task=task_name, kwargs=kwargs, run_at=run_at, max_attempts=registered.max_attempts
+    )
+
+
+def claim_jobs(worker_id, limit=1):
+    """
+    Claim up to `limit` due jobs for this worker and mark them running.
+
+    Returns:
+        List of claimed Jobs, oldest first
+    """
+    now = timezone.now()
+    token = f'{worker_id}:{uuid.uuid4().hex[:12]}'
+    due = Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    claim = {
+        'status': Job.STATUS_RUNNING,
+        'locked_by': token,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(
+                due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids).update(**claim)
+        else:
+            # The outer status check makes the UPDATE safe even if the subquery is stale
+            claimed = Job.objects.filter(
+                id__in=due.values('id')[:limit], status=Job.STATUS_QUEUED
+            ).update(**claim)
+            if not claimed:
+                return []
+        return list(Job.objects.filter(locked_by=token).order_by('run_at', 'id'))
+
+
+class Heartbeat:
+    """
+    Context manager refreshing a running job's locked_at from a background thread.
+
+    A healthy job can run for longer than JOB_LOCK_TIMEOUT; as long as its
+    worker is alive, requeue_stale_jobs() must not hand it to another one.
+    """
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = settings.JOB_HEARTBEAT_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._beat, name=f'job-{job.id}-heartbeat', daemon=True
+        )
+
+    def __enter__(self):
+        if self.interval > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    Job.objects.filter(id=self.job.id, locked_by=self.job.locked_by).update(
+                        locked_at=timezone.now()
+                    )
+                except DatabaseError as exc:
+                    logger.warning('Heartbeat for job %s failed: %s', self.job.id, exc)
+        finally:
+            # Connections are per thread: this closes the heartbeat's own
+            connections.close_all()
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome.
+
+    Exceptions raised by the task are caught: the job is re-queued with
+    backoff, or marked failed once it has used up its attempts.
+
+    Returns:
+        tuple: (outcome: 'done', 'retried' or 'failed', seconds: float)
+    """
+    registered = TASKS.get(job.task)
+    start = time.perf_counter()
+    try:
+        if registered is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        with Heartbeat(job):
+            registered.func(**job.kwargs)
+    except Exception as exc:
+        seconds = time.perf_counter() - start
+        error = f'{type(exc).__name__}: {exc}'
+        if registered is not None and job.attempts < job.max_attempts:
+            outcome = 'retried'
+            changes = {
+                'status': Job.STATUS_QUEUED,
+                'run_at': timezone.now() + timedelta(seconds=registered.retry_delay(job.attempts)),
+            }
+            logger.warning('Job %s (%s) failed, will retry: %s', job.id, job.task, error)
+        else:
+            outcome = 'failed'
+            changes = {'status': Job.STATUS_FAILED, 'finished_at': timezone.now()}
+            logger.exception('Job %s (%s) failed after %s attempts', job.id, job.task, job.attempts)
+        changes['last_error'] = error
+    else:
+        seconds = time.perf_counter() - start
+        outcome = 'done'
+        changes = {'status': Job.STATUS_DONE, 'finished_at': timezone.now()}
+
+    # Only if still ours: a job whose heartbeat stalled may have been re-queued
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(**changes)
+
+    registry.inc('jobs_processed_total', {'task': job.task, 'outcome': outcome})
+    registry.observe('job_duration_seconds', seconds, {'task': job.task})
+    return outcome, seconds
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    Put back running jobs whose lock has not been refreshed for `timeout` seconds.
+
+    Running jobs refresh their lock every JOB_HEARTBEAT_INTERVAL, so the
+    worker of such a job most likely died. Jobs with attempts left are
+    queued again; the others are marked failed.
+
+    Returns:
+        Number of jobs recovered
+    """
+    timeout = settings.JOB_LOCK_TIMEOUT if timeout is None else timeout
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.STATUS_RUNNING, locked_at__lt=now - timedelta(seconds=timeout)
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.STATUS_QUEUED, run_at=now, last_error='Worker lost'
+    )
+    failed = stale.update(status=Job.STATUS_FAILED, finished_at=now, last_error='Worker lost')
+    if requeued or failed:
+        logger.warning('Recovered %s stale jobs (%s failed)', requeued + failed, failed)
+    return requeued + failed
+
+
+def enqueue_due_schedules(schedules=None):
+    """
+    Enqueue the scheduled tasks whose time has come.
+
+    Args:
+        schedules: Dict of schedule name -> {'task', 'cron', optional 'kwargs'}
+            (default JOB_SCHEDULES)
+
+    Returns:
+        List of enqueued Jobs
+    """
+    schedules = settings.JOB_SCHEDULES if schedules is None else schedules
+    now = timezone.now()
+    enqueued = []
+    for name, entry in schedules.items():
+        cron = CronSchedule(entry['cron'])
+        # A new schedule starts at its next slot, not immediately
+        schedule, _ = JobSchedule.objects.get_or_create(
+            name=name, defaults={'next_run_at': cron.next_after(now)}
+        )
+        if schedule.next_run_at > now:
+            continue
+        with transaction.atomic():
+            # Compare-and-set: only one worker moves the schedule forward
+            moved = JobSchedule.objects.filter(
+                id=schedule.id, next_run_at=schedule.next_run_at
+            ).update(next_run_at=cron.next_after(now))
+            if moved:
+                enqueued.append(enqueue(entry['task'], **entry.get('kwargs', {})))
+    return enqueued
+
+
+def purge_finished_jobs(days=None):
+    """
+    Delete done and failed jobs that finished more than `days` days ago.
+
+    Returns:
+        Number of jobs deleted
+    """
+    days = settings.JOB_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.STATUS_DONE, Job.STATUS_FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
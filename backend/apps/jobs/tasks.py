@@ -0,0 +1,9 @@
+"""
+Housekeeping tasks for the job queue itself.
+"""
+from .services import purge_finished_jobs, task
+
+
+@task('jobs.purge_finished', max_attempts=1)
+def purge_finished(days=None):
+    purge_finished_jobs(days)
@@ -0,0 +1,154 @@
+"""
+Tests for the background job queue.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from apps.jobs.cron import CronSchedule
+from apps.jobs.models import Job, JobSchedule
+from apps.jobs.services import (
+    claim_jobs, enqueue, enqueue_due_schedules, requeue_stale_jobs, run_job, task
+)
+
+CALLS = []
+
+
+@task('tests.record', backoff=60)
+def record(value, fail=False):
+    CALLS.append(value)
+    if fail:
+        raise ValueError(f'failed on {value}')
+
+
+class CronScheduleTests(TestCase):
+    """Test cron expression parsing and matching."""
+
+    def at(self, *args):
+        return datetime(*args, tzinfo=dt_timezone.utc)
+
+    def test_next_after(self):
+        cases = [
+            ('*/15 * * * *', self.at(2026, 1, 1, 10, 7), self.at(2026, 1, 1, 10, 15)),
+            ('30 3 * * *', self.at(2026, 1, 1, 3, 30), self.at(2026, 1, 2, 3, 30)),
+            ('0 9 * * 1-5', self.at(2026, 1, 2, 12, 0), self.at(2026, 1, 5, 9, 0)),  # Fri -> Mon
+            ('0 0 29 2 *', self.at(2026, 3, 1), self.at(2028, 2, 29)),
+            ('0 0 1 * 0', self.at(2026, 1, 1), self.at(2026, 1, 4)),  # 1st or Sunday
+        ]
+        for expression, after, expected in cases:
+            with self.subTest(expression=expression):
+                self.assertEqual(CronSchedule(expression).next_after(after), expected)
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '*/0 * * * *', 'a * * * *']:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    CronSchedule(expression)
+
+
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming, retries and schedules."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_claim_and_run(self):
+        job = enqueue('tests.record', value=1)
+        enqueue('tests.record', delay=3600, value=2)
+
+        claimed = claim_jobs('worker')
+        self.assertEqual([claimed_job.id for claimed_job in claimed], [job.id])
+        self.assertEqual(claimed[0].status, Job.STATUS_RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        # Not claimable twice, and the delayed job is not due yet
+        self.assertEqual(claim_jobs('other'), [])
+
+        self.assertEqual(run_job(claimed[0])[0], 'done')
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_DONE)
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        job = enqueue('tests.record', value=1, fail=True)
+
+        with self.assertLogs('apps.jobs', 'WARNING'):
+            self.assertEqual(run_job(claim_jobs('worker')[0])[0], 'retried')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=40))
+        self.assertIn('failed on 1', job.last_error)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now(), attempts=job.max_attempts - 1)
+        with self.assertLogs('apps.jobs', 'ERROR'):
+            self.assertEqual(run_job(claim_jobs('worker')[0])[0], 'failed')
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_FAILED)
+
+    def test_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_stale_jobs_are_requeued(self):
+        job = enqueue('tests.record', value=1)
+        claim_jobs('worker')
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs('apps.jobs', 'WARNING'):
+            self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_QUEUED)
+
+    def test_schedule_enqueues_each_run_once(self):
+        schedules = {'every-minute': {'task': 'tests.record', 'cron': '* * * * *', 'kwargs': {'value': 1}}}
+
+        # The first check only records when the schedule is next due
+        self.assertEqual(enqueue_due_schedules(schedules), [])
+        JobSchedule.objects.update(next_run_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(len(enqueue_due_schedules(schedules)), 1)
+        self.assertEqual(enqueue_due_schedules(schedules), [])
+        self.assertEqual(Job.objects.get().kwargs, {'value': 1})
+        self.assertGreater(JobSchedule.objects.get().next_run_at, timezone.now())
+
+
+@task('tests.outlive_lock', max_attempts=1)
+def outlive_lock(seconds, timeout):
+    # Longer than the lock timeout, but the heartbeat keeps the lock fresh
+    time.sleep(seconds)
+    CALLS.append(requeue_stale_jobs(timeout=timeout))
+
+
+class HeartbeatTests(TransactionTestCase):
+    """Test that running jobs keep their lock."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.05)
+    def test_long_job_is_not_requeued_while_running(self):
+        enqueue('tests.outlive_lock', seconds=0.5, timeout=0.3)
+        job, = claim_jobs('worker')
+
+        self.assertEqual(run_job(job)[0], 'done')
+        self.assertEqual(CALLS, [0])
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_DONE)
+
+
+class RunWorkerCommandTests(TransactionTestCase):
+    """Test the runworker command."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_burst_runs_every_due_job(self):
+        for value in range(10):
+            enqueue('tests.record', value=value)
+
+        out = StringIO()
+        call_command(
+            'runworker', concurrency=2, burst=True, no_scheduler=True, interval=0.05, stdout=out
+        )
+
+        self.assertEqual(sorted(CALLS), list(range(10)))
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_DONE).count(), 10)
+        self.assertIn('10 jobs', out.getvalue())
+        self.assertIn('tests.record: 10 done', out.getvalue())
@@ -0,0 +1,169 @@
+"""
+Management command to recompute historical leaderboards offline.
+
+Replays karma transactions through the vectorized engine in
+apps/leaderboard/replay.py and stores the top-K users of every hour of
+the date range as LeaderboardSnapshot rows. Point values can be
+overridden to replay history under new karma rules.
+
+Examples:
+    python manage.py replay_leaderboard --from 2026-01-01 --to 2026-01-31
+    python manage.py replay_leaderboard --points post_like=10,comment_like=2
+    python manage.py replay_leaderboard --synthetic 10000000   # benchmark
+"""
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from apps.users.models import KarmaTransaction
+
+
+class Command(BaseCommand):
+    help = 'Recompute hourly leaderboard snapshots with a vectorized replay engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='start',
+            help='First snapshot (ISO date/datetime, default: 7 days ago)'
+        )
+        parser.add_argument(
+            '--to',
+            dest='end',
+            help='Last snapshot (ISO date/datetime, default: now)'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=24,
+            help='Leaderboard window in hours'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=5,
+            help='Number of ranked users per snapshot'
+        )
+        parser.add_argument(
+            '--points',
+            help='Override karma rules, e.g. post_like=10,comment_like=2'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Transactions streamed per chunk'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute snapshots without writing them'
+        )
+        parser.add_argument(
+            '--synthetic',
+            type=int,
+            metavar='N',
+            help='Benchmark on N random transactions instead of the database'
+        )
+        parser.add_argument(
+            '--synthetic-users',
+            type=int,
+            default=100000,
+            help='Number of distinct users in synthetic mode'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from apps.leaderboard import replay
+        except ImportError:
+            raise CommandError('numpy is required: pip install numpy')
+
+        window_hours = options['window']
+        if window_hours < 1 or options['top'] < 1:
+            raise CommandError('--window and --top must be positive')
+
+        end = self._parse_bound(options['end']) or timezone.now()
+        start = self._parse_bound(options['start']) or end - timedelta(days=7)
+        first_hour = -(-int(start.timestamp()) // replay.SECONDS_PER_HOUR)  # ceil to a boundary
+        last_hour = replay.datetime_to_hour(end)
+        if last_hour < first_hour:
+            raise CommandError('--from must be before --to')
+
+        points_by_type = self._parse_points(options['points'])
+
+        started = time.perf_counter()
+        if options['synthetic']:
+            events = replay.synthetic_events(
+                options['synthetic'],
+                options['synthetic_users'],
+                first_hour,
+                last_hour,
+                window_hours
+            )
+        else:
+            events = replay.load_karma_events(
+                replay.hour_to_datetime(first_hour),
+                replay.hour_to_datetime(last_hour),
+                window_hours,
+                points_by_type,
+                chunk_size=options['chunk_size']
+            )
+        loaded = time.perf_counter()
+
+        try:
+            snapshot_hours, ranks, user_ids, karma = replay.compute_hourly_top_k(
+                events, first_hour, last_hour, window_hours, options['top']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        computed = time.perf_counter()
+
+        hours = last_hour - first_hour + 1
+        self.stdout.write(
+            f'{len(events)} transactions {"generated" if options["synthetic"] else "loaded"} '
+            f'in {loaded - started:.2f}s'
+        )
+        self.stdout.write(
+            f'{hours} hourly snapshots ({window_hours}h window, top {options["top"]}) '
+            f'computed in {computed - loaded:.2f}s'
+        )
+
+        if options['synthetic'] or options['dry_run']:
+            return
+
+        written = replay.write_snapshots(
+            window_hours, first_hour, last_hour, snapshot_hours, ranks, user_ids, karma
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote {written} snapshot rows in {time.perf_counter() - computed:.2f}s')
+        )
+
+    def _parse_points(self, value):
+        points = dict(KarmaTransaction.KARMA_POINTS)
+        if not value:
+            return points
+
+        for item in value.split(','):
+            karma_type, _, amount = item.partition('=')
+            if karma_type not in points:
+                raise CommandError(f'Unknown karma type: {karma_type}')
+            try:
+                points[karma_type] = int(amount)
+            except ValueError:
+                raise CommandError(f'Invalid points for {karma_type}: {amount}')
+        return points
+
+    def _parse_bound(self, value):
+        if not value:
+            return None
+
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                raise CommandError(f'Invalid date: {value}')
+            parsed = datetime.combine(parsed_date, datetime.min.time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_hours', models.PositiveSmallIntegerField()),
+                ('snapshot_at', models.DateTimeField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('karma', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'leaderboard_snapshots',
+                'ordering': ['-snapshot_at', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardsnapshot',
+            constraint=models.UniqueConstraint(fields=('window_hours', 'snapshot_at', 'rank'), name='leaderboard_snapshot_unique_rank'),
+        ),
+    ]
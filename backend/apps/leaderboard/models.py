@@ -1,2 +1,39 @@
-# No models in leaderboard app - karma is calculated dynamically
-# from KarmaTransaction in the users app
+from django.db import models
+from django.conf import settings
+
+
+# The live leaderboard has no models - karma is calculated dynamically
+# from KarmaTransaction in the users app. LeaderboardSnapshot only stores
+# offline results written by the replay_leaderboard command.
+
+
+class LeaderboardSnapshot(models.Model):
+    """
+    One ranked entry of a historical leaderboard.
+
+    A snapshot is the top-K users by karma earned in the `window_hours`
+    hours before `snapshot_at` (an hour boundary). Rows are bulk-written
+    by the replay engine (see replay.py), e.g. after a karma rule change.
+    """
+    window_hours = models.PositiveSmallIntegerField()
+    snapshot_at = models.DateTimeField()
+    rank = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='leaderboard_snapshots'
+    )
+    karma = models.IntegerField()
+
+    class Meta:
+        db_table = 'leaderboard_snapshots'
+        ordering = ['-snapshot_at', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['window_hours', 'snapshot_at', 'rank'],
+                name='leaderboard_snapshot_unique_rank'
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.user_id} at {self.snapshot_at:%Y-%m-%d %H:00} ({self.karma})"
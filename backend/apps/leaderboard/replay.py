@@ -0,0 +1,264 @@
+"""
+Offline leaderboard replay engine.
+
+Recomputes historical leaderboards (top-K users by karma earned in a
+sliding window, for every hour of a date range) without running one ORM
+aggregation per hour. Used after karma rule changes, e.g. a change to
+KarmaTransaction.KARMA_POINTS.
+
+The approach:
+1. Stream (user_id, created_at, karma_type) out of karma_transactions in
+   chunks and convert each chunk into NumPy arrays (user, hour bucket, points),
+   plus the hourly karma_rollups of archived transactions (one event per
+   rollup, worth count x points)
+2. Process the snapshot hours in blocks. For each block, build a dense
+   (active users x hours) matrix with np.bincount, take a cumulative sum
+   along the time axis, and get every sliding-window total at once as the
+   difference of two shifted slices
+3. Pick the top K of every hour column: np.partition finds the K-th
+   largest total, and ties at that boundary go to the lowest user ids
+4. Bulk-write the ranked rows to LeaderboardSnapshot
+
+Memory is bounded by `max_cells` (users x hours per block), not by the
+number of transactions.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+import numpy as np
+from django.db import transaction
+from apps.users.models import KarmaRollup, KarmaTransaction
+from .models import LeaderboardSnapshot
+
+SECONDS_PER_HOUR = 3600
+
+
+class KarmaEvents:
+    """
+    Karma events as parallel NumPy arrays, sorted by hour bucket.
+
+    Attributes:
+        user_ids: int64 array of the users who earned the karma
+        hours: int64 array of hour buckets (epoch seconds // 3600)
+        points: int64 array of points per event
+    """
+
+    def __init__(self, user_ids, hours, points):
+        order = np.argsort(hours, kind='stable')
+        self.user_ids = user_ids[order]
+        self.hours = hours[order]
+        self.points = points[order]
+
+    def __len__(self):
+        return len(self.hours)
+
+
+def load_karma_events(start, end, window_hours, points_by_type, chunk_size=100000):
+    """
+    Stream the transactions needed for snapshots in [start, end] into arrays.
+
+    Args:
+        start, end: Aware datetimes bounding the snapshot hours
+        window_hours: Sliding window size (rows back to start - window are read)
+        points_by_type: Mapping of karma_type -> points to replay with
+        chunk_size: Rows converted to arrays per round trip
+
+    Returns:
+        KarmaEvents
+    """
+    type_codes = {karma_type: code for code, karma_type in enumerate(points_by_type)}
+    points_table = np.array(list(points_by_type.values()), dtype=np.int64)
+
+    window_start = start - timedelta(hours=window_hours)
+    rows = (
+        KarmaTransaction.objects
+        .filter(created_at__gte=window_start, created_at__lt=end)
+        .order_by()
+        .values_list('user_id', 'created_at', 'karma_type')
+        .iterator(chunk_size=chunk_size)
+    )
+    # Archived transactions: one row per user, hour and type, with a count
+    rollups = (
+        KarmaRollup.objects
+        .filter(hour__gte=window_start, hour__lt=end, count__gt=0)
+        .order_by()
+        .values_list('user_id', 'hour', 'karma_type', 'count')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    user_chunks, hour_chunks, code_chunks, count_chunks = [], [], [], []
+    for source in (((*row, 1) for row in rows), rollups):
+        while True:
+            chunk = list(islice(source, chunk_size))
+            if not chunk:
+                break
+            user_ids, created, karma_types, counts = zip(*chunk)
+            user_chunks.append(np.fromiter(user_ids, dtype=np.int64, count=len(chunk)))
+            hour_chunks.append(np.fromiter(
+                (int(value.timestamp()) // SECONDS_PER_HOUR for value in created),
+                dtype=np.int64,
+                count=len(chunk)
+            ))
+            code_chunks.append(np.fromiter(
+                (type_codes.get(karma_type, -1) for karma_type in karma_types),
+                dtype=np.int64,
+                count=len(chunk)
+            ))
+            count_chunks.append(np.fromiter(counts, dtype=np.int64, count=len(chunk)))
+
+    if not user_chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return KarmaEvents(empty, empty, empty)
+
+    codes = np.concatenate(code_chunks)
+    known = codes >= 0
+    return KarmaEvents(
+        np.concatenate(user_chunks)[known],
+        np.concatenate(hour_chunks)[known],
+        points_table[codes[known]] * np.concatenate(count_chunks)[known]
+    )
+
+
+def compute_hourly_top_k(events, first_hour, last_hour, window_hours, top_k, max_cells=20000000):
+    """
+    Compute the top-K users for every snapshot hour in [first_hour, last_hour].
+
+    The snapshot at hour h ranks karma from buckets [h - window_hours, h),
+    i.e. the `window_hours` full hours before the hour boundary h.
+
+    Args:
+        events: KarmaEvents
+        first_hour, last_hour: Snapshot hour indexes (epoch seconds // 3600)
+        window_hours: Sliding window size in hours
+        top_k: Number of ranked users per snapshot
+        max_cells: Upper bound on the dense matrix size per block
+
+    Returns:
+        Tuple of int64 arrays (snapshot_hours, ranks, user_ids, karma),
+        ordered by hour then rank. Ties rank the lower user id first.
+
+    Raises:
+        ValueError: If max_cells cannot hold even a one-hour block
+    """
+    results = ([], [], [], [])
+    if not len(events) or last_hour < first_hour:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in results)
+
+    # Size blocks so that users x (block_hours + window_hours) stays under max_cells
+    total_users = len(np.unique(events.user_ids))
+    block_hours = max_cells // total_users - window_hours
+    if block_hours < 1:
+        raise ValueError(
+            f'max_cells={max_cells} is too small for {total_users} users and a '
+            f'{window_hours}h window (needs {total_users * (window_hours + 1)})'
+        )
+    block_hours = int(min(block_hours, 24 * 31))
+
+    for block_start in range(first_hour, last_hour + 1, block_hours):
+        block_end = min(block_start + block_hours, last_hour + 1)
+        base = block_start - window_hours
+        lo, hi = np.searchsorted(events.hours, [base, block_end - 1], side='left')
+        if lo == hi:
+            continue
+
+        block_users, user_index = np.unique(events.user_ids[lo:hi], return_inverse=True)
+        columns = block_end - 1 - base
+        flat = user_index * columns + (events.hours[lo:hi] - base)
+        hourly = np.bincount(
+            flat,
+            weights=events.points[lo:hi],
+            minlength=len(block_users) * columns
+        ).reshape(len(block_users), columns)
+
+        # cumulative[:, j] = karma in buckets [base, base + j)
+        cumulative = np.zeros((len(block_users), columns + 1), dtype=np.int64)
+        np.cumsum(hourly.astype(np.int64), axis=1, out=cumulative[:, 1:])
+        snapshots = block_end - block_start
+        totals = cumulative[:, window_hours:window_hours + snapshots] - cumulative[:, :snapshots]
+
+        _rank_columns(totals, block_users, block_start, top_k, results)
+
+    return tuple(
+        np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        for parts in results
+    )
+
+
+def _rank_columns(totals, user_ids, first_hour, top_k, results):
+    """Append the top-K of every column of `totals` (users x hours) to results."""
+    rows = totals.shape[0]
+    k = min(top_k, rows)
+    # K-th largest total of every column: nobody below it can be ranked, and
+    # users with no karma in the window are not ranked at all
+    kth = np.partition(totals, rows - k, axis=0)[rows - k]
+    row_index, columns = np.nonzero(totals >= np.maximum(kth, 1))
+    points = totals[row_index, columns]
+
+    # Sort by column, then karma desc, then user id asc (rows are in user id
+    # order), so users tied at the K-th place are cut by user id
+    order = np.lexsort((row_index, -points, columns))
+    row_index, columns, points = row_index[order], columns[order], points[order]
+    ranks = np.arange(len(columns)) - np.searchsorted(columns, columns) + 1
+    keep = ranks <= k
+
+    results[0].append(first_hour + columns[keep])
+    results[1].append(ranks[keep])
+    results[2].append(user_ids[row_index[keep]])
+    results[3].append(points[keep])
+
+
+def write_snapshots(window_hours, first_hour, last_hour, snapshot_hours, ranks, user_ids, karma,
+                    batch_size=5000):
+    """
+    Replace the stored snapshots for the hour range with the computed ones.
+
+    Returns:
+        Number of snapshot rows written
+    """
+    with transaction.atomic():
+        LeaderboardSnapshot.objects.filter(
+            window_hours=window_hours,
+            snapshot_at__gte=hour_to_datetime(first_hour),
+            snapshot_at__lte=hour_to_datetime(last_hour)
+        ).delete()
+
+        rows = (
+            LeaderboardSnapshot(
+                window_hours=window_hours,
+                snapshot_at=hour_to_datetime(hour),
+                rank=rank,
+                user_id=user_id,
+                karma=points
+            )
+            for hour, rank, user_id, points in zip(
+                snapshot_hours.tolist(), ranks.tolist(), user_ids.tolist(), karma.tolist()
+            )
+        )
+        written = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            LeaderboardSnapshot.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def synthetic_events(count, users, first_hour, last_hour, window_hours, seed=0):
+    """
+    Generate random karma events for benchmarking.
+
+    User activity follows a Zipf-like distribution, as real karma does.
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = np.minimum(rng.zipf(1.3, size=count), users).astype(np.int64)
+    hours = rng.integers(first_hour - window_hours, last_hour, size=count, dtype=np.int64)
+    points = np.where(rng.random(count) < 0.3, 5, 1).astype(np.int64)
+    return KarmaEvents(user_ids, hours, points)
+
+
+def datetime_to_hour(value):
+    return int(value.timestamp()) // SECONDS_PER_HOUR
+
+
+def hour_to_datetime(hour):
+    return datetime.fromtimestamp(int(hour) * SECONDS_PER_HOUR, tz=dt_timezone.utc)
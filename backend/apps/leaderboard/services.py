@@ -6,11 +6,25 @@ NO daily karma is stored on the User model - it's always computed on-demand.
 
 The key query aggregates karma points from the last 24 hours, groups by user,
 and orders by total points descending.
+
+All-time totals are the one exception: they are read from the KarmaCounter
+running totals, which grow with the user rather than with their history.
 """
 from datetime import timedelta
-from django.db.models import Sum
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
 from django.utils import timezone
-from apps.users.models import KarmaTransaction, User
+from apps.users.models import KarmaTransaction, KarmaCounter, KarmaRollup, User
+
+
+# Default windows (in hours) reported by get_user_karma_windows: 1h, 24h, 7d
+DEFAULT_KARMA_WINDOWS = (1, 24, 168)
+
+# Bucket sizes supported by get_user_karma_series
+SERIES_BUCKETS = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+}
 
 
 def get_leaderboard(limit=5, hours=24):
@@ -66,7 +80,41 @@ def get_leaderboard(limit=5, hours=24):
         for user in User.objects.filter(id__in=user_ids)
     }
     
-    # Build the result list
+    return _build_leaderboard(karma_rankings, users_by_id)
+
+
+async def aget_leaderboard(limit=5, hours=24):
+    """
+    Async version of get_leaderboard, using the async ORM.
+
+    Same two queries; used by the ASGI leaderboard view.
+    """
+    cutoff_time = timezone.now() - timedelta(hours=hours)
+    
+    karma_rankings = [
+        entry async for entry in
+        KarmaTransaction.objects
+        .filter(created_at__gte=cutoff_time)
+        .values('user_id')
+        .annotate(total_karma=Sum('points'))
+        .order_by('-total_karma')
+        [:limit]
+    ]
+    
+    if not karma_rankings:
+        return []
+    
+    user_ids = [entry['user_id'] for entry in karma_rankings]
+    users_by_id = {
+        user.id: user
+        async for user in User.objects.filter(id__in=user_ids)
+    }
+    
+    return _build_leaderboard(karma_rankings, users_by_id)
+
+
+def _build_leaderboard(karma_rankings, users_by_id):
+    """Rank the aggregated rows, skipping users that no longer exist."""
     result = []
     for rank, entry in enumerate(karma_rankings, start=1):
         user = users_by_id.get(entry['user_id'])
@@ -118,13 +166,166 @@ def get_user_karma_breakdown(user_id, hours=24):
     return result
 
 
+def get_user_karma_windows(user_id, windows=DEFAULT_KARMA_WINDOWS):
+    """
+    Get per-type karma for several time windows plus all-time totals.
+
+    All windows come from ONE conditional-aggregation query over the
+    user's transactions in the widest window (served by the
+    (user, created_at) index):
+
+    SELECT
+        karma_type,
+        SUM(points) FILTER (WHERE created_at >= NOW() - INTERVAL '1 hour'),
+        SUM(points) FILTER (WHERE created_at >= NOW() - INTERVAL '24 hours'),
+        SUM(points) FILTER (WHERE created_at >= NOW() - INTERVAL '168 hours')
+    FROM karma_transactions
+    WHERE user_id = %s AND created_at >= NOW() - INTERVAL '168 hours'
+    GROUP BY karma_type;
+
+    All-time totals are a primary key lookup on KarmaCounter.
+
+    Args:
+        user_id: The user to report on
+        windows: Iterable of window sizes in hours
+
+    Returns:
+        Dict with a 'windows' entry keyed by window size in hours and an
+        'all_time' entry, each holding post/comment/total karma
+    """
+    now = timezone.now()
+    cutoffs = {hours: now - timedelta(hours=hours) for hours in windows}
+
+    result = {
+        'windows': {hours: _empty_karma_totals() for hours in cutoffs},
+        'all_time': _empty_karma_totals(),
+    }
+
+    if cutoffs:
+        aggregates = {
+            f'karma_{hours}h': Sum('points', filter=Q(created_at__gte=cutoff))
+            for hours, cutoff in cutoffs.items()
+        }
+        rows = (
+            KarmaTransaction.objects
+            .filter(user_id=user_id, created_at__gte=min(cutoffs.values()))
+            .values('karma_type')
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            field = KarmaCounter.FIELD_FOR_TYPE.get(row['karma_type'])
+            if field is None:
+                continue
+            for hours in cutoffs:
+                points = row[f'karma_{hours}h'] or 0
+                totals = result['windows'][hours]
+                totals[field] += points
+                totals['total_karma'] += points
+
+    counter = KarmaCounter.objects.filter(user_id=user_id).first()
+    if counter:
+        result['all_time'] = {
+            'post_likes_karma': counter.post_likes_karma,
+            'comment_likes_karma': counter.comment_likes_karma,
+            'total_karma': counter.total_karma,
+        }
+
+    return result
+
+
 def get_user_total_karma(user_id):
     """
-    Get total all-time karma for a user.
+    Get total all-time karma for a user from their running counter.
     """
     total = (
-        KarmaTransaction.objects
+        KarmaCounter.objects
         .filter(user_id=user_id)
-        .aggregate(total=Sum('points'))
+        .values_list('total_karma', flat=True)
+        .first()
     )
-    return total['total'] or 0
+    return total or 0
+
+
+def get_user_karma_series(user_id, bucket, start, end):
+    """
+    Get a user's karma as a dense, zero-filled time series.
+
+    Buckets are computed in the database with date truncation over the
+    (user, created_at) index, so only one row per non-empty bucket is
+    returned:
+
+    SELECT
+        date_trunc('hour', created_at) AS bucket,
+        SUM(points)
+    FROM karma_transactions
+    WHERE user_id = %s AND created_at >= %s AND created_at < %s
+    GROUP BY bucket;
+
+    Archived karma is read the same way from the hourly KarmaRollup rows
+    (over their (user, hour) index), in the same query with UNION ALL. Empty buckets are
+    filled with zeros in Python.
+
+    Args:
+        user_id: The user to report on
+        bucket: 'hour' or 'day'
+        start: Aware datetime, inclusive (floored to the bucket boundary)
+        end: Aware datetime, exclusive
+
+    Returns:
+        Dict with the floored 'start' and parallel 'timestamps' (epoch
+        seconds of each bucket start) and 'points' lists
+    """
+    trunc, step = SERIES_BUCKETS[bucket]
+    start = _floor_to_bucket(start, bucket)
+
+    rows = (
+        KarmaTransaction.objects
+        .filter(user_id=user_id, created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=trunc('created_at'))
+        .values('bucket')
+        .annotate(total=Sum('points'))
+        .order_by()
+    )
+    archived_rows = (
+        KarmaRollup.objects
+        .filter(user_id=user_id, hour__gte=start, hour__lt=end)
+        .annotate(bucket=trunc('hour'))
+        .values('bucket')
+        .annotate(total=Sum('points'))
+        .order_by()
+    )
+    points_by_bucket = {}
+    # One round trip: UNION ALL of the live and the archived buckets
+    for row in rows.union(archived_rows, all=True):
+        timestamp = int(row['bucket'].timestamp())
+        points_by_bucket[timestamp] = points_by_bucket.get(timestamp, 0) + row['total']
+
+    timestamps = []
+    points = []
+    current = start
+    while current < end:
+        timestamp = int(current.timestamp())
+        timestamps.append(timestamp)
+        points.append(points_by_bucket.get(timestamp, 0))
+        current += step
+
+    return {
+        'start': start,
+        'timestamps': timestamps,
+        'points': points,
+    }
+
+
+def _floor_to_bucket(value, bucket):
+    value = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        value = value.replace(hour=0)
+    return value
+
+
+def _empty_karma_totals():
+    return {
+        'post_likes_karma': 0,
+        'comment_likes_karma': 0,
+        'total_karma': 0,
+    }
@@ -6,11 +6,16 @@ These tests verify that:
 2. Only karma from the last 24 hours is counted
 3. The ranking order is correct
 """
+from io import StringIO
 from datetime import timedelta
 from django.test import TestCase
 from django.utils import timezone
 from apps.users.models import User, KarmaTransaction
-from apps.leaderboard.services import get_leaderboard, get_user_karma_breakdown
+from apps.users.services import award_karma
+from apps.leaderboard.services import (
+    get_leaderboard, get_user_karma_breakdown, get_user_karma_windows,
+    get_user_karma_series
+)
 
 
 class LeaderboardCalculationTests(TestCase):
@@ -162,6 +167,51 @@ class LeaderboardCalculationTests(TestCase):
         self.assertEqual(breakdown['comment_likes_karma'], 1)
         self.assertEqual(breakdown['total_karma_24h'], 11)
 
+    def test_karma_windows_single_query(self):
+        """Test that every window and the all-time total come from one scan plus a counter lookup."""
+        now = timezone.now()
+        award_karma(self.user1.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 1)
+        award_karma(self.user1.id, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE, 'comment', 1)
+        old = award_karma(self.user1.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 2)
+        old.created_at = now - timedelta(hours=30)
+        old.save()
+        ancient = award_karma(self.user1.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 3)
+        ancient.created_at = now - timedelta(days=30)
+        ancient.save()
+        
+        with self.assertNumQueries(2):
+            karma = get_user_karma_windows(self.user1.id, windows=(1, 24, 168))
+        
+        self.assertEqual(karma['windows'][1]['total_karma'], 6)
+        self.assertEqual(karma['windows'][24]['post_likes_karma'], 5)
+        self.assertEqual(karma['windows'][24]['comment_likes_karma'], 1)
+        self.assertEqual(karma['windows'][168]['post_likes_karma'], 10)
+        self.assertEqual(karma['all_time']['post_likes_karma'], 15)
+        self.assertEqual(karma['all_time']['total_karma'], 16)
+
+    def test_karma_series_is_dense(self):
+        """Test that the hourly series is zero-filled between karma events."""
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=5)
+        for hours_after, object_id in [(0, 1), (0, 2), (3, 3)]:
+            karma = KarmaTransaction.objects.create(
+                user=self.user1,
+                karma_type=KarmaTransaction.KARMA_TYPE_POST_LIKE,
+                points=5,
+                content_type='post',
+                object_id=object_id
+            )
+            karma.created_at = start + timedelta(hours=hours_after, minutes=10)
+            karma.save()
+        
+        with self.assertNumQueries(1):
+            series = get_user_karma_series(
+                self.user1.id, 'hour', start, start + timedelta(hours=5)
+            )
+        
+        self.assertEqual(series['points'], [10, 0, 0, 5, 0])
+        self.assertEqual(len(series['timestamps']), 5)
+        self.assertEqual(series['timestamps'][1] - series['timestamps'][0], 3600)
+
     def test_karma_points_values(self):
         """Test that karma point values are correct."""
         self.assertEqual(
@@ -214,3 +264,161 @@ class LeaderboardAPITests(TestCase):
         
         self.assertEqual(data['user_id'], self.user.id)
         self.assertEqual(data['karma_24h']['total_karma_24h'], 5)
+
+    def test_user_karma_windows_param(self):
+        """Test that the user karma endpoint reports each requested window."""
+        response = self.client.get(
+            f'/api/leaderboard/user/{self.user.id}/?windows=1,24,168'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data['windows']), {'1', '24', '168'})
+        self.assertEqual(data['windows']['168']['total_karma'], 5)
+
+    def test_user_karma_invalid_windows(self):
+        """Test that malformed windows are rejected."""
+        response = self.client.get(
+            f'/api/leaderboard/user/{self.user.id}/?windows=1,abc'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_karma_series_endpoint(self):
+        """Test the columnar karma series endpoint."""
+        response = self.client.get(
+            f'/api/leaderboard/user/{self.user.id}/series/?bucket=day'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['timestamps']), len(data['points']))
+        self.assertEqual(sum(data['points']), 5)
+
+    def test_user_karma_series_rejects_bad_bucket(self):
+        """Test that unknown bucket sizes are rejected."""
+        response = self.client.get(
+            f'/api/leaderboard/user/{self.user.id}/series/?bucket=minute'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class LeaderboardReplayTests(TestCase):
+    """Test the vectorized leaderboard replay engine."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@test.com',
+                password='testpass123'
+            )
+            for i in range(3)
+        ]
+        self.now = timezone.now()
+        # (user index, hours ago, karma type)
+        events = [
+            (0, 2, KarmaTransaction.KARMA_TYPE_POST_LIKE),
+            (1, 3, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE),
+            (1, 4, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE),
+            (2, 30, KarmaTransaction.KARMA_TYPE_POST_LIKE),
+        ]
+        for object_id, (index, hours_ago, karma_type) in enumerate(events):
+            karma = KarmaTransaction.objects.create(
+                user=self.users[index],
+                karma_type=karma_type,
+                points=KarmaTransaction.KARMA_POINTS[karma_type],
+                content_type='post',
+                object_id=object_id
+            )
+            karma.created_at = self.now - timedelta(hours=hours_ago)
+            karma.save()
+
+    def test_replay_matches_live_leaderboard(self):
+        """Test that the latest replayed snapshot matches get_leaderboard."""
+        from apps.leaderboard import replay
+        
+        last_hour = replay.datetime_to_hour(self.now)
+        events = replay.load_karma_events(
+            replay.hour_to_datetime(last_hour - 48),
+            replay.hour_to_datetime(last_hour),
+            24,
+            KarmaTransaction.KARMA_POINTS
+        )
+        hours, ranks, user_ids, karma = replay.compute_hourly_top_k(
+            events, last_hour - 48, last_hour, window_hours=24, top_k=5
+        )
+        
+        latest = hours == last_hour
+        self.assertEqual(
+            list(zip(user_ids[latest].tolist(), karma[latest].tolist())),
+            [(self.users[0].id, 5), (self.users[1].id, 2)]
+        )
+        # 28 hours earlier, user2's post like is still inside the window
+        earlier = hours == last_hour - 28
+        self.assertEqual(user_ids[earlier].tolist()[0], self.users[2].id)
+
+    def test_replay_reads_archived_rollups(self):
+        """Test that archived karma is replayed from its hourly rollups."""
+        import shutil
+        import tempfile
+        from apps.leaderboard import replay
+        from apps.users.services import archive_karma_period
+        
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        archive_karma_period(self.now - timedelta(hours=5), self.now - timedelta(hours=1), archive_dir)
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+        
+        last_hour = replay.datetime_to_hour(self.now)
+        events = replay.load_karma_events(
+            replay.hour_to_datetime(last_hour - 1),
+            replay.hour_to_datetime(last_hour),
+            24,
+            {**KarmaTransaction.KARMA_POINTS, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE: 10}
+        )
+        hours, ranks, user_ids, karma = replay.compute_hourly_top_k(
+            events, last_hour - 1, last_hour, window_hours=24, top_k=5
+        )
+        
+        latest = hours == last_hour
+        self.assertEqual(
+            list(zip(user_ids[latest].tolist(), karma[latest].tolist())),
+            [(self.users[1].id, 20), (self.users[0].id, 5)]
+        )
+
+    def test_replay_breaks_ties_at_the_cutoff_on_user_id(self):
+        """Test that users tied at the K-th place are ranked by user id."""
+        import numpy as np
+        from apps.leaderboard import replay
+        
+        # Users 9, 7, 3 and 5 tie at 1 point behind user 8 with 5 points
+        user_ids = np.array([9, 7, 8, 3, 5], dtype=np.int64)
+        events = replay.KarmaEvents(
+            user_ids, np.full(5, 99, dtype=np.int64), np.array([1, 1, 5, 1, 1], dtype=np.int64)
+        )
+        _, ranks, ranked_users, karma = replay.compute_hourly_top_k(
+            events, 100, 100, window_hours=1, top_k=3
+        )
+        self.assertEqual(ranked_users.tolist(), [8, 3, 5])
+        self.assertEqual(ranks.tolist(), [1, 2, 3])
+        self.assertEqual(karma.tolist(), [5, 1, 1])
+        
+        with self.assertRaises(ValueError):
+            replay.compute_hourly_top_k(events, 100, 100, window_hours=1, top_k=3, max_cells=5)
+
+    def test_replay_command_writes_snapshots_with_new_rules(self):
+        """Test that replaying with overridden points stores re-ranked snapshots."""
+        from django.core.management import call_command
+        from apps.leaderboard.models import LeaderboardSnapshot
+        
+        call_command(
+            'replay_leaderboard',
+            '--from', (self.now - timedelta(hours=1)).isoformat(),
+            '--to', self.now.isoformat(),
+            '--points', 'comment_like=10',
+            stdout=StringIO()
+        )
+        
+        latest = LeaderboardSnapshot.objects.filter(window_hours=24).first()
+        self.assertEqual(latest.user_id, self.users[1].id)
+        self.assertEqual(latest.karma, 20)
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = 'leaderboard'
 
 urlpatterns = [
-    path('', views.LeaderboardView.as_view(), name='leaderboard'),
+    path(
+        '',
+        (views_async if settings.ASYNC_VIEWS else views).LeaderboardView.as_view(),
+        name='leaderboard'
+    ),
     path('user/<int:user_id>/', views.UserKarmaView.as_view(), name='user-karma'),
+    path('user/<int:user_id>/series/', views.UserKarmaSeriesView.as_view(), name='user-karma-series'),
 ]
@@ -1,3 +1,7 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from . import services
@@ -29,6 +33,9 @@ class LeaderboardView(APIView):
         ]
     }
     """
+    # session + rankings + users
+    query_budget = 3
+    replica_reads = True
 
     def get(self, request):
         # Get optional parameters
@@ -51,18 +58,167 @@ class UserKarmaView(APIView):
     """
     Get karma details for a specific user.
     
-    GET /api/leaderboard/user/<user_id>/
+    GET /api/leaderboard/user/<user_id>/?windows=1,24,168
+    
+    Every requested window (in hours, max 168) is computed from a single
+    conditional-aggregation query; all-time totals come from the user's
+    running KarmaCounter.
+    
+    Response format:
+    {
+        "user_id": 1,
+        "karma_24h": {
+            "post_likes_karma": 10,
+            "comment_likes_karma": 1,
+            "total_karma_24h": 11
+        },
+        "windows": {
+            "1": {"post_likes_karma": 5, "comment_likes_karma": 0, "total_karma": 5},
+            "24": {...},
+            "168": {...}
+        },
+        "all_time": {"post_likes_karma": 40, "comment_likes_karma": 3, "total_karma": 43},
+        "total_karma_all_time": 43
+    }
     """
+    # session + windowed karma + counter
+    query_budget = 3
+    replica_reads = True
+    max_windows = 6
 
     def get(self, request, user_id):
         hours = int(request.query_params.get('hours', 24))
         hours = min(max(hours, 1), 168)
         
-        breakdown = services.get_user_karma_breakdown(user_id, hours=hours)
-        total_karma = services.get_user_total_karma(user_id)
+        windows_param = request.query_params.get('windows')
+        if windows_param:
+            try:
+                windows = [int(value) for value in windows_param.split(',') if value.strip()]
+            except ValueError:
+                return Response(
+                    {'error': 'windows must be a comma-separated list of hours'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            windows = [min(max(value, 1), 168) for value in windows]
+            if len(windows) > self.max_windows:
+                return Response(
+                    {'error': f'At most {self.max_windows} windows are allowed'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            windows = list(services.DEFAULT_KARMA_WINDOWS)
+        
+        # The legacy 'karma_24h' block is served from the same query
+        karma = services.get_user_karma_windows(
+            user_id, windows=sorted(set(windows) | {hours})
+        )
+        breakdown = karma['windows'][hours]
         
         return Response({
             'user_id': user_id,
-            'karma_24h': breakdown,
-            'total_karma_all_time': total_karma,
+            'karma_24h': {
+                'post_likes_karma': breakdown['post_likes_karma'],
+                'comment_likes_karma': breakdown['comment_likes_karma'],
+                'total_karma_24h': breakdown['total_karma'],
+            },
+            'windows': {
+                str(window): karma['windows'][window]
+                for window in sorted(set(windows))
+            },
+            'all_time': karma['all_time'],
+            'total_karma_all_time': karma['all_time']['total_karma'],
         })
+
+
+class UserKarmaSeriesView(APIView):
+    """
+    Get a user's karma over time for charts.
+    
+    GET /api/leaderboard/user/<user_id>/series/?bucket=hour|day&from=&to=
+    
+    'from' and 'to' accept ISO dates or datetimes. They default to the
+    last 24 hours (hourly buckets) or the last 30 days (daily buckets).
+    Every bucket in the range is present; buckets without karma are 0.
+    Karma older than KARMA_RETENTION_DAYS has been archived, and is
+    included from its hourly KarmaRollup rows: at hourly resolution, so
+    it lands in the bucket of the hour it was earned.
+    
+    Response format (columnar, timestamps are bucket starts in epoch seconds):
+    {
+        "user_id": 1,
+        "bucket": "hour",
+        "from": "2026-01-01T00:00:00Z",
+        "to": "2026-01-02T00:00:00Z",
+        "timestamps": [1767225600, 1767229200, ...],
+        "points": [0, 5, ...]
+    }
+    """
+    default_ranges = {
+        'hour': timedelta(hours=24),
+        'day': timedelta(days=30),
+    }
+    max_buckets = 744  # 31 days of hourly buckets
+    # session + bucketed karma (live and archived in one query)
+    query_budget = 2
+    replica_reads = True
+
+    def get(self, request, user_id):
+        bucket = request.query_params.get('bucket', 'hour')
+        if bucket not in services.SERIES_BUCKETS:
+            return Response(
+                {'error': 'bucket must be "hour" or "day"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            end = self._parse_bound(request.query_params.get('to')) or timezone.now()
+            start = (
+                self._parse_bound(request.query_params.get('from'))
+                or end - self.default_ranges[bucket]
+            )
+        except ValueError:
+            return Response(
+                {'error': 'from/to must be ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if start >= end:
+            return Response(
+                {'error': '"from" must be before "to"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        _, step = services.SERIES_BUCKETS[bucket]
+        if (end - start) / step > self.max_buckets:
+            return Response(
+                {'error': f'Range too large: at most {self.max_buckets} buckets'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        series = services.get_user_karma_series(user_id, bucket, start, end)
+        
+        return Response({
+            'user_id': user_id,
+            'bucket': bucket,
+            'from': series['start'],
+            'to': end,
+            'timestamps': series['timestamps'],
+            'points': series['points'],
+        })
+
+    @staticmethod
+    def _parse_bound(value):
+        """Parse an ISO date or datetime query parameter into an aware datetime."""
+        if not value:
+            return None
+        
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                raise ValueError(value)
+            parsed = datetime.combine(parsed_date, time.min)
+        
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
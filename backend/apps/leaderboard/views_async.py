@@ -0,0 +1,30 @@
+"""
+Async versions of the leaderboard read views, served under ASGI when
+ASYNC_VIEWS is enabled. See apps/core/asyncviews.py.
+"""
+from django.views import View
+from apps.core.asyncviews import json_response
+from . import services
+
+
+class LeaderboardView(View):
+    """
+    Async GET /api/leaderboard/ (same parameters and response as views.LeaderboardView).
+    """
+    # rankings + users (unlike DRF's APIView, nothing loads the session)
+    query_budget = 2
+    replica_reads = True
+
+    async def get(self, request):
+        limit = int(request.GET.get('limit', 5))
+        hours = int(request.GET.get('hours', 24))
+        
+        limit = min(max(limit, 1), 100)
+        hours = min(max(hours, 1), 168)
+        
+        leaderboard = await services.aget_leaderboard(limit=limit, hours=hours)
+        
+        return json_response({
+            'leaderboard': leaderboard,
+            'time_window_hours': hours,
+        })
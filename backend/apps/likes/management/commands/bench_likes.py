@@ -0,0 +1,231 @@
+"""
+Management command to benchmark like throughput under concurrent workers.
+
+Creates a set of benchmark users and posts, then runs N workers (threads
+or processes) that toggle likes on random posts for a fixed duration,
+each through like_post/unlike_post exactly as the API does. Reports
+throughput, latency percentiles and errors such as "database is locked",
+and checks afterwards that every like_count matches its PostLike rows.
+The benchmark rows are deleted at the end unless --keep is given.
+
+Compare settings by running it twice, e.g. with DB_CONN_MAX_AGE=0 or
+with the stock SQLite backend.
+
+Examples:
+    python manage.py bench_likes --workers 8 --duration 10
+    python manage.py bench_likes --mode processes --workers 4 --posts 5
+"""
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Count, F
+from apps.core.benchmarks import init_worker_process, percentile, worker_process_context
+from apps.likes.services import like_post, unlike_post
+from apps.posts.models import Post
+from apps.users.models import User
+
+BENCH_PREFIX = 'bench_likes_'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent like/unlike throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Concurrent workers'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['threads', 'processes'],
+            default='threads',
+            help='Run workers as threads (one process) or as separate processes'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5.0,
+            help='Seconds each worker runs'
+        )
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=20,
+            help='Posts to like (fewer posts means more row contention)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Users that like posts'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark users and posts'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['posts'] < 1 or options['users'] < 1:
+            raise CommandError('--workers, --posts and --users must be positive')
+
+        user_ids, post_ids = self._create_fixtures(options['users'], options['posts'])
+        try:
+            worker_args = [
+                (user_ids, post_ids, options['duration'], options['seed'] + index)
+                for index in range(options['workers'])
+            ]
+            start = time.perf_counter()
+            if options['mode'] == 'threads':
+                with ThreadPoolExecutor(options['workers']) as pool:
+                    results = list(pool.map(_run_worker_thread, *zip(*worker_args)))
+            else:
+                # Children must not inherit (and share) this process's connection
+                connections.close_all()
+                with ProcessPoolExecutor(
+                    options['workers'],
+                    mp_context=worker_process_context(),
+                    initializer=init_worker_process
+                ) as pool:
+                    results = list(pool.map(_run_worker, *zip(*worker_args)))
+            elapsed = time.perf_counter() - start
+
+            report = self._report(options, results, elapsed, post_ids)
+        finally:
+            if not options['keep']:
+                self._delete_fixtures()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['vendor']} ({report['journal_mode'] or 'n/a'}), "
+            f"{report['workers']} {report['mode']}, {report['elapsed_seconds']}s"
+        )
+        self.stdout.write(
+            f"{report['operations']} like toggles, {report['ops_per_second']} ops/s, "
+            f"{report['errors']} errors"
+        )
+        self.stdout.write(
+            f"latency ms: p50 {report['latency_ms']['p50']}, "
+            f"p95 {report['latency_ms']['p95']}, p99 {report['latency_ms']['p99']}"
+        )
+        for message, count in report['error_types'].items():
+            self.stdout.write(f'  {count} x {message}')
+        if report['mismatched_like_counts']:
+            self.stdout.write(self.style.ERROR(
+                f"{report['mismatched_like_counts']} posts have a like_count "
+                'that does not match their likes'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('All like counts match their likes.'))
+
+    def _create_fixtures(self, users, posts):
+        self._delete_fixtures()
+        author = User.objects.create_user(username=f'{BENCH_PREFIX}author')
+        User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}{index}') for index in range(users)
+        ])
+        Post.objects.bulk_create([
+            Post(author=author, content=f'Benchmark post {index}') for index in range(posts)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)
+            .exclude(id=author.id)
+            .values_list('id', flat=True)
+        )
+        post_ids = list(Post.objects.filter(author=author).values_list('id', flat=True))
+        return user_ids, post_ids
+
+    def _delete_fixtures(self):
+        # Cascades to the benchmark posts, likes and karma
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def _report(self, options, results, elapsed, post_ids):
+        latencies = sorted(latency for result in results for latency in result['latencies'])
+        error_types = {}
+        for result in results:
+            for message, count in result['errors'].items():
+                error_types[message] = error_types.get(message, 0) + count
+
+        mismatched = (
+            Post.objects.filter(id__in=post_ids)
+            .annotate(likes=Count('post_likes'))
+            .exclude(like_count=F('likes'))
+            .count()
+        )
+
+        journal_mode = None
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+
+        return {
+            'vendor': connection.vendor,
+            'journal_mode': journal_mode,
+            'mode': options['mode'],
+            'workers': options['workers'],
+            'posts': options['posts'],
+            'elapsed_seconds': round(elapsed, 2),
+            'operations': len(latencies),
+            'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'errors': sum(error_types.values()),
+            'error_types': error_types,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+            },
+            'mismatched_like_counts': mismatched,
+        }
+
+
+def _run_worker(user_ids, post_ids, duration, seed):
+    """Toggle random likes for `duration` seconds; return latencies and errors."""
+    rng = random.Random(seed)
+    users = User.objects.in_bulk(user_ids)
+    latencies = []
+    errors = {}
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        user = users[rng.choice(user_ids)]
+        post_id = rng.choice(post_ids)
+        start = time.perf_counter()
+        try:
+            success, _, _ = like_post(user, post_id)
+            if not success:
+                unlike_post(user, post_id)
+        except DatabaseError as exc:
+            message = str(exc).splitlines()[0]
+            errors[message] = errors.get(message, 0) + 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {'latencies': latencies, 'errors': errors}
+
+
+def _run_worker_thread(*args):
+    try:
+        return _run_worker(*args)
+    finally:
+        connection.close()
+
@@ -0,0 +1,395 @@
+"""
+Management command to stress like toggling on one hot post.
+
+Where bench_likes spreads likes over many posts to measure throughput,
+this harness points every worker at the same post and its comments, the
+worst case for row locks. N workers (threads or processes) call
+toggle_post_like / toggle_comment_like exactly as the API does for a
+fixed duration. It reports:
+
+- throughput, latency percentiles and errors by message
+- toggles that did nothing because another request for the same user
+  got there first (the toggle checks outside its transaction)
+- lock waits: locking statements (BEGIN IMMEDIATE on SQLite,
+  SELECT ... FOR UPDATE, INSERT, UPDATE, DELETE) that took longer than
+  --lock-threshold-ms, by statement kind
+
+Afterwards it verifies the bookkeeping: every like_count equals its like
+rows, there is exactly one KarmaTransaction per like (and none without
+one), and the author's KarmaCounter equals their karma rows (after
+applying any pending outbox events). The command fails if any check
+fails. The fixture rows are deleted unless --keep.
+
+It runs against the default database; point DATABASE_URL at a local
+PostgreSQL to stress that instead of SQLite.
+
+Examples:
+    python manage.py stress_likes --workers 16 --duration 10
+    DATABASE_URL=postgres://localhost/feed python manage.py stress_likes --mode processes
+"""
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Count, F, Sum
+from apps.comments.models import Comment
+from apps.core.benchmarks import init_worker_process, latency_summary, worker_process_context
+from apps.events.services import drain_outbox
+from apps.likes.models import PostLike, CommentLike
+from apps.likes.services import toggle_comment_like, toggle_post_like
+from apps.posts.models import Post
+from apps.users.models import User, KarmaTransaction, KarmaCounter
+
+STRESS_PREFIX = 'stress_likes_'
+
+
+class Command(BaseCommand):
+    help = 'Stress concurrent like toggles on one post and verify the bookkeeping'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent workers'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['threads', 'processes'],
+            default='threads',
+            help='Run workers as threads (one process) or as separate processes'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5.0,
+            help='Seconds each worker runs'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Users toggling likes (fewer users means more same-user races)'
+        )
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=3,
+            help='Comments on the hot post that are toggled too'
+        )
+        parser.add_argument(
+            '--comment-share',
+            type=float,
+            default=0.3,
+            help='Fraction of toggles that target a comment instead of the post'
+        )
+        parser.add_argument(
+            '--lock-threshold-ms',
+            type=float,
+            default=5.0,
+            help='Locking statements slower than this count as lock waits'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the results as JSON'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the fixture users, post and comments'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['users'] < 1:
+            raise CommandError('--workers and --users must be positive')
+        if options['comments'] < 0:
+            raise CommandError('--comments cannot be negative')
+
+        user_ids, post_id, comment_ids = self._create_fixtures(
+            options['users'], options['comments']
+        )
+        try:
+            worker_args = [
+                (user_ids, post_id, comment_ids, options['duration'], options['comment_share'],
+                 options['lock_threshold_ms'], options['seed'] + index)
+                for index in range(options['workers'])
+            ]
+            start = time.perf_counter()
+            if options['mode'] == 'threads':
+                with ThreadPoolExecutor(options['workers']) as pool:
+                    results = list(pool.map(_run_worker_thread, *zip(*worker_args)))
+            else:
+                # Children must not inherit (and share) this process's connection
+                connections.close_all()
+                with ProcessPoolExecutor(
+                    options['workers'],
+                    mp_context=worker_process_context(),
+                    initializer=init_worker_process
+                ) as pool:
+                    results = list(pool.map(_run_worker, *zip(*worker_args)))
+            elapsed = time.perf_counter() - start
+
+            report = self._report(options, results, elapsed)
+            report['like_count'] = Post.objects.get(id=post_id).like_count
+            # With OUTBOX_DEFERRED, karma is only consistent once the outbox is applied
+            report['outbox_events_applied'] = drain_outbox()
+            report['violations'] = check_like_invariants([post_id], comment_ids)
+        finally:
+            if not options['keep']:
+                self._delete_fixtures()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+        if report['violations']:
+            raise CommandError(f"{len(report['violations'])} bookkeeping check(s) failed")
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"{report['vendor']} ({report['journal_mode'] or 'n/a'}), "
+            f"{report['workers']} {report['mode']} on one post, {report['elapsed_seconds']}s"
+        )
+        self.stdout.write(
+            f"{report['operations']} toggles, {report['ops_per_second']} ops/s, "
+            f"{report['noop_toggles']} no-op, {report['errors']} errors"
+        )
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"latency ms: p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, "
+            f"max {latency['max']}"
+        )
+        for kind, waits in report['lock_waits'].items():
+            self.stdout.write(
+                f"  lock waits on {kind}: {waits['count']} "
+                f"({waits['total_ms']} ms, > {report['lock_threshold_ms']} ms each)"
+            )
+        for message, count in report['error_types'].items():
+            self.stdout.write(f'  {count} x {message}')
+        for violation in report['violations']:
+            self.stdout.write(self.style.ERROR(violation))
+        if not report['violations']:
+            self.stdout.write(self.style.SUCCESS(
+                'Like counts, karma rows and karma counters are consistent.'
+            ))
+
+    def _create_fixtures(self, users, comments):
+        self._delete_fixtures()
+        author = User.objects.create_user(username=f'{STRESS_PREFIX}author')
+        User.objects.bulk_create([
+            User(username=f'{STRESS_PREFIX}{index}') for index in range(users)
+        ])
+        post = Post.objects.create(author=author, content='Stress test post')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=author, content=f'Stress test comment {index}')
+            for index in range(comments)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=STRESS_PREFIX)
+            .exclude(id=author.id)
+            .values_list('id', flat=True)
+        )
+        comment_ids = list(Comment.objects.filter(post=post).values_list('id', flat=True))
+        return user_ids, post.id, comment_ids
+
+    def _delete_fixtures(self):
+        # Cascades to the post, comments, likes and karma
+        User.objects.filter(username__startswith=STRESS_PREFIX).delete()
+
+    def _report(self, options, results, elapsed):
+        latencies = [latency for result in results for latency in result['latencies']]
+        error_types = Counter()
+        lock_waits = {}
+        for result in results:
+            error_types.update(result['errors'])
+            for kind, (count, total_ms) in result['lock_waits'].items():
+                waits = lock_waits.setdefault(kind, {'count': 0, 'total_ms': 0.0})
+                waits['count'] += count
+                waits['total_ms'] += total_ms
+        for waits in lock_waits.values():
+            waits['total_ms'] = round(waits['total_ms'], 1)
+
+        journal_mode = None
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+
+        return {
+            'vendor': connection.vendor,
+            'journal_mode': journal_mode,
+            'mode': options['mode'],
+            'workers': options['workers'],
+            'users': options['users'],
+            'elapsed_seconds': round(elapsed, 2),
+            'operations': len(latencies),
+            'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'noop_toggles': sum(result['noops'] for result in results),
+            'errors': sum(error_types.values()),
+            'error_types': dict(error_types),
+            'latency_ms': latency_summary(latencies),
+            'lock_threshold_ms': options['lock_threshold_ms'],
+            'lock_waits': lock_waits,
+        }
+
+
+def check_like_invariants(post_ids, comment_ids):
+    """
+    Check the like bookkeeping of the given posts and comments.
+
+    Returns:
+        List of human-readable violations (empty if consistent)
+    """
+    violations = []
+    targets = (
+        (Post, PostLike, 'post', post_ids, KarmaTransaction.KARMA_TYPE_POST_LIKE),
+        (Comment, CommentLike, 'comment', comment_ids, KarmaTransaction.KARMA_TYPE_COMMENT_LIKE),
+    )
+    author_ids = set()
+    for model, like_model, content_type, ids, karma_type in targets:
+        target_field = f'{content_type}_id'
+        mismatched = (
+            model.objects.filter(id__in=ids)
+            .annotate(likes=Count(f'{content_type}_likes'))
+            .exclude(like_count=F('likes'))
+            .values_list('id', 'like_count', 'likes')
+        )
+        for target_id, like_count, likes in mismatched:
+            violations.append(
+                f'{content_type} {target_id}: like_count is {like_count} '
+                f'but it has {likes} likes'
+            )
+
+        authors = dict(model.objects.filter(id__in=ids).values_list('id', 'author_id'))
+        author_ids.update(authors.values())
+        # Likes by the author earn no karma
+        expected = {
+            (target_id, user_id)
+            for target_id, user_id in like_model.objects.filter(**{f'{target_field}__in': ids})
+            .values_list(target_field, 'user_id')
+            if authors[target_id] != user_id
+        }
+        karma = list(
+            KarmaTransaction.objects
+            .filter(content_type=content_type, object_id__in=ids)
+            .values_list('object_id', 'actor_id', 'karma_type')
+        )
+        recorded = Counter((object_id, actor_id) for object_id, actor_id, _ in karma)
+        missing = expected - set(recorded)
+        orphaned = set(recorded) - expected
+        duplicated = [key for key, count in recorded.items() if count > 1]
+        wrong_type = sum(1 for *_, recorded_type in karma if recorded_type != karma_type)
+        for label, count in (
+            ('likes without a karma row', len(missing)),
+            ('karma rows without a like', len(orphaned)),
+            ('likes with more than one karma row', len(duplicated)),
+            ('karma rows of the wrong type', wrong_type),
+        ):
+            if count:
+                violations.append(f'{content_type}s: {count} {label}')
+
+    for author_id in author_ids:
+        earned = KarmaTransaction.objects.filter(user_id=author_id).aggregate(
+            total=Sum('points')
+        )['total'] or 0
+        counter = KarmaCounter.objects.filter(user_id=author_id).first()
+        counted = 0
+        if counter is not None:
+            archived = counter.archived_post_likes_karma + counter.archived_comment_likes_karma
+            counted = counter.total_karma - archived
+        if counted != earned:
+            violations.append(
+                f'user {author_id}: KarmaCounter has {counted} karma '
+                f'but their karma rows add up to {earned}'
+            )
+    return violations
+
+
+class LockWaitTimer:
+    """
+    Execute wrapper that counts locking statements slower than a threshold.
+
+    Plain SELECTs are not counted: readers do not wait for writers in
+    SQLite WAL mode or on PostgreSQL.
+    """
+
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms / 1000
+        # kind -> [count, total ms]
+        self.waits = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.threshold:
+                kind = _statement_kind(sql)
+                if kind is not None:
+                    waits = self.waits.setdefault(kind, [0, 0.0])
+                    waits[0] += 1
+                    waits[1] += elapsed * 1000
+
+
+def _statement_kind(sql):
+    verb = sql.lstrip()[:6].upper()
+    if verb == 'SELECT':
+        return 'select_for_update' if 'FOR UPDATE' in sql.upper() else None
+    if verb.startswith('BEGIN'):
+        return 'begin'
+    if verb in ('INSERT', 'UPDATE', 'DELETE'):
+        return verb.lower()
+    return None
+
+
+def _run_worker(user_ids, post_id, comment_ids, duration, comment_share, threshold_ms, seed):
+    """Toggle likes on the hot post and its comments for `duration` seconds."""
+    rng = random.Random(seed)
+    users = User.objects.in_bulk(user_ids)
+    timer = LockWaitTimer(threshold_ms)
+    latencies = []
+    errors = Counter()
+    noops = 0
+
+    with connection.execute_wrapper(timer):
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            user = users[rng.choice(user_ids)]
+            start = time.perf_counter()
+            try:
+                if comment_ids and rng.random() < comment_share:
+                    success, _, _ = toggle_comment_like(user, rng.choice(comment_ids))
+                else:
+                    success, _, _ = toggle_post_like(user, post_id)
+            except DatabaseError as exc:
+                errors[str(exc).splitlines()[0]] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not success:
+                noops += 1
+
+    return {
+        'latencies': latencies,
+        'errors': dict(errors),
+        'noops': noops,
+        'lock_waits': {kind: tuple(waits) for kind, waits in timer.waits.items()},
+    }
+
+
+def _run_worker_thread(*args):
+    try:
+        return _run_worker(*args)
+    finally:
+        connection.close()
@@ -4,15 +4,17 @@ Like service module that handles the business logic for likes.
 This module provides atomic operations for liking/unliking posts and comments,
 with proper handling of:
 1. Race conditions (using database transactions and unique constraints)
-2. Karma tracking (creating KarmaTransaction records)
-3. Like count denormalization (updating counts on Post/Comment models)
+2. Like count denormalization (updating counts on Post/Comment models)
+3. Karma, via post_liked/comment_liked (and *_unliked) outbox events that
+   the users app handles (see apps/users/handlers.py)
 """
 from django.db import transaction, IntegrityError
 from django.db.models import F
 from .models import PostLike, CommentLike
 from apps.posts.models import Post
 from apps.comments.models import Comment
-from apps.users.models import KarmaTransaction
+from apps.core.sql import delete_returning
+from apps.events.services import publish
 
 
 def like_post(user, post_id):
@@ -41,15 +43,8 @@ def like_post(user, post_id):
             # This is atomic at the database level
             Post.objects.filter(id=post_id).update(like_count=F('like_count') + 1)
             
-            # Create karma transaction for the post author
-            if post.author_id != user.id:  # Don't give karma for self-likes
-                KarmaTransaction.objects.create(
-                    user=post.author,
-                    karma_type=KarmaTransaction.KARMA_TYPE_POST_LIKE,
-                    points=KarmaTransaction.KARMA_POINTS[KarmaTransaction.KARMA_TYPE_POST_LIKE],
-                    content_type='post',
-                    object_id=post_id
-                )
+            # Karma for the post author, in this transaction or by the consumer
+            publish('post_liked', post_id=post_id, author_id=post.author_id, actor_id=user.id)
             
             # Refresh to get updated count
             post.refresh_from_db()
@@ -74,12 +69,10 @@ def unlike_post(user, post_id):
         with transaction.atomic():
             post = Post.objects.select_for_update().get(id=post_id)
             
-            # Try to find and delete the like
-            deleted_count, _ = PostLike.objects.filter(
-                user=user, post=post
-            ).delete()
+            # Try to find and delete the like (one DELETE ... RETURNING)
+            deleted = delete_returning(PostLike.objects.filter(user=user, post=post), 'created_at')
             
-            if deleted_count == 0:
+            if not deleted:
                 return False, 'You have not liked this post', post.like_count
             
             # Decrement like count using F() expression
@@ -88,13 +81,12 @@ def unlike_post(user, post_id):
             )
             
             # Remove the karma transaction
-            if post.author_id != user.id:
-                KarmaTransaction.objects.filter(
-                    user=post.author,
-                    karma_type=KarmaTransaction.KARMA_TYPE_POST_LIKE,
-                    content_type='post',
-                    object_id=post_id
-                ).delete()
+            # liked_at locates the karma if it has since been archived
+            publish(
+                'post_unliked',
+                post_id=post_id, author_id=post.author_id, actor_id=user.id,
+                liked_at=deleted[0][0].isoformat()
+            )
             
             post.refresh_from_db()
             return True, 'Post unliked successfully', post.like_count
@@ -119,15 +111,11 @@ def like_comment(user, comment_id):
                 like_count=F('like_count') + 1
             )
             
-            # Create karma transaction for the comment author
-            if comment.author_id != user.id:
-                KarmaTransaction.objects.create(
-                    user=comment.author,
-                    karma_type=KarmaTransaction.KARMA_TYPE_COMMENT_LIKE,
-                    points=KarmaTransaction.KARMA_POINTS[KarmaTransaction.KARMA_TYPE_COMMENT_LIKE],
-                    content_type='comment',
-                    object_id=comment_id
-                )
+            # Karma for the comment author
+            publish(
+                'comment_liked',
+                comment_id=comment_id, author_id=comment.author_id, actor_id=user.id
+            )
             
             comment.refresh_from_db()
             return True, 'Comment liked successfully', comment.like_count
@@ -147,24 +135,22 @@ def unlike_comment(user, comment_id):
         with transaction.atomic():
             comment = Comment.objects.select_for_update().get(id=comment_id)
             
-            deleted_count, _ = CommentLike.objects.filter(
-                user=user, comment=comment
-            ).delete()
+            deleted = delete_returning(
+                CommentLike.objects.filter(user=user, comment=comment), 'created_at'
+            )
             
-            if deleted_count == 0:
+            if not deleted:
                 return False, 'You have not liked this comment', comment.like_count
             
             Comment.objects.filter(id=comment_id).update(
                 like_count=F('like_count') - 1
             )
             
-            if comment.author_id != user.id:
-                KarmaTransaction.objects.filter(
-                    user=comment.author,
-                    karma_type=KarmaTransaction.KARMA_TYPE_COMMENT_LIKE,
-                    content_type='comment',
-                    object_id=comment_id
-                ).delete()
+            publish(
+                'comment_unliked',
+                comment_id=comment_id, author_id=comment.author_id, actor_id=user.id,
+                liked_at=deleted[0][0].isoformat()
+            )
             
             comment.refresh_from_db()
             return True, 'Comment unliked successfully', comment.like_count
@@ -1,9 +1,12 @@
 """
 Tests for the like functionality including concurrency handling.
 """
-from django.test import TestCase
-from django.db import IntegrityError
-from apps.users.models import User, KarmaTransaction
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.db import IntegrityError, connection
+from apps.users.models import User, KarmaTransaction, KarmaCounter
 from apps.posts.models import Post
 from apps.comments.models import Comment
 from apps.likes.models import PostLike, CommentLike
@@ -92,6 +95,36 @@ class LikeServiceTests(TestCase):
         self.assertEqual(like_count, 0)
         self.assertFalse(PostLike.objects.filter(user=self.user2, post=self.post).exists())
 
+    def test_karma_counter_tracks_like_and_unlike(self):
+        """Test that the author's running karma counter follows likes and unlikes."""
+        like_post(self.user2, self.post.id)
+        counter = KarmaCounter.objects.get(user=self.user1)
+        self.assertEqual(counter.post_likes_karma, 5)
+        self.assertEqual(counter.total_karma, 5)
+        
+        unlike_post(self.user2, self.post.id)
+        counter.refresh_from_db()
+        self.assertEqual(counter.total_karma, 0)
+
+    def test_unlike_only_reverses_own_karma(self):
+        """Test that one liker's unlike leaves other likers' karma in place."""
+        user3 = User.objects.create_user(
+            username='user3',
+            email='user3@test.com',
+            password='testpass123'
+        )
+        like_post(self.user2, self.post.id)
+        like_post(user3, self.post.id)
+        
+        unlike_post(self.user2, self.post.id)
+        
+        remaining = KarmaTransaction.objects.filter(
+            content_type='post',
+            object_id=self.post.id
+        )
+        self.assertEqual(list(remaining.values_list('actor_id', flat=True)), [user3.id])
+        self.assertEqual(KarmaCounter.objects.get(user=self.user1).total_karma, 5)
+
     def test_toggle_post_like(self):
         """Test toggling like on a post."""
         # First toggle: like
@@ -130,3 +163,60 @@ class PostLikeUniqueConstraintTest(TestCase):
         
         with self.assertRaises(IntegrityError):
             PostLike.objects.create(user=self.user, post=self.post)
+
+
+class SQLiteTuningTests(TestCase):
+    """Test the pragmas applied by the tuned SQLite backend."""
+
+    def test_pragmas_applied_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+
+class BenchLikesCommandTests(TransactionTestCase):
+    """Test the like throughput benchmark."""
+
+    def test_benchmark_reports_consistent_counts(self):
+        out = StringIO()
+        call_command(
+            'bench_likes', workers=1, duration=0.3, posts=3, users=5, json=True, stdout=out
+        )
+        
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['operations'], 0)
+        self.assertEqual(report['mismatched_like_counts'], 0)
+        self.assertFalse(User.objects.filter(username__startswith='bench_likes_').exists())
+
+
+class StressLikesCommandTests(TransactionTestCase):
+    """Test the concurrent like-toggle stress harness."""
+
+    def test_stress_keeps_bookkeeping_consistent(self):
+        out = StringIO()
+        call_command(
+            'stress_likes', workers=2, duration=0.3, users=3, comments=2, json=True, stdout=out
+        )
+        
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['operations'], 0)
+        self.assertEqual(report['violations'], [])
+        self.assertFalse(User.objects.filter(username__startswith='stress_likes_').exists())
+
+    def test_invariant_check_reports_drift(self):
+        from apps.likes.management.commands.stress_likes import check_like_invariants
+        author = User.objects.create_user(username='author')
+        liker = User.objects.create_user(username='liker')
+        post = Post.objects.create(author=author, content='Post')
+        like_post(liker, post.id)
+        Post.objects.filter(id=post.id).update(like_count=5)
+        KarmaTransaction.objects.filter(content_type='post').delete()
+        
+        violations = check_like_invariants([post.id], [])
+        self.assertTrue(any('like_count is 5' in violation for violation in violations))
+        self.assertTrue(any('without a karma row' in violation for violation in violations))
+        self.assertTrue(any('KarmaCounter' in violation for violation in violations))
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.PostListCreateView.as_view(), name='post-list-create'),
-    path('<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
+    path(
+        '<int:pk>/',
+        (views_async if settings.ASYNC_VIEWS else views).PostDetailView.as_view(),
+        name='post-detail'
+    ),
 ]
@@ -1,12 +1,37 @@
+from django.db import transaction
 from django.db.models import Count, Prefetch
 from rest_framework import generics, status
 from rest_framework.response import Response
 from .models import Post
 from .serializers import PostSerializer, PostCreateSerializer
+from apps.events.services import publish
 from apps.likes.models import PostLike
 from apps.users.models import User
 
 
+def post_queryset(user_id):
+    """
+    Posts with author, comment count and the current user's likes loaded.
+
+    Shared by the sync and async (views_async.py) post views.
+    """
+    queryset = Post.objects.select_related('author').annotate(
+        comment_count_annotated=Count('comments')
+    )
+    
+    if user_id:
+        # Prefetch only the current user's likes for the "is_liked" check
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                'post_likes',
+                queryset=PostLike.objects.filter(user_id=user_id),
+                to_attr='prefetched_likes'
+            )
+        )
+    
+    return queryset
+
+
 class PostListCreateView(generics.ListCreateAPIView):
     """
     List all posts or create a new post.
@@ -16,6 +41,9 @@ class PostListCreateView(generics.ListCreateAPIView):
     
     POST: Creates a new post for the current user.
     """
+    # session + page count + posts + current user's likes
+    query_budget = 4
+    replica_reads = True
 
     def get_queryset(self):
         """
@@ -27,22 +55,7 @@ class PostListCreateView(generics.ListCreateAPIView):
         This results in exactly 2-3 queries regardless of the number of posts.
         """
         user_id = self.request.session.get('user_id')
-        
-        queryset = Post.objects.select_related('author').annotate(
-            comment_count_annotated=Count('comments')
-        )
-        
-        if user_id:
-            # Prefetch only the current user's likes for the "is_liked" check
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    'post_likes',
-                    queryset=PostLike.objects.filter(user_id=user_id),
-                    to_attr='prefetched_likes'
-                )
-            )
-        
-        return queryset.order_by('-created_at')
+        return post_queryset(user_id).order_by('-created_at')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -68,7 +81,9 @@ class PostListCreateView(generics.ListCreateAPIView):
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        post = serializer.save(author=user)
+        with transaction.atomic():
+            post = serializer.save(author=user)
+            publish('post_created', post_id=post.id, author_id=user.id)
         
         # Return full post data
         response_serializer = PostSerializer(post, context={'request': request})
@@ -80,21 +95,9 @@ class PostDetailView(generics.RetrieveAPIView):
     Retrieve a single post with all its details.
     """
     serializer_class = PostSerializer
+    # session + post + current user's like
+    query_budget = 3
+    replica_reads = True
 
     def get_queryset(self):
-        user_id = self.request.session.get('user_id')
-        
-        queryset = Post.objects.select_related('author').annotate(
-            comment_count_annotated=Count('comments')
-        )
-        
-        if user_id:
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    'post_likes',
-                    queryset=PostLike.objects.filter(user_id=user_id),
-                    to_attr='prefetched_likes'
-                )
-            )
-        
-        return queryset
+        return post_queryset(self.request.session.get('user_id'))
@@ -0,0 +1,33 @@
+"""
+Async version of the post detail view, served under ASGI when
+ASYNC_VIEWS is enabled. See apps/core/asyncviews.py.
+"""
+from django.views import View
+from rest_framework import status
+from apps.core.asyncviews import aget_session_user_id, json_response
+from .models import Post
+from .serializers import PostSerializer
+from .views import post_queryset
+
+
+class PostDetailView(View):
+    """
+    Async GET /api/posts/<pk>/ (same response as views.PostDetailView).
+    """
+    # session + post + current user's like
+    query_budget = 3
+    replica_reads = True
+
+    async def get(self, request, pk):
+        user_id = await aget_session_user_id(request)
+        
+        try:
+            post = await post_queryset(user_id).aget(pk=pk)
+        except Post.DoesNotExist:
+            return json_response(
+                {'detail': 'No Post matches the given query.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = PostSerializer(post, context={'request': request})
+        return json_response(serializer.data)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class StreamConfig(AppConfig):
+    """
+    Change log and the server-sent events stream built on it.
+    """
+    name = 'apps.stream'
@@ -0,0 +1,263 @@
+"""
+In-process fan-out of change log updates to server-sent events clients.
+
+Each worker process runs one Broadcaster thread while it has clients.
+Every STREAM_TICK seconds (250ms) it reads the new changes, collapses
+them into one 'update' event carrying current counts, and appends the
+event to a ring buffer that every connected client reads from. However
+many clients a worker has, it runs one change log query per tick, plus
+a leaderboard query when karma may have moved.
+
+Clients resume with the id of the last event they saw (Last-Event-ID):
+ids are change log cursors, so recent ids are replayed from the buffer
+and older ones are caught up from the change log in one combined event.
+Cursors older than the log's retention get a 'reset' event, telling the
+client to reload.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from apps.leaderboard.services import get_leaderboard
+from .services import current_cursor, oldest_cursor, read_changes, summarize_changes
+
+logger = logging.getLogger('apps.stream')
+
+# Changes read per tick; a burst larger than this spreads over several ticks
+MAX_CHANGES_PER_TICK = 5000
+
+# Re-check the leaderboard at least this often, as karma ages out of its window
+LEADERBOARD_REFRESH_SECONDS = 60.0
+
+# Tells EventSource how long to wait before reconnecting (ms)
+RETRY_MS = 3000
+
+
+def format_event(data, event=None, event_id=None):
+    """Render one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Broadcaster:
+    """Polls the change log for one worker process and buffers the resulting events."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._subscribers = 0
+        # (cursor, event text), oldest first; covers cursors from _buffer_start on
+        self._events = deque()
+        self._buffer_start = 0
+        self.cursor = None
+        # (version, event text) of the latest leaderboard
+        self.leaderboard = (0, None)
+        self._leaderboard_data = None
+        self._leaderboard_checked = None
+        self._karma_may_have_changed = False
+
+    def connect(self):
+        """
+        Register a client and start polling if needed.
+
+        Returns:
+            The current cursor: the client receives events after it
+        """
+        with self._condition:
+            if self.cursor is None:
+                self.cursor = self._buffer_start = current_cursor()
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stream-broadcaster', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return self.cursor
+
+    def disconnect(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def events_after(self, position):
+        """
+        Buffered events after the cursor `position`.
+
+        Returns:
+            List of (cursor, event text), or None if the buffer no longer
+            reaches back to `position`
+        """
+        with self._condition:
+            if position < self._buffer_start:
+                return None
+            return [(cursor, text) for cursor, text in self._events if cursor > position]
+
+    def wait(self, position, leaderboard_version, timeout):
+        """Block until there is an event after `position` or a new leaderboard, or until `timeout`."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (
+                    (self._events and self._events[-1][0] > position)
+                    or self.leaderboard[0] != leaderboard_version
+                ),
+                timeout
+            )
+
+    def tick(self):
+        """Read new changes, buffer them as one event and refresh the leaderboard if due."""
+        changes, cursor = read_changes(self.cursor, limit=MAX_CHANGES_PER_TICK)
+        update = summarize_changes(changes) if changes else None
+        leaderboard = self._check_leaderboard(bool(changes))
+
+        with self._condition:
+            if changes:
+                self.cursor = cursor
+            if update is not None:
+                self._events.append((cursor, format_event(update, 'update', cursor)))
+                while len(self._events) > settings.STREAM_BUFFER_EVENTS:
+                    self._buffer_start = self._events.popleft()[0]
+            if leaderboard is not None:
+                self.leaderboard = (
+                    self.leaderboard[0] + 1,
+                    format_event({'leaderboard': leaderboard}, 'leaderboard')
+                )
+            self._condition.notify_all()
+
+    def _check_leaderboard(self, changed):
+        """Return the leaderboard if it is due for a check and differs from the last one."""
+        self._karma_may_have_changed |= changed
+        now = time.monotonic()
+        if self._leaderboard_checked is not None:
+            elapsed = now - self._leaderboard_checked
+            due = (
+                elapsed >= LEADERBOARD_REFRESH_SECONDS
+                or (self._karma_may_have_changed and elapsed >= settings.STREAM_LEADERBOARD_INTERVAL)
+            )
+            if not due:
+                return None
+        self._leaderboard_checked = now
+        self._karma_may_have_changed = False
+
+        leaderboard = get_leaderboard()
+        if leaderboard == self._leaderboard_data:
+            return None
+        self._leaderboard_data = leaderboard
+        return leaderboard
+
+    def _run(self):
+        while True:
+            with self._condition:
+                idle = self._subscribers <= 0
+                if idle:
+                    # Nobody to send to: forget the position, start fresh on the next client
+                    self.cursor = None
+                    self._events.clear()
+            if idle:
+                connection.close()
+                with self._condition:
+                    self._condition.wait_for(lambda: self._subscribers > 0)
+                continue
+
+            started = time.monotonic()
+            try:
+                self.tick()
+                connection.close_if_unusable_or_obsolete()
+            except DatabaseError as exc:
+                logger.warning('Stream broadcaster: %s', exc)
+                connection.close()
+            time.sleep(max(0.0, settings.STREAM_TICK - (time.monotonic() - started)))
+
+
+class StreamSession:
+    """
+    One client's position in the stream.
+
+    open() may query the database (to catch up a resuming client);
+    poll() only reads the broadcaster's buffer, so it is safe to call
+    from an event loop.
+    """
+
+    def __init__(self, broadcaster, last_event_id=None):
+        self.broadcaster = broadcaster
+        self.last_event_id = last_event_id
+        self.position = None
+        self.leaderboard_version = 0
+
+    def open(self):
+        """Connect and return the opening chunks: retry interval, catch-up, leaderboard."""
+        cursor = self.broadcaster.connect()
+        chunks = [f'retry: {RETRY_MS}\n\n']
+        self.position = cursor
+        if self.last_event_id is not None and self.last_event_id < cursor:
+            if self.broadcaster.events_after(self.last_event_id) is not None:
+                # poll() replays the rest from the buffer
+                self.position = self.last_event_id
+            else:
+                chunks.append(self._catch_up(self.last_event_id, cursor))
+        chunks.extend(self._leaderboard_chunks())
+        return chunks
+
+    def poll(self):
+        """Chunks for everything that happened since the last call."""
+        events = self.broadcaster.events_after(self.position)
+        if events is None:
+            # Fell behind the buffer: too slow to keep up
+            self.position = self.broadcaster.cursor
+            chunks = [format_event({}, 'reset', self.position)]
+        else:
+            chunks = [text for _, text in events]
+            if events:
+                self.position = events[-1][0]
+        chunks.extend(self._leaderboard_chunks())
+        return chunks
+
+    def wait(self, timeout):
+        self.broadcaster.wait(self.position, self.leaderboard_version, timeout)
+
+    def close(self):
+        self.broadcaster.disconnect()
+
+    def _catch_up(self, after, until):
+        """One update event covering the changes in (after, until], or a reset."""
+        if after < oldest_cursor():
+            return format_event({}, 'reset', until)
+        changes = []
+        while after < until:
+            batch, cursor = read_changes(after, until=until)
+            if not batch:
+                break
+            changes.extend(batch)
+            after = cursor
+            if len(changes) > settings.STREAM_CATCH_UP_LIMIT:
+                # Cheaper for the client to reload than to apply this much
+                return format_event({}, 'reset', until)
+        return format_event(summarize_changes(changes) or {}, 'update', until)
+
+    def _leaderboard_chunks(self):
+        version, text = self.broadcaster.leaderboard
+        if version == self.leaderboard_version or text is None:
+            return []
+        self.leaderboard_version = version
+        return [text]
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """This process's broadcaster (a new one after a fork)."""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None or _broadcaster.pid != os.getpid():
+            _broadcaster = Broadcaster()
+        return _broadcaster
@@ -0,0 +1,37 @@
+"""
+Outbox event handlers that write the change log.
+"""
+from apps.events.services import handler
+from .models import Change
+from .services import record_change
+
+
+@handler('post_created')
+def post_created(payload):
+    record_change(Change.KIND_POST, payload['post_id'], Change.OP_CREATED)
+
+
+@handler('post_liked')
+@handler('post_unliked')
+def post_like_changed(payload):
+    record_change(Change.KIND_POST, payload['post_id'], Change.OP_UPDATED)
+
+
+@handler('comment_liked')
+@handler('comment_unliked')
+def comment_like_changed(payload):
+    record_change(Change.KIND_COMMENT, payload['comment_id'], Change.OP_UPDATED)
+
+
+@handler('comment_created')
+def comment_created(payload):
+    record_change(Change.KIND_COMMENT, payload['comment_id'], Change.OP_CREATED)
+    # The post's comment count
+    record_change(Change.KIND_POST, payload['post_id'], Change.OP_UPDATED)
+
+
+@handler('comment_deleted')
+def comment_deleted(payload):
+    for comment_id in payload['comment_ids']:
+        record_change(Change.KIND_COMMENT, comment_id, Change.OP_DELETED)
+    record_change(Change.KIND_POST, payload['post_id'], Change.OP_UPDATED)
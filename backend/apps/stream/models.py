@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class Change(models.Model):
+    """
+    One entry of the change log: a post or comment was created, updated
+    (like or comment count) or deleted.
+
+    The id is the change sequence number: clients keep the id of the
+    last change they saw as their cursor and ask for everything after it
+    (see stream.services.read_changes). Entries only name the object;
+    current values are read from the object itself, so repeated changes
+    to one object collapse into one update.
+    """
+    KIND_POST = 'post'
+    KIND_COMMENT = 'comment'
+
+    KIND_CHOICES = [
+        (KIND_POST, 'Post'),
+        (KIND_COMMENT, 'Comment'),
+    ]
+
+    OP_CREATED = 'created'
+    OP_UPDATED = 'updated'
+    OP_DELETED = 'deleted'
+
+    OP_CHOICES = [
+        (OP_CREATED, 'Created'),
+        (OP_UPDATED, 'Updated'),
+        (OP_DELETED, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'change_log'
+        indexes = [
+            # Purging by age
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.object_id} {self.op}"
@@ -0,0 +1,138 @@
+"""
+Change log service module.
+
+Write paths publish outbox events; the handlers in handlers.py turn them
+into Change rows in the same transaction. Readers (the SSE stream) page
+through the log by sequence number:
+
+    changes, cursor = read_changes(after=cursor)
+    update = summarize_changes(changes)
+
+Sequence numbers are allocated when a row is inserted, not when its
+transaction commits, so on PostgreSQL a lower number can become visible
+after a higher one. read_changes therefore stops at a gap in the
+sequence until the gap is CHANGE_LOG_GAP_TIMEOUT seconds old (by then
+the missing number belongs to a rolled-back transaction). SQLite commits
+one writer at a time and never leaves gaps.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from apps.comments.models import Comment
+from apps.posts.models import Post
+from .models import Change
+
+
+def record_change(kind, object_id, op):
+    """Append a change to the log (call inside the write's transaction)."""
+    Change.objects.create(kind=kind, object_id=object_id, op=op)
+
+
+def current_cursor():
+    """Sequence number of the newest change (0 if the log is empty)."""
+    return Change.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def oldest_cursor():
+    """
+    Oldest cursor the log can still answer: the number just before its
+    first retained change. Cursors older than this have missed purged changes.
+    """
+    first = Change.objects.aggregate(first=Min('id'))['first']
+    return first - 1 if first is not None else current_cursor()
+
+
+def read_changes(after, until=None, limit=1000):
+    """
+    Read up to `limit` changes after the cursor `after`, oldest first.
+
+    Args:
+        after: Cursor (sequence number of the last change already seen)
+        until: Optional cursor to stop at (inclusive)
+
+    Returns:
+        tuple: (changes, cursor) - cursor is the sequence number to
+        resume from; it only moves past a gap once the gap has timed out
+    """
+    rows = Change.objects.filter(id__gt=after).order_by('id')
+    if until is not None:
+        rows = rows.filter(id__lte=until)
+    gap_cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_LOG_GAP_TIMEOUT)
+
+    changes = []
+    cursor = after
+    for change in rows[:limit]:
+        if change.id != cursor + 1 and change.created_at > gap_cutoff:
+            # A transaction holding the missing number may still commit
+            break
+        changes.append(change)
+        cursor = change.id
+    return changes, cursor
+
+
+def summarize_changes(changes):
+    """
+    Collapse a list of changes into one update with current values.
+
+    Returns:
+        Dict with 'posts' and 'comments' ({id: current counts}),
+        'new_posts', 'deleted_posts' and 'deleted_comments' (id lists),
+        or None if nothing changed
+    """
+    changed = {Change.KIND_POST: set(), Change.KIND_COMMENT: set()}
+    created_posts = set()
+    deleted = {Change.KIND_POST: set(), Change.KIND_COMMENT: set()}
+    for change in changes:
+        if change.op == Change.OP_DELETED:
+            deleted[change.kind].add(change.object_id)
+            continue
+        changed[change.kind].add(change.object_id)
+        if change.kind == Change.KIND_POST and change.op == Change.OP_CREATED:
+            created_posts.add(change.object_id)
+
+    if not any(changed.values()) and not any(deleted.values()):
+        return None
+
+    post_ids = changed[Change.KIND_POST] - deleted[Change.KIND_POST]
+    comment_ids = changed[Change.KIND_COMMENT] - deleted[Change.KIND_COMMENT]
+    posts = {}
+    if post_ids:
+        rows = (
+            Post.objects.filter(id__in=post_ids)
+            .annotate(comment_total=Count('comments'))
+            .values_list('id', 'like_count', 'comment_total')
+        )
+        posts = {
+            post_id: {'like_count': like_count, 'comment_count': comment_count}
+            for post_id, like_count, comment_count in rows
+        }
+    comments = {}
+    if comment_ids:
+        rows = Comment.objects.filter(id__in=comment_ids).values_list('id', 'like_count')
+        comments = {comment_id: {'like_count': like_count} for comment_id, like_count in rows}
+
+    return {
+        'posts': posts,
+        'comments': comments,
+        # Only those that still exist, newest first as in the feed
+        'new_posts': sorted(created_posts & posts.keys(), reverse=True),
+        'deleted_posts': sorted(deleted[Change.KIND_POST]),
+        'deleted_comments': sorted(deleted[Change.KIND_COMMENT]),
+    }
+
+
+def purge_changes(hours=None):
+    """
+    Delete changes older than `hours` (default CHANGE_LOG_RETENTION_HOURS).
+
+    Clients with an older cursor are told to reload.
+
+    Returns:
+        Number of changes deleted
+    """
+    hours = settings.CHANGE_LOG_RETENTION_HOURS if hours is None else hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    # The newest change always stays, so oldest_cursor() can tell how far the log reached
+    deleted, _ = Change.objects.filter(created_at__lt=cutoff, id__lt=current_cursor()).delete()
+    return deleted
@@ -0,0 +1,10 @@
+"""
+Background tasks for the change log (see apps.jobs).
+"""
+from apps.jobs.services import task
+from .services import purge_changes
+
+
+@task('stream.purge_changes', max_attempts=1)
+def purge(hours=None):
+    purge_changes(hours)
@@ -0,0 +1,237 @@
+"""
+Tests for the change log and the server-sent events stream.
+"""
+import json
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.comments.models import Comment
+from apps.likes.services import like_post, like_comment
+from apps.posts.models import Post
+from apps.stream.broadcaster import Broadcaster
+from apps.stream.models import Change
+from apps.stream.services import current_cursor, read_changes, summarize_changes
+from apps.users.models import User
+
+
+def parse_events(chunks):
+    """Parse SSE text into a list of (event, id, data) tuples, skipping comments."""
+    events = []
+    for block in ''.join(chunks).split('\n\n'):
+        fields = dict(
+            line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':')
+        )
+        if 'data' in fields:
+            events.append((fields.get('event'), fields.get('id'), json.loads(fields['data'])))
+    return events
+
+
+class ChangeLogTests(TestCase):
+    """Test that writes are recorded in the change log and read back correctly."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.liker = User.objects.create_user(username='liker')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        self.client = APIClient()
+        self.client.post('/api/users/me/', {'username': 'author'}, format='json')
+
+    def test_writes_are_logged(self):
+        start = current_cursor()
+        response = self.client.post(
+            '/api/comments/', {'post': self.post.id, 'content': 'Hi'}, format='json'
+        )
+        comment_id = response.data['id']
+        reply = Comment.objects.create(
+            post=self.post, author=self.author, parent_id=comment_id, content='Reply'
+        )
+        like_post(self.liker, self.post.id)
+        like_comment(self.liker, comment_id)
+        self.client.delete(f'/api/comments/{comment_id}/')
+
+        changes, cursor = read_changes(start)
+        self.assertEqual(cursor, current_cursor())
+        self.assertEqual(
+            [(change.kind, change.object_id, change.op) for change in changes],
+            [
+                ('comment', comment_id, 'created'),
+                ('post', self.post.id, 'updated'),
+                ('post', self.post.id, 'updated'),
+                ('comment', comment_id, 'updated'),
+                ('comment', comment_id, 'deleted'),
+                ('comment', reply.id, 'deleted'),
+                ('post', self.post.id, 'updated'),
+            ]
+        )
+
+    def test_summary_collapses_changes_into_current_values(self):
+        start = current_cursor()
+        new_post = Post.objects.create(author=self.author, content='New')
+        Change.objects.create(kind='post', object_id=new_post.id, op='created')
+        for username in ('a', 'b', 'c'):
+            like_post(User.objects.create_user(username=username), self.post.id)
+        Change.objects.create(kind='comment', object_id=999, op='deleted')
+
+        update = summarize_changes(read_changes(start)[0])
+        self.assertEqual(update['posts'], {
+            self.post.id: {'like_count': 3, 'comment_count': 0},
+            new_post.id: {'like_count': 0, 'comment_count': 0},
+        })
+        self.assertEqual(update['new_posts'], [new_post.id])
+        self.assertEqual(update['deleted_comments'], [999])
+
+    def test_reading_waits_at_a_recent_gap(self):
+        start = current_cursor()
+        first = Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        # Simulate a transaction that has taken the next number but not committed
+        Change.objects.create(id=first.id + 2, kind='post', object_id=self.post.id, op='updated')
+
+        self.assertEqual(read_changes(start)[1], first.id)
+
+        Change.objects.filter(id=first.id + 2).update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(read_changes(start)[1], first.id + 2)
+
+    def test_broadcaster_buffers_one_event_per_tick(self):
+        broadcaster = Broadcaster()
+        broadcaster.cursor = start = current_cursor()
+        like_post(self.liker, self.post.id)
+        like_post(self.author, self.post.id)
+
+        broadcaster.tick()
+
+        events = broadcaster.events_after(start)
+        self.assertEqual(len(events), 1)
+        [(event, event_id, data)] = parse_events([events[0][1]])
+        self.assertEqual(event, 'update')
+        self.assertEqual(int(event_id), broadcaster.cursor)
+        self.assertEqual(data['posts'][str(self.post.id)]['like_count'], 2)
+        # The leaderboard is sent with the first tick
+        leaderboard = parse_events([broadcaster.leaderboard[1]])[0][2]['leaderboard']
+        self.assertEqual(leaderboard[0]['user']['username'], 'author')
+
+
+@mock.patch('apps.stream.broadcaster.Broadcaster._run')
+class StreamViewTests(TransactionTestCase):
+    """Test the /api/stream/ endpoint (with the broadcaster ticked by hand)."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.liker = User.objects.create_user(username='liker')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        self.broadcaster = Broadcaster()
+        patcher = mock.patch('apps.stream.views.get_broadcaster', return_value=self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, response, count):
+        return [next(response.streaming_content).decode() for _ in range(count)]
+
+    def test_resume_catches_up_then_streams_live(self, run):
+        like_post(self.author, self.post.id)
+        cursor = current_cursor()
+        like_post(self.liker, self.post.id)
+
+        response = self.client.get('/api/stream/', HTTP_LAST_EVENT_ID=str(cursor))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        event, event_id, data = parse_events(self.read(response, 2))[0]
+        self.assertEqual(event, 'update')
+        self.assertEqual(data['posts'][str(self.post.id)]['like_count'], 2)
+
+        other_post = Post.objects.create(author=self.author, content='Another')
+        like_post(self.liker, other_post.id)
+        self.broadcaster.tick()
+        events = parse_events(self.read(response, 1))
+        self.assertEqual(events[0][2]['posts'][str(other_post.id)]['like_count'], 1)
+        self.assertEqual(events[1][0], 'leaderboard')
+        response.close()
+        self.assertEqual(self.broadcaster._subscribers, 0)
+
+    def test_purged_cursor_gets_a_reset(self, run):
+        Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        Change.objects.filter(id=Change.objects.order_by('id').first().id).delete()
+
+        response = self.client.get('/api/stream/?last_event_id=0')
+        self.assertEqual(parse_events(self.read(response, 2))[0][0], 'reset')
+        response.close()
+
+    def test_invalid_cursor(self, run):
+        response = self.client.get('/api/stream/', HTTP_LAST_EVENT_ID='abc')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(STREAM_MAX_WSGI_STREAMS=1)
+    def test_wsgi_streams_are_capped_per_worker(self, run):
+        first = self.client.get('/api/stream/')
+        self.assertEqual(first.status_code, 200)
+
+        refused = self.client.get('/api/stream/')
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn('Retry-After', refused)
+
+        # Closed before it was read: the slot and subscription are given back
+        first.close()
+        self.assertEqual(self.broadcaster._subscribers, 0)
+        second = self.client.get('/api/stream/')
+        self.assertEqual(second.status_code, 200)
+        second.close()
+
+
+class SyncViewTests(TestCase):
+    """Test the /api/sync/ delta endpoint."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.liker = User.objects.create_user(username='liker')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='Hi')
+        self.client = APIClient()
+        self.client.post('/api/users/me/', {'username': 'liker'}, format='json')
+
+    def test_returns_only_what_changed(self):
+        Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        cursor = self.client.get('/api/sync/').data['cursor']
+
+        like_post(self.liker, self.post.id)
+        like_comment(self.liker, self.comment.id)
+        response = self.client.post('/api/posts/', {'content': 'Fresh'}, format='json')
+        new_post_id = response.data['id']
+        self.client.post('/api/users/me/', {'username': 'author'}, format='json')
+        self.client.delete(f'/api/comments/{self.comment.id}/')
+
+        data = self.client.get(f'/api/sync/?since={cursor}').data
+        self.assertFalse(data['reset'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['cursor'], current_cursor())
+        self.assertEqual(data['posts'][self.post.id], {'like_count': 1, 'comment_count': 0})
+        self.assertEqual([post['id'] for post in data['new_posts']], [new_post_id])
+        self.assertEqual(data['deleted_comments'], [self.comment.id])
+        self.assertEqual(data['comments'], {})
+
+        # Nothing new since the returned cursor
+        data = self.client.get(f'/api/sync/?since={data["cursor"]}').data
+        self.assertEqual((data['posts'], data['new_posts']), ({}, []))
+
+        # Paging through a long log
+        data = self.client.get(f'/api/sync/?since={cursor}&limit=2').data
+        self.assertTrue(data['has_more'])
+        self.assertEqual(data['cursor'], cursor + 2)
+
+    def test_purged_cursor_and_invalid_cursor(self):
+        Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        Change.objects.create(kind='post', object_id=self.post.id, op='updated')
+        first = Change.objects.order_by('id').first().id
+        Change.objects.filter(id=first).delete()
+
+        data = self.client.get(f'/api/sync/?since={first - 1}').data
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['cursor'], current_cursor())
+
+        self.assertEqual(self.client.get('/api/sync/?since=abc').status_code, 400)
+
+    def test_sync_reads_from_the_primary(self):
+        self.assertFalse(resolve('/api/sync/').func.cls.replica_reads)
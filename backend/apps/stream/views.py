@@ -0,0 +1,246 @@
+"""
+Live update endpoints, both fed by the change log.
+
+GET /api/stream/  server-sent events as changes happen
+GET /api/sync/    everything that changed since a cursor, on request
+
+Stream
+
+Events:
+    update       posts/comments with their current like and comment
+                 counts, new post ids and deleted post/comment ids; the
+                 event id is the change log cursor
+    leaderboard  the 24h top 5, whenever it changes
+    reset        the client missed too much to catch up: reload
+
+Browsers' EventSource reconnects by itself and sends the last event id
+as Last-Event-ID; a `last_event_id` query parameter does the same on a
+first connection. Streams end after STREAM_MAX_SECONDS and the client
+reconnects, which spreads clients over workers again.
+
+Each open stream holds a server thread under WSGI. So that open tabs
+cannot take every thread from the API, a WSGI worker serves at most
+STREAM_MAX_WSGI_STREAMS streams and answers 503 with Retry-After beyond
+that. The ASGI app serves streams without holding threads and is not
+capped.
+"""
+import asyncio
+import threading
+import time
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from apps.posts.serializers import PostSerializer
+from apps.posts.views import post_queryset
+from .broadcaster import StreamSession, get_broadcaster
+from .services import current_cursor, oldest_cursor, read_changes, summarize_changes
+
+# Changes read per sync request; clients call again while has_more is set
+SYNC_DEFAULT_LIMIT = 1000
+SYNC_MAX_LIMIT = 5000
+
+# Seconds a client turned away for capacity should wait before reconnecting
+STREAM_RETRY_AFTER = 30
+
+_wsgi_streams = 0
+_wsgi_streams_lock = threading.Lock()
+
+
+def _acquire_wsgi_stream():
+    """Take one of this worker's WSGI stream slots; False if all are in use."""
+    global _wsgi_streams
+    with _wsgi_streams_lock:
+        if _wsgi_streams >= settings.STREAM_MAX_WSGI_STREAMS:
+            return False
+        _wsgi_streams += 1
+        return True
+
+
+def _release_wsgi_stream():
+    global _wsgi_streams
+    with _wsgi_streams_lock:
+        _wsgi_streams -= 1
+
+
+def stream_view(request):
+    raw_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    last_event_id = None
+    if raw_id:
+        try:
+            last_event_id = int(raw_id)
+        except ValueError:
+            return JsonResponse({'error': 'Last-Event-ID must be an integer'}, status=400)
+
+    is_asgi = isinstance(request, ASGIRequest)
+    if not is_asgi and not _acquire_wsgi_stream():
+        response = JsonResponse(
+            {'error': 'Too many open streams, retry later'},
+            status=503
+        )
+        response['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response
+
+    session = StreamSession(get_broadcaster(), last_event_id)
+    try:
+        opening = session.open()
+    except Exception:
+        session.close()
+        if not is_asgi:
+            _release_wsgi_stream()
+        raise
+    finally:
+        # The stream outlives the request; it must not hold a connection
+        connection.close()
+
+    if is_asgi:
+        content = _astream(session, opening)
+    else:
+        content = _ClosingStream(_stream(session, opening), session)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _stream(session, opening):
+    yield from opening
+    deadline = time.monotonic() + settings.STREAM_MAX_SECONDS
+    while time.monotonic() < deadline:
+        session.wait(settings.STREAM_HEARTBEAT)
+        chunks = session.poll()
+        # A comment line keeps proxies from closing an idle stream
+        yield ''.join(chunks) if chunks else ': ping\n\n'
+
+
+class _ClosingStream:
+    """
+    A WSGI stream that gives back its session and thread slot when the
+    server closes the response, even if it never started iterating (a
+    generator's finally block would not run then).
+    """
+
+    def __init__(self, chunks, session):
+        self.chunks = chunks
+        self.session = session
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.chunks.close()
+        finally:
+            self.session.close()
+            _release_wsgi_stream()
+
+
+async def _astream(session, opening):
+    try:
+        for chunk in opening:
+            yield chunk
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < settings.STREAM_MAX_SECONDS:
+            await asyncio.sleep(settings.STREAM_TICK)
+            chunks = session.poll()
+            if chunks:
+                yield ''.join(chunks)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= settings.STREAM_HEARTBEAT:
+                yield ': ping\n\n'
+                last_sent = time.monotonic()
+    finally:
+        session.close()
+
+
+class SyncView(APIView):
+    """
+    Get what changed since a cursor, for refreshing an already loaded feed.
+
+    GET /api/sync/?since=<cursor>
+
+    Without `since`, returns only the current cursor: fetch it before
+    loading the feed, then sync from it. Applying a change twice is
+    harmless, as counts are current values.
+
+    Response format:
+    {
+        "cursor": 1234,
+        "reset": false,
+        "has_more": false,
+        "new_posts": [{...post...}],
+        "posts": {"12": {"like_count": 3, "comment_count": 1}},
+        "comments": {"40": {"like_count": 2}},
+        "deleted_posts": [],
+        "deleted_comments": [41]
+    }
+
+    "reset" means the cursor is older than the change log's retention:
+    reload the feed and start again from the returned cursor.
+    """
+    # session + oldest cursor + changes + post counts + comment counts + new posts + likes
+    query_budget = 7
+    # No replica reads: read_changes' gap timeout compares created_at with
+    # the current time, so on a lagging replica it would skip gaps at once
+    # and lose changes that commit out of order
+    replica_reads = False
+
+    def get(self, request):
+        raw_since = request.query_params.get('since')
+        try:
+            since = int(raw_since) if raw_since is not None else None
+            limit = int(request.query_params.get('limit', SYNC_DEFAULT_LIMIT))
+        except ValueError:
+            return Response(
+                {'error': 'since and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(max(limit, 1), SYNC_MAX_LIMIT)
+
+        if since is None:
+            return Response(self._payload(current_cursor()))
+        if since < oldest_cursor():
+            return Response(self._payload(current_cursor(), reset=True))
+
+        changes, cursor = read_changes(since, limit=limit)
+        update = summarize_changes(changes) or {}
+        new_posts = []
+        if update.get('new_posts'):
+            queryset = post_queryset(request.session.get('user_id')).filter(
+                id__in=update['new_posts']
+            ).order_by('-created_at')
+            new_posts = PostSerializer(queryset, many=True, context={'request': request}).data
+
+        return Response(self._payload(
+            cursor,
+            has_more=len(changes) == limit,
+            new_posts=new_posts,
+            posts=update.get('posts', {}),
+            comments=update.get('comments', {}),
+            deleted_posts=update.get('deleted_posts', []),
+            deleted_comments=update.get('deleted_comments', []),
+        ))
+
+    def _payload(self, cursor, reset=False, has_more=False, new_posts=(), posts=None,
+                 comments=None, deleted_posts=(), deleted_comments=()):
+        return {
+            'cursor': cursor,
+            'reset': reset,
+            'has_more': has_more,
+            'new_posts': list(new_posts),
+            'posts': posts or {},
+            'comments': comments or {},
+            'deleted_posts': list(deleted_posts),
+            'deleted_comments': list(deleted_comments),
+        }
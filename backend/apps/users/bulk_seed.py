@@ -0,0 +1,508 @@
+"""
+High-volume synthetic dataset generator for benchmarks.
+
+Used by `seed_data --bulk` to build datasets large enough to reproduce
+production performance problems (millions of likes) in minutes rather
+than hours. Everything is drawn from generators seeded with --seed, so
+the same seed always produces the same dataset (timestamps are relative
+to now):
+
+- User activity follows a power law: a few users write most posts,
+  comments and likes
+- Likes per post and per comment follow a power law (most content gets
+  nothing, a few items get thousands)
+- Comment threads grow deep reply chains rather than flat lists
+- Timestamps arrive in bursts on top of a quiet background rate
+
+Rows are given explicit ids, so nothing has to be read back between
+tables. They are generated as NumPy columns and written in batches inside
+a single transaction: COPY on PostgreSQL, executemany on SQLite (Django's
+per-object bulk_create overhead was most of the run time), bulk_create
+on anything else. Denormalized data is written consistently
+in the same pass: every like has its KarmaTransaction, like_count
+matches the like rows, and KarmaCounter is rebuilt at the end.
+"""
+import csv
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, reset_queries, transaction
+from django.db.models import DateTimeField, Max
+from django.utils import timezone
+from apps.comments.models import Comment
+from apps.likes.models import PostLike, CommentLike
+from apps.posts.models import Post
+from apps.users.models import User, KarmaTransaction
+from apps.users.services import rebuild_karma_counters
+
+SECONDS_PER_DAY = 86400
+
+# Share of timestamps that fall into bursts rather than the background rate
+BURST_SHARE = 0.7
+# Typical length of a burst in seconds (exponential scale)
+BURST_SECONDS = 1800
+# Mean gap between consecutive comments in a thread, and between a post and its likes
+COMMENT_GAP_SECONDS = 900
+LIKE_DELAY_SECONDS = 6 * 3600
+
+# Comment shape: chance a comment starts a new top-level thread, and
+# chance a reply continues the newest comment (builds chains)
+TOP_LEVEL_SHARE = 0.3
+CHAIN_SHARE = 0.75
+MAX_DEPTH = 32
+
+# Page cache for the seeding connection on SQLite
+SQLITE_CACHE_KIB = 512 * 1024
+
+POST_TEXTS = [
+    "Just discovered this amazing community! 🎉",
+    "Working on a new project. Can't wait to share it!",
+    "Hot take: tabs are better than spaces. Fight me.",
+    "Finally finished my side project after 6 months!",
+    "Best practices for code reviews - what are yours?",
+    "Just deployed my first app to production! 🚀",
+    "What's everyone working on this weekend?",
+    "Clean code is not about being clever.",
+]
+
+COMMENT_TEXTS = [
+    "Great post! 👍",
+    "I totally agree with this.",
+    "Can you elaborate more on this?",
+    "I have a different opinion on this...",
+    "Good point!",
+    "That makes sense.",
+]
+
+
+class BulkSeeder:
+    """
+    Generates and writes one synthetic dataset.
+
+    Args:
+        users, posts, comments: Number of rows to create
+        post_likes, comment_likes: Target like totals (the power law is
+            capped at one like per user per item, so the result can be lower)
+        days: Timestamps are spread over this many days before now
+        seed: RNG seed
+        batch_size: Rows per bulk_create / COPY
+        log: Optional callable for progress messages
+    """
+
+    def __init__(self, users, posts, comments, post_likes, comment_likes,
+                 days=30, seed=0, batch_size=10000, log=None):
+        self.user_count = users
+        self.post_count = posts
+        self.comment_count = comments
+        self.post_like_target = post_likes
+        self.comment_like_target = comment_likes
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+        self.rng = np.random.default_rng(seed)
+        # Python RNG for the per-comment tree walk, derived from the same seed
+        self.random = random.Random(seed)
+        self.now = timezone.now().timestamp()
+        self.start = self.now - days * SECONDS_PER_DAY
+        self.use_copy = connection.vendor == 'postgresql' and _supports_copy()
+
+    def run(self):
+        """
+        Write the dataset.
+
+        Returns:
+            Dict of rows written per table
+        """
+        written = {}
+        timestamped = (User, Post, Comment, PostLike, CommentLike, KarmaTransaction)
+        with _sqlite_cache_size(SQLITE_CACHE_KIB), transaction.atomic(), \
+                _explicit_timestamps(*timestamped):
+            self.user_ids = self._next_ids(User, self.user_count)
+            # Activity weights: who posts, comments and likes the most
+            activity = self.rng.pareto(1.2, self.user_count) + 1
+            self.activity_cdf = np.cumsum(activity / activity.sum())
+
+            self.log(f'Creating {self.user_count} users...')
+            written['users'] = self._write_users()
+
+            self.log(f'Creating {self.post_count} posts...')
+            written['posts'] = self._write_posts()
+
+            self.log(f'Creating {self.comment_count} comments...')
+            written['comments'] = self._write_comments()
+
+            self.log('Creating post likes and karma...')
+            written['post_likes'] = self._write_likes(
+                PostLike, 'post_id', self.post_ids, self.post_authors,
+                self.post_times, self.post_like_counts,
+                KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post'
+            )
+
+            self.log('Creating comment likes and karma...')
+            written['comment_likes'] = self._write_likes(
+                CommentLike, 'comment_id', self.comment_ids, self.comment_authors,
+                self.comment_times, self.comment_like_counts,
+                KarmaTransaction.KARMA_TYPE_COMMENT_LIKE, 'comment'
+            )
+            written['karma_transactions'] = written['post_likes'] + written['comment_likes']
+
+            if connection.vendor == 'postgresql':
+                self._reset_sequences()
+
+            self.log('Rebuilding karma counters...')
+            written['karma_counters'] = rebuild_karma_counters()
+        return written
+
+    def _write_users(self):
+        # Hashing is deliberately slow; every seeded user shares one hash
+        password = make_password('password123')
+        joined = self._uniform_times(self.user_count, self.start - 365 * SECONDS_PER_DAY, self.start)
+        users = (
+            User(
+                id=user_id,
+                username=f'seed_user_{user_id}',
+                email=f'seed_user_{user_id}@example.com',
+                password=password,
+                bio=f'Seeded user #{user_id}',
+                date_joined=joined_at,
+                created_at=joined_at,
+                updated_at=joined_at,
+            )
+            for user_id, joined_at in zip(self.user_ids.tolist(), _datetimes(joined))
+        )
+        # Far fewer rows than the other tables: plain bulk_create fills in
+        # the many auth columns with their defaults
+        written = 0
+        while True:
+            batch = list(islice(users, self.batch_size))
+            if not batch:
+                return written
+            User.objects.bulk_create(batch)
+            written += len(batch)
+
+    def _write_posts(self):
+        self.post_ids = self._next_ids(Post, self.post_count)
+        self.post_authors = self.user_ids[self._pick_users(self.post_count)]
+        self.post_times = np.sort(self._bursty_times(self.post_count))
+        # Popularity drives both likes and comments
+        self.post_popularity = self.rng.pareto(1.1, self.post_count) + 1
+        self.post_like_counts = self._like_counts(self.post_popularity, self.post_like_target)
+
+        return self._write_table(Post, {
+            'id': self.post_ids,
+            'author_id': self.post_authors,
+            'content': np.array(POST_TEXTS)[self.post_ids % len(POST_TEXTS)],
+            'like_count': self.post_like_counts,
+            'created_at': self.post_times,
+            'updated_at': self.post_times,
+        })
+
+    def _write_comments(self):
+        per_post = self.rng.poisson(
+            self.post_popularity / self.post_popularity.sum() * self.comment_count
+        )
+        total = int(per_post.sum())
+        self.comment_ids = self._next_ids(Comment, total)
+        self.comment_authors = self.user_ids[self._pick_users(total)]
+        post_ids = np.repeat(self.post_ids, per_post)
+
+        # Each thread is a burst: comments follow the post and each other
+        first = np.repeat(np.cumsum(per_post) - per_post, per_post)
+        gaps = np.cumsum(self.rng.exponential(COMMENT_GAP_SECONDS, total))
+        thread_gaps = gaps - np.where(first > 0, gaps[np.maximum(first - 1, 0)], 0)
+        self.comment_times = np.minimum(
+            np.repeat(self.post_times, per_post) + thread_gaps, self.now
+        )
+
+        # Indexes into comment_ids; -1 = top-level
+        parents = [-1] * total
+        depths = [0] * total
+        for index, thread_start in enumerate(first.tolist()):
+            if index == thread_start:
+                continue
+            roll = self.random.random()
+            if roll < TOP_LEVEL_SHARE:
+                continue
+            if roll < CHAIN_SHARE:
+                parent = index - 1
+            else:
+                parent = self.random.randrange(thread_start, index)
+            if depths[parent] < MAX_DEPTH:
+                parents[index] = parent
+                depths[index] = depths[parent] + 1
+
+        self.comment_like_counts = self._like_counts(
+            self.rng.pareto(1.1, total) + 1, self.comment_like_target
+        )
+        comment_ids = self.comment_ids.tolist()
+
+        return self._write_table(Comment, {
+            'id': self.comment_ids,
+            'post_id': post_ids,
+            'author_id': self.comment_authors,
+            'parent_id': [comment_ids[parent] if parent >= 0 else None for parent in parents],
+            'content': np.array(COMMENT_TEXTS)[self.comment_ids % len(COMMENT_TEXTS)],
+            'like_count': self.comment_like_counts,
+            'depth': depths,
+            'created_at': self.comment_times,
+            'updated_at': self.comment_times,
+        })
+
+    def _write_likes(self, like_model, target_field, target_ids, author_ids, target_times,
+                     like_counts, karma_type, content_type):
+        """Write the likes of every target and one KarmaTransaction per like."""
+        points = KarmaTransaction.KARMA_POINTS[karma_type]
+        pending = 0
+        likers, targets, authors, times = [], [], [], []
+        written = 0
+
+        def flush():
+            liked_at = np.concatenate(times)
+            target_column = np.concatenate(targets)
+            liker_column = np.concatenate(likers)
+            count = len(liked_at)
+            self._write_table(like_model, {
+                'user_id': liker_column,
+                target_field: target_column,
+                'created_at': liked_at,
+            })
+            self._write_table(KarmaTransaction, {
+                'user_id': np.concatenate(authors),
+                'karma_type': [karma_type] * count,
+                'points': [points] * count,
+                'content_type': [content_type] * count,
+                'object_id': target_column,
+                'actor_id': liker_column,
+                'created_at': liked_at,
+            })
+            return count
+
+        for index in np.flatnonzero(like_counts).tolist():
+            count = int(like_counts[index])
+            author_id = int(author_ids[index])
+            likers.append(self.user_ids[self._pick_likers(count, author_id)])
+            targets.append(np.full(count, target_ids[index]))
+            authors.append(np.full(count, author_id))
+            times.append(np.minimum(
+                target_times[index] + self.rng.exponential(LIKE_DELAY_SECONDS, count), self.now
+            ))
+            pending += count
+            if pending >= self.batch_size:
+                written += flush()
+                pending = 0
+                likers, targets, authors, times = [], [], [], []
+
+        if pending:
+            written += flush()
+        return written
+
+    def _like_counts(self, popularity, target):
+        """
+        Split `target` likes by popularity, at most one per non-author user.
+
+        Likes a capped item cannot take go to the uncapped ones, so the
+        total stays close to the target even with a very heavy tail.
+        """
+        cap = self.user_count - 1
+        expected = popularity / popularity.sum() * target
+        capped = np.zeros(len(expected), dtype=bool)
+        for _ in range(20):
+            over = (expected > cap) & ~capped
+            if not over.any():
+                break
+            excess = (expected[over] - cap).sum()
+            expected[over] = cap
+            capped |= over
+            free = ~capped
+            if not free.any():
+                break
+            expected[free] += excess * expected[free] / expected[free].sum()
+        return np.minimum(self.rng.poisson(expected), cap)
+
+    def _pick_users(self, count):
+        """Indexes into user_ids, weighted by activity."""
+        return np.searchsorted(self.activity_cdf, self.rng.random(count), side='right').clip(
+            max=self.user_count - 1
+        )
+
+    def _pick_likers(self, count, author_id):
+        """`count` distinct user indexes, weighted by activity, never the author."""
+        author_index = int(np.searchsorted(self.user_ids, author_id))
+        if count * 4 < self.user_count:
+            picked = self._pick_users(count * 2 + 8)
+            _, first = np.unique(picked, return_index=True)
+            picked = picked[np.sort(first)]
+            picked = picked[picked != author_index][:count]
+            if len(picked) == count:
+                return picked
+        else:
+            picked = np.zeros(0, dtype=np.int64)
+
+        # Popular targets (or unlucky draws): fill up from the remaining users
+        remaining = np.setdiff1d(np.arange(self.user_count), np.append(picked, author_index))
+        extra = self.rng.choice(remaining, count - len(picked), replace=False)
+        return np.concatenate([picked, extra])
+
+    def _bursty_times(self, count):
+        """Epoch seconds in [start, now]: bursts on top of a uniform background."""
+        bursts = max(self.days * 3, 1)
+        centers = self.rng.uniform(self.start, self.now, bursts)
+        # Some bursts are much bigger than others
+        sizes = self.rng.pareto(1.5, bursts) + 1
+        in_burst = self.rng.random(count) < BURST_SHARE
+        burst_times = (
+            centers[self.rng.choice(bursts, count, p=sizes / sizes.sum())]
+            + self.rng.exponential(BURST_SECONDS, count)
+        )
+        times = np.where(in_burst, burst_times, self._uniform_times(count, self.start, self.now))
+        return np.minimum(times, self.now)
+
+    def _uniform_times(self, count, start, end):
+        return self.rng.uniform(start, end, count)
+
+    def _next_ids(self, model, count):
+        first = (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        return np.arange(first, first + count, dtype=np.int64)
+
+    def _write_table(self, model, columns):
+        """
+        Insert rows given as columns (attname -> equal-length sequence).
+
+        Rows go out in batches of batch_size: COPY on PostgreSQL,
+        executemany on SQLite, bulk_create elsewhere.
+        """
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        names = list(columns)
+        total = len(columns[names[0]])
+        for start in range(0, total, self.batch_size):
+            values = []
+            for name in names:
+                column = columns[name][start:start + self.batch_size]
+                if isinstance(fields[name], DateTimeField):
+                    column = self._db_datetimes(column)
+                elif isinstance(column, np.ndarray):
+                    column = column.tolist()
+                values.append(column)
+            rows = zip(*values)
+
+            if self.use_copy:
+                self._copy_rows(model, [fields[name].column for name in names], rows)
+            elif connection.vendor == 'sqlite':
+                self._insert_rows(model, [fields[name].column for name in names], rows)
+            else:
+                model.objects.bulk_create(model(**dict(zip(names, row))) for row in rows)
+            # With DEBUG on, every batch's SQL would otherwise be kept in memory
+            reset_queries()
+        return total
+
+    def _db_datetimes(self, epoch_seconds):
+        """
+        Convert epoch seconds to what the database stores, in one NumPy pass.
+
+        SQLite stores naive UTC text ('YYYY-MM-DD HH:MM:SS.ffffff'), as
+        Django's adapter writes it; COPY takes the same text with an offset.
+        """
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            return list(_datetimes(epoch_seconds))
+        text = np.char.replace(
+            np.datetime_as_string(
+                np.asarray(epoch_seconds * 1e6, dtype=np.int64).astype('datetime64[us]'),
+                unit='us'
+            ),
+            'T', ' '
+        )
+        if self.use_copy:
+            text = np.char.add(text, '+00:00')
+        return text.tolist()
+
+    def _insert_rows(self, model, columns, rows):
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def _copy_rows(self, model, columns, rows):
+        quote = connection.ops.quote_name
+        sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(column) for column in columns)
+        )
+        buffer = io.StringIO()
+        # None becomes an empty unquoted field, which COPY reads as NULL
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    def _reset_sequences(self):
+        """Move id sequences past the explicit ids written above."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Post, Comment, PostLike, CommentLike, KarmaTransaction]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+@contextmanager
+def _sqlite_cache_size(kib):
+    """
+    Enlarge SQLite's page cache for the block.
+
+    Random-order index inserts (likes, karma) thrash the default 2 MB cache.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA cache_size = -{int(kib)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {int(previous)}')
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """Let bulk_create keep the given created_at/updated_at instead of now()."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def _datetimes(epoch_seconds):
+    """Aware UTC datetimes for an array of epoch seconds (lazily)."""
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return (epoch + timedelta(seconds=value) for value in np.asarray(epoch_seconds).tolist())
+
+
+def _supports_copy():
+    """COPY FROM STDIN needs psycopg2's copy_expert."""
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return False
+    return True
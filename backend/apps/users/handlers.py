@@ -0,0 +1,64 @@
+"""
+Outbox event handlers that keep karma in step with likes.
+
+Likes by the content's own author earn no karma.
+"""
+from django.utils.dateparse import parse_datetime
+from apps.events.services import handler
+from .models import KarmaTransaction
+from .services import award_karma, revoke_karma
+
+
+@handler('post_liked')
+def award_post_like_karma(payload):
+    if payload['author_id'] != payload['actor_id']:
+        award_karma(
+            payload['author_id'],
+            KarmaTransaction.KARMA_TYPE_POST_LIKE,
+            content_type='post',
+            object_id=payload['post_id'],
+            actor_id=payload['actor_id']
+        )
+
+
+@handler('post_unliked')
+def revoke_post_like_karma(payload):
+    if payload['author_id'] != payload['actor_id']:
+        revoke_karma(
+            payload['author_id'],
+            KarmaTransaction.KARMA_TYPE_POST_LIKE,
+            content_type='post',
+            object_id=payload['post_id'],
+            actor_id=payload['actor_id'],
+            earned_at=_liked_at(payload)
+        )
+
+
+@handler('comment_liked')
+def award_comment_like_karma(payload):
+    if payload['author_id'] != payload['actor_id']:
+        award_karma(
+            payload['author_id'],
+            KarmaTransaction.KARMA_TYPE_COMMENT_LIKE,
+            content_type='comment',
+            object_id=payload['comment_id'],
+            actor_id=payload['actor_id']
+        )
+
+
+@handler('comment_unliked')
+def revoke_comment_like_karma(payload):
+    if payload['author_id'] != payload['actor_id']:
+        revoke_karma(
+            payload['author_id'],
+            KarmaTransaction.KARMA_TYPE_COMMENT_LIKE,
+            content_type='comment',
+            object_id=payload['comment_id'],
+            actor_id=payload['actor_id'],
+            earned_at=_liked_at(payload)
+        )
+
+
+def _liked_at(payload):
+    # Absent from events published before it was added
+    return parse_datetime(payload['liked_at']) if payload.get('liked_at') else None
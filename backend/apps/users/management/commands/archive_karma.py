@@ -0,0 +1,91 @@
+"""
+Management command to archive old karma transactions.
+
+The leaderboard only ever reads the last 168 hours of KarmaTransaction,
+so older rows are streamed into gzip'd CSV files (one per day or week),
+their totals folded into each user's KarmaCounter, and then deleted.
+This keeps karma_transactions and its indexes bounded to the retention
+window. Run it periodically (e.g. daily from cron).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.users.models import KarmaTransaction
+from apps.users.services import archive_cutoff, archive_karma_before
+
+
+class Command(BaseCommand):
+    help = 'Archive karma transactions older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.KARMA_RETENTION_DAYS,
+            help='Keep transactions newer than this many days'
+        )
+        parser.add_argument(
+            '--period',
+            choices=['day', 'week'],
+            default='day',
+            help='Size of each archive file'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=settings.KARMA_ARCHIVE_DIR,
+            help='Directory the compressed archive files are written to'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows fetched per round trip while streaming'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be archived'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Reclaim space and refresh statistics afterwards (PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = archive_cutoff(options['retention_days'])
+        except ValueError as exc:
+            raise CommandError(f'--retention-days: {exc}')
+
+        if options['dry_run']:
+            count = KarmaTransaction.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'{count} transactions older than {cutoff:%Y-%m-%d %H:%M} would be archived.')
+            return
+
+        results = archive_karma_before(
+            cutoff,
+            options['archive_dir'],
+            period=options['period'],
+            batch_size=options['batch_size']
+        )
+
+        total = 0
+        for period_start, archived, path in results:
+            total += archived
+            self.stdout.write(f'{period_start:%Y-%m-%d}: archived {archived} transactions to {path}')
+
+        if options['vacuum'] and total:
+            self._vacuum()
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} karma transactions.'))
+
+    def _vacuum(self):
+        if connection.vendor != 'postgresql':
+            # SQLite reuses freed pages; a full VACUUM would rewrite the whole database
+            self.stdout.write('Skipping vacuum (only needed on PostgreSQL).')
+            return
+
+        self.stdout.write('Vacuuming karma_transactions...')
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM (ANALYZE) karma_transactions')
@@ -1,14 +1,32 @@
 """
 Management command to seed the database with test data.
+
+By default it creates a small hand-written dataset for local development.
+With --bulk it generates a large synthetic dataset for benchmarks (see
+apps.users.bulk_seed): power-law likes, deep comment chains and bursty
+timestamps, written in batches.
+
+Examples:
+    python manage.py seed_data --users 10 --posts 20
+    python manage.py seed_data --bulk --clear --seed 42
+    python manage.py seed_data --bulk --users 50000 --posts 500000 --likes 5000000
 """
 import random
+import time
 from datetime import timedelta
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 from apps.users.models import User, KarmaTransaction
+from apps.users.services import rebuild_karma_counters
 from apps.posts.models import Post
 from apps.comments.models import Comment
 from apps.likes.models import PostLike, CommentLike
+from apps.users.bulk_seed import BulkSeeder
+
+# Defaults per mode: (regular, --bulk)
+DEFAULT_USERS = (10, 10000)
+DEFAULT_POSTS = (20, 100000)
 
 
 class Command(BaseCommand):
@@ -18,20 +36,55 @@ class Command(BaseCommand):
         parser.add_argument(
             '--users',
             type=int,
-            default=10,
-            help='Number of users to create'
+            help='Number of users to create (default 10, or 10000 with --bulk)'
         )
         parser.add_argument(
             '--posts',
             type=int,
-            default=20,
-            help='Number of posts to create'
+            help='Number of posts to create (default 20, or 100000 with --bulk)'
         )
         parser.add_argument(
             '--clear',
             action='store_true',
             help='Clear existing data before seeding'
         )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for a reproducible dataset'
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Generate a large synthetic dataset with batched inserts'
+        )
+        parser.add_argument(
+            '--comments',
+            type=int,
+            help='With --bulk: number of comments (default 5 per post)'
+        )
+        parser.add_argument(
+            '--likes',
+            type=int,
+            help='With --bulk: target number of post likes (default 20 per post)'
+        )
+        parser.add_argument(
+            '--comment-likes',
+            type=int,
+            help='With --bulk: target number of comment likes (default 1 per comment)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='With --bulk: spread timestamps over this many days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='With --bulk: rows per INSERT (or COPY on PostgreSQL)'
+        )
 
     def handle(self, *args, **options):
         # Check if database already has data
@@ -48,15 +101,18 @@ class Command(BaseCommand):
         
         if options['clear']:
             self.stdout.write('Clearing existing data...')
-            KarmaTransaction.objects.all().delete()
-            CommentLike.objects.all().delete()
-            PostLike.objects.all().delete()
-            Comment.objects.all().delete()
-            Post.objects.all().delete()
-            User.objects.filter(is_superuser=False).delete()
+            self._clear()
+
+        mode = 1 if options['bulk'] else 0
+        num_users = options['users'] if options['users'] is not None else DEFAULT_USERS[mode]
+        num_posts = options['posts'] if options['posts'] is not None else DEFAULT_POSTS[mode]
+
+        if options['bulk']:
+            self._seed_bulk(num_users, num_posts, options)
+            return
 
-        num_users = options['users']
-        num_posts = options['posts']
+        if options['seed'] is not None:
+            random.seed(options['seed'])
 
         self.stdout.write(f'Creating {num_users} users...')
         users = self._create_users(num_users)
@@ -70,8 +126,61 @@ class Command(BaseCommand):
         self.stdout.write('Creating likes and karma...')
         self._create_likes(users, posts, comments)
 
+        self.stdout.write('Rebuilding karma counters...')
+        rebuild_karma_counters()
+
         self.stdout.write(self.style.SUCCESS('Database seeded successfully!'))
 
+    def _clear(self):
+        """
+        Delete all content and non-superusers.
+
+        Content tables are emptied with one DELETE each: going through the
+        ORM would load every comment to cascade to its replies.
+        """
+        quote = connection.ops.quote_name
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for model in (KarmaTransaction, CommentLike, PostLike, Comment, Post):
+                    cursor.execute(f'DELETE FROM {quote(model._meta.db_table)}')
+            User.objects.filter(is_superuser=False).delete()
+
+    def _seed_bulk(self, num_users, num_posts, options):
+        if num_users < 2 or num_posts < 1:
+            raise CommandError('--bulk needs at least 2 users and 1 post.')
+
+        num_comments = options['comments']
+        if num_comments is None:
+            num_comments = num_posts * 5
+        num_likes = options['likes']
+        if num_likes is None:
+            num_likes = num_posts * 20
+        num_comment_likes = options['comment_likes']
+        if num_comment_likes is None:
+            num_comment_likes = num_comments
+
+        seeder = BulkSeeder(
+            users=num_users,
+            posts=num_posts,
+            comments=num_comments,
+            post_likes=num_likes,
+            comment_likes=num_comment_likes,
+            days=options['days'],
+            seed=options['seed'] or 0,
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        started = time.perf_counter()
+        written = seeder.run()
+        elapsed = time.perf_counter() - started
+
+        rows = sum(count for table, count in written.items() if table != 'karma_counters')
+        for table, count in written.items():
+            self.stdout.write(f'  {table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s).'
+        ))
+
     def _create_users(self, count):
         users = []
         usernames = [
@@ -209,6 +318,7 @@ class Command(BaseCommand):
                             points=KarmaTransaction.KARMA_POINTS[KarmaTransaction.KARMA_TYPE_POST_LIKE],
                             content_type='post',
                             object_id=post.id,
+                            actor=user,
                             created_at=now - timedelta(hours=hours_ago)
                         )
                     except Exception:
@@ -232,6 +342,7 @@ class Command(BaseCommand):
                             points=KarmaTransaction.KARMA_POINTS[KarmaTransaction.KARMA_TYPE_COMMENT_LIKE],
                             content_type='comment',
                             object_id=comment.id,
+                            actor=user,
                             created_at=now - timedelta(hours=hours_ago)
                         )
                     except Exception:
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_karma_counters(apps, schema_editor):
+    """Seed the running counters from the existing transaction log."""
+    KarmaTransaction = apps.get_model('users', 'KarmaTransaction')
+    KarmaCounter = apps.get_model('users', 'KarmaCounter')
+    field_for_type = {
+        'post_like': 'post_likes_karma',
+        'comment_like': 'comment_likes_karma',
+    }
+
+    counters = {}
+    rows = (
+        KarmaTransaction.objects
+        .values('user_id', 'karma_type')
+        .annotate(total=models.Sum('points'))
+        .order_by()
+    )
+    for row in rows:
+        counter = counters.setdefault(row['user_id'], KarmaCounter(user_id=row['user_id']))
+        setattr(counter, field_for_type[row['karma_type']], row['total'])
+        counter.total_karma += row['total']
+
+    KarmaCounter.objects.bulk_create(counters.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='karma_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_likes_karma', models.IntegerField(default=0)),
+                ('comment_likes_karma', models.IntegerField(default=0)),
+                ('total_karma', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'karma_counters',
+            },
+        ),
+        migrations.RunPython(backfill_karma_counters, migrations.RunPython.noop),
+    ]
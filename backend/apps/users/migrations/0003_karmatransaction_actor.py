@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_karmacounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='karmatransaction',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='karma_given', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='karmatransaction',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'actor'), name='karma_unique_source'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_karmatransaction_actor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='karmacounter',
+            name='archived_comment_likes_karma',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='karmacounter',
+            name='archived_post_likes_karma',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_karmacounter_archived'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('karma_type', models.CharField(choices=[('post_like', 'Post Like'), ('comment_like', 'Comment Like')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'karma_rollups',
+                'indexes': [models.Index(fields=['hour'], name='karma_rollu_hour_af711d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='karmarollup',
+            constraint=models.UniqueConstraint(fields=('user', 'hour', 'karma_type'), name='karma_rollup_unique_hour'),
+        ),
+    ]
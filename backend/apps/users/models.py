@@ -53,6 +53,18 @@ class KarmaTransaction(models.Model):
     content_type = models.CharField(max_length=20)  # 'post' or 'comment'
     object_id = models.PositiveIntegerField()
 
+    # The user whose like produced this karma. Together with the object
+    # reference this identifies the originating like, so an unlike
+    # reverses exactly one row. NULL for rows recorded before this was
+    # tracked (and if the liker's account is deleted).
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='karma_given'
+    )
+
     class Meta:
         db_table = 'karma_transactions'
         ordering = ['-created_at']
@@ -60,6 +72,88 @@ class KarmaTransaction(models.Model):
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['created_at']),
         ]
+        constraints = [
+            # One karma row per like; also serves (content_type, object_id) lookups
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'actor'],
+                name='karma_unique_source'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: +{self.points} ({self.karma_type})"
+
+
+class KarmaCounter(models.Model):
+    """
+    Running all-time karma totals for a user.
+
+    Updated in the same transaction as every KarmaTransaction insert/delete,
+    so all-time karma is a primary key lookup instead of a SUM over the
+    user's entire history. Windowed karma (leaderboard, 24h breakdown) is
+    still calculated from KarmaTransaction.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='karma_counter'
+    )
+    post_likes_karma = models.IntegerField(default=0)
+    comment_likes_karma = models.IntegerField(default=0)
+    total_karma = models.IntegerField(default=0)
+
+    # Karma whose transactions were moved out of karma_transactions by the
+    # archive_karma command. Already included in the totals above; kept so
+    # counters can still be rebuilt from the (now partial) transaction log.
+    archived_post_likes_karma = models.IntegerField(default=0)
+    archived_comment_likes_karma = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Which per-type column each karma type is accumulated into
+    FIELD_FOR_TYPE = {
+        KarmaTransaction.KARMA_TYPE_POST_LIKE: 'post_likes_karma',
+        KarmaTransaction.KARMA_TYPE_COMMENT_LIKE: 'comment_likes_karma',
+    }
+
+    class Meta:
+        db_table = 'karma_counters'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total_karma} karma"
+
+
+class KarmaRollup(models.Model):
+    """
+    Hourly per-user karma totals for transactions that have been archived.
+
+    Written by archive_karma_period in the same transaction that deletes
+    the rows, so karma history (the karma series, leaderboard replays)
+    is still answerable once the transactions themselves are gone.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='karma_rollups'
+    )
+    hour = models.DateTimeField()  # start of the hour (UTC)
+    karma_type = models.CharField(max_length=20, choices=KarmaTransaction.KARMA_TYPE_CHOICES)
+    count = models.IntegerField(default=0)  # transactions rolled up
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'karma_rollups'
+        constraints = [
+            # Also serves the per-user series range scans
+            models.UniqueConstraint(
+                fields=['user', 'hour', 'karma_type'],
+                name='karma_rollup_unique_hour'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.hour:%Y-%m-%d %H:00}: {self.points} ({self.karma_type})"
@@ -0,0 +1,385 @@
+"""
+Karma bookkeeping service module.
+
+Every karma change goes through these functions so that the
+KarmaTransaction log and the per-user KarmaCounter running totals
+are always written together, inside the caller's transaction.
+
+Old transactions are moved out of the live table into compressed
+archive files (see archive_karma_period); their points stay in the
+counters and in hourly KarmaRollup rows, so only the recent window the
+leaderboard reads is kept live while karma history stays queryable.
+"""
+import csv
+import gzip
+import os
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from apps.core.sql import delete_returning
+from .models import KarmaTransaction, KarmaCounter, KarmaRollup
+
+
+# Widest window served from the live table (leaderboard/user karma max is 168h)
+MIN_RETENTION_DAYS = 7
+
+# Columns written to karma archive files, in order
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'karma_type', 'points',
+    'content_type', 'object_id', 'actor_id', 'created_at',
+]
+
+
+def award_karma(user_id, karma_type, content_type, object_id, actor_id=None):
+    """
+    Record a karma-earning event and add its points to the user's counter.
+
+    Args:
+        user_id: The user earning the karma (the content author)
+        karma_type: One of the KarmaTransaction.KARMA_TYPE_* values
+        content_type: 'post' or 'comment'
+        object_id: ID of the liked post/comment
+        actor_id: The user whose like produced the karma
+
+    Returns:
+        The created KarmaTransaction
+    """
+    points = KarmaTransaction.KARMA_POINTS[karma_type]
+    karma = KarmaTransaction.objects.create(
+        user_id=user_id,
+        karma_type=karma_type,
+        points=points,
+        content_type=content_type,
+        object_id=object_id,
+        actor_id=actor_id
+    )
+    apply_counter_delta(user_id, karma_type, points)
+    return karma
+
+
+def revoke_karma(user_id, karma_type, content_type, object_id, actor_id, earned_at=None):
+    """
+    Reverse the karma produced by one like and subtract it from the counter.
+
+    The (content_type, object_id, actor) unique index identifies exactly
+    one row, so this is a single indexed DELETE ... RETURNING points;
+    other likers' karma for the same object is left untouched.
+
+    Rows recorded before the actor was tracked have no actor; if no
+    matching row exists, one such legacy row for the object is reversed
+    instead. If the karma has already been archived, `earned_at` (when
+    the like was made) locates its hourly rollup, which is reversed
+    along with the archived_* counter columns.
+
+    Returns:
+        Number of points removed
+    """
+    deleted = delete_returning(
+        KarmaTransaction.objects.filter(
+            content_type=content_type, object_id=object_id, actor_id=actor_id
+        ),
+        'points'
+    )
+
+    if not deleted:
+        legacy = KarmaTransaction.objects.filter(
+            user_id=user_id,
+            karma_type=karma_type,
+            content_type=content_type,
+            object_id=object_id,
+            actor__isnull=True
+        )
+        # Several likes may share the legacy key: reverse only one of them
+        deleted = delete_returning(
+            KarmaTransaction.objects.filter(id__in=legacy.order_by().values('id')[:1]),
+            'points'
+        )
+        if not deleted:
+            if earned_at is None:
+                return 0
+            return _revoke_archived_karma(user_id, karma_type, earned_at)
+
+    points = sum(row[0] for row in deleted)
+    apply_counter_delta(user_id, karma_type, -points)
+    return points
+
+
+def _revoke_archived_karma(user_id, karma_type, earned_at):
+    """
+    Reverse one archived transaction from the rollup of the hour it was earned.
+
+    The transaction may have been written a little after the like (by the
+    outbox consumer), so the following hour is checked too.
+    """
+    hour = earned_at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    rollup = (
+        KarmaRollup.objects
+        .filter(
+            user_id=user_id,
+            karma_type=karma_type,
+            hour__gte=hour,
+            hour__lte=hour + timedelta(hours=1),
+            count__gt=0
+        )
+        .order_by('hour')
+        .values_list('id', 'count', 'points')
+        .first()
+    )
+    if rollup is None:
+        return 0
+
+    rollup_id, count, total = rollup
+    points = total // count
+    updated = KarmaRollup.objects.filter(id=rollup_id, count__gt=0).update(
+        count=F('count') - 1,
+        points=F('points') - points
+    )
+    if not updated:
+        return 0
+
+    field = KarmaCounter.FIELD_FOR_TYPE[karma_type]
+    KarmaCounter.objects.filter(user_id=user_id).update(**{
+        f'archived_{field}': F(f'archived_{field}') - points,
+        field: F(field) - points,
+        'total_karma': F('total_karma') - points,
+        'updated_at': timezone.now(),
+    })
+    return points
+
+
+def apply_counter_delta(user_id, karma_type, points):
+    """
+    Add (or subtract) points to a user's KarmaCounter.
+
+    Uses F() expressions so concurrent updates never lose increments.
+    The counter row is created lazily on the user's first karma event.
+    """
+    field = KarmaCounter.FIELD_FOR_TYPE[karma_type]
+    changes = {
+        field: F(field) + points,
+        'total_karma': F('total_karma') + points,
+        'updated_at': timezone.now(),
+    }
+
+    updated = KarmaCounter.objects.filter(user_id=user_id).update(**changes)
+    if not updated:
+        # get_or_create is safe against a concurrent first insert
+        KarmaCounter.objects.get_or_create(user_id=user_id)
+        KarmaCounter.objects.filter(user_id=user_id).update(**changes)
+
+
+def rebuild_karma_counters():
+    """
+    Recompute every KarmaCounter from the KarmaTransaction log.
+
+    Used to backfill counters for existing data and to repair drift.
+    Archived karma is carried over, since its transactions are no
+    longer in the table.
+
+    Returns:
+        Number of counters written
+    """
+    totals = {}
+    archived = KarmaCounter.objects.exclude(
+        archived_post_likes_karma=0, archived_comment_likes_karma=0
+    ).values_list('user_id', 'archived_post_likes_karma', 'archived_comment_likes_karma')
+    for user_id, post_likes_karma, comment_likes_karma in archived:
+        totals[user_id] = KarmaCounter(
+            user_id=user_id,
+            post_likes_karma=post_likes_karma,
+            comment_likes_karma=comment_likes_karma,
+            total_karma=post_likes_karma + comment_likes_karma,
+            archived_post_likes_karma=post_likes_karma,
+            archived_comment_likes_karma=comment_likes_karma
+        )
+
+    rows = (
+        KarmaTransaction.objects
+        .values('user_id', 'karma_type')
+        .annotate(total=Sum('points'))
+        .order_by()
+    )
+    for row in rows:
+        counter = totals.setdefault(row['user_id'], KarmaCounter(user_id=row['user_id']))
+        field = KarmaCounter.FIELD_FOR_TYPE[row['karma_type']]
+        setattr(counter, field, getattr(counter, field) + row['total'])
+        counter.total_karma += row['total']
+
+    with transaction.atomic():
+        KarmaCounter.objects.all().delete()
+        KarmaCounter.objects.bulk_create(totals.values(), batch_size=1000)
+    return len(totals)
+
+
+def archive_cutoff(retention_days):
+    """
+    The time before which karma may be archived, keeping `retention_days` live.
+
+    Raises:
+        ValueError: If retention_days is below MIN_RETENTION_DAYS, which
+            would archive rows the leaderboard windows still read
+    """
+    if retention_days < MIN_RETENTION_DAYS:
+        raise ValueError(
+            f'retention_days must be at least {MIN_RETENTION_DAYS} '
+            f'(the leaderboard reads up to 168 hours of karma), got {retention_days}'
+        )
+    return timezone.now() - timedelta(days=retention_days)
+
+
+def archive_karma_before(cutoff, archive_dir, period='day', batch_size=5000):
+    """
+    Archive every KarmaTransaction created before `cutoff`, one period at a time.
+
+    The cutoff is floored to a period boundary so each archive file always
+    covers a whole day (or ISO week).
+
+    Returns:
+        List of (period_start, rows_archived, archive_path) tuples
+    """
+    step = timedelta(days=7 if period == 'week' else 1)
+    cutoff = _floor_to_period(cutoff, period)
+
+    oldest = (
+        KarmaTransaction.objects
+        .filter(created_at__lt=cutoff)
+        .aggregate(oldest=Min('created_at'))['oldest']
+    )
+    if oldest is None:
+        return []
+
+    results = []
+    start = _floor_to_period(oldest, period)
+    while start < cutoff:
+        end = start + step
+        archived, path = archive_karma_period(start, end, archive_dir, batch_size=batch_size)
+        if archived:
+            results.append((start, archived, path))
+        start = end
+    return results
+
+
+def archive_karma_period(start, end, archive_dir, batch_size=5000):
+    """
+    Move the KarmaTransaction rows created in [start, end) to a gzip'd CSV file.
+
+    Steps:
+    1. Stream the rows into <archive_dir>/karma_transactions_<date>_<ids>.csv.gz
+       (written to a temporary name, then atomically renamed)
+    2. In one transaction, fold the per-user totals into the
+       KarmaCounter archived_* columns and the hourly KarmaRollup rows,
+       and delete the rows
+
+    Rows are only deleted after the archive file is complete, so an
+    interrupted run never loses data; re-running re-archives the period.
+
+    Returns:
+        tuple: (rows_archived: int, archive_path: Path or None)
+    """
+    queryset = KarmaTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    bounds = queryset.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0, None
+
+    # Pin the row set so rows inserted while we work are left for the next run
+    queryset = queryset.filter(id__lte=bounds['last'])
+
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / (
+        f"karma_transactions_{start:%Y%m%d}_{bounds['first']}-{bounds['last']}.csv.gz"
+    )
+    partial_path = path.with_name(path.name + '.partial')
+
+    archived = 0
+    with gzip.open(partial_path, 'wt', newline='') as archive_file:
+        writer = csv.writer(archive_file)
+        writer.writerow(ARCHIVE_FIELDS)
+        rows = queryset.order_by('id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=batch_size)
+        for row in rows:
+            writer.writerow(row[:-1] + (row[-1].isoformat(),))
+            archived += 1
+    os.replace(partial_path, path)
+
+    with transaction.atomic():
+        _fold_into_counters(queryset)
+        _fold_into_rollups(queryset)
+        queryset.delete()
+
+    return archived, path
+
+
+def _fold_into_counters(queryset):
+    """Add the points of the given transactions to the archived_* counter columns."""
+    per_user = {}
+    rows = queryset.values('user_id', 'karma_type').annotate(total=Sum('points')).order_by()
+    for row in rows:
+        field = KarmaCounter.FIELD_FOR_TYPE[row['karma_type']]
+        per_user.setdefault(row['user_id'], {})[field] = row['total']
+
+    for user_id, fields in per_user.items():
+        changes = {
+            f'archived_{field}': F(f'archived_{field}') + points
+            for field, points in fields.items()
+        }
+        updated = KarmaCounter.objects.filter(user_id=user_id).update(**changes)
+        if not updated:
+            # No running counter yet: these points were never counted live either
+            total = sum(fields.values())
+            KarmaCounter.objects.create(
+                user_id=user_id,
+                total_karma=total,
+                **fields,
+                **{f'archived_{field}': points for field, points in fields.items()}
+            )
+
+
+def _fold_into_rollups(queryset, batch_size=1000):
+    """Add the given transactions to the per-user hourly KarmaRollup rows."""
+    rows = (
+        queryset
+        .annotate(hour=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('user_id', 'hour', 'karma_type')
+        .annotate(count=Count('id'), points=Sum('points'))
+        .order_by()
+    )
+    totals = {
+        (row['user_id'], row['hour'], row['karma_type']): (row['count'], row['points'])
+        for row in rows
+    }
+    if not totals:
+        return
+
+    # Hours already rolled up (a period re-archived after new rows arrived)
+    hours = [key[1] for key in totals]
+    existing = KarmaRollup.objects.filter(
+        user_id__in={key[0] for key in totals},
+        hour__gte=min(hours),
+        hour__lte=max(hours)
+    )
+    to_update = []
+    for rollup in existing:
+        key = (rollup.user_id, rollup.hour, rollup.karma_type)
+        if key in totals:
+            count, points = totals.pop(key)
+            rollup.count += count
+            rollup.points += points
+            to_update.append(rollup)
+    KarmaRollup.objects.bulk_update(to_update, ['count', 'points'], batch_size=batch_size)
+    KarmaRollup.objects.bulk_create(
+        [
+            KarmaRollup(user_id=user_id, hour=hour, karma_type=karma_type, count=count, points=points)
+            for (user_id, hour, karma_type), (count, points) in totals.items()
+        ],
+        batch_size=batch_size
+    )
+
+
+def _floor_to_period(value, period):
+    value = timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        value -= timedelta(days=value.weekday())
+    return value
@@ -0,0 +1,20 @@
+"""
+Background tasks for karma maintenance (see apps.jobs).
+"""
+from django.conf import settings
+from apps.jobs.services import task
+from .services import archive_cutoff, archive_karma_before, rebuild_karma_counters
+
+
+@task('users.archive_karma')
+def archive_karma(retention_days=None, period='day'):
+    """Same as `manage.py archive_karma`; safe to re-run after a failure."""
+    if retention_days is None:
+        retention_days = settings.KARMA_RETENTION_DAYS
+    cutoff = archive_cutoff(retention_days)
+    archive_karma_before(cutoff, settings.KARMA_ARCHIVE_DIR, period=period)
+
+
+@task('users.rebuild_karma_counters', max_attempts=1)
+def rebuild_counters():
+    rebuild_karma_counters()
@@ -0,0 +1,257 @@
+"""
+Tests for karma bookkeeping (running counters and archival), health checks
+and the bulk seeder.
+"""
+import csv
+import gzip
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.comments.models import Comment
+from apps.likes.models import PostLike, CommentLike
+from apps.posts.models import Post
+from apps.leaderboard.services import get_user_karma_series
+from apps.likes.services import like_post, unlike_post
+from apps.users.models import User, KarmaTransaction, KarmaCounter, KarmaRollup
+from apps.users.services import (
+    award_karma, archive_karma_before, rebuild_karma_counters, revoke_karma
+)
+
+
+class KarmaArchiveTests(TestCase):
+    """Test moving old karma transactions into archive files."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@test.com',
+            password='testpass123'
+        )
+        self.liker = User.objects.create_user(
+            username='liker',
+            email='liker@test.com',
+            password='testpass123'
+        )
+
+    def _award(self, object_id, days_ago):
+        karma = award_karma(
+            self.author.id,
+            KarmaTransaction.KARMA_TYPE_POST_LIKE,
+            content_type='post',
+            object_id=object_id,
+            actor_id=self.liker.id
+        )
+        karma.created_at = timezone.now() - timedelta(days=days_ago)
+        karma.save()
+        return karma
+
+    def test_archive_moves_old_rows_and_keeps_totals(self):
+        """Test that archived rows leave the table but stay in the all-time counter."""
+        self._award(1, days_ago=20)
+        self._award(2, days_ago=20)
+        recent = self._award(3, days_ago=1)
+        
+        results = archive_karma_before(
+            timezone.now() - timedelta(days=8), self.archive_dir
+        )
+        
+        self.assertEqual(sum(archived for _, archived, _ in results), 2)
+        self.assertEqual(list(KarmaTransaction.objects.values_list('id', flat=True)), [recent.id])
+        
+        with gzip.open(results[0][2], 'rt', newline='') as archive_file:
+            rows = list(csv.DictReader(archive_file))
+        self.assertEqual(sorted(row['object_id'] for row in rows), ['1', '2'])
+        
+        counter = KarmaCounter.objects.get(user=self.author)
+        self.assertEqual(counter.total_karma, 15)
+        self.assertEqual(counter.archived_post_likes_karma, 10)
+
+    def test_rebuild_keeps_archived_karma(self):
+        """Test that rebuilding counters after archival does not lose archived karma."""
+        self._award(1, days_ago=20)
+        self._award(2, days_ago=1)
+        archive_karma_before(timezone.now() - timedelta(days=8), self.archive_dir)
+        
+        rebuild_karma_counters()
+        
+        counter = KarmaCounter.objects.get(user=self.author)
+        self.assertEqual(counter.total_karma, 10)
+        self.assertEqual(counter.archived_post_likes_karma, 5)
+
+    def test_retention_below_the_minimum_is_refused(self):
+        """Test that the job and the command both refuse to archive live karma."""
+        from apps.users.tasks import archive_karma
+        
+        recent = self._award(1, days_ago=2)
+        
+        for retention_days in (0, 1):
+            with self.assertRaises(ValueError):
+                archive_karma(retention_days=retention_days)
+        with self.assertRaises(CommandError):
+            call_command('archive_karma', '--retention-days', '1', stdout=StringIO())
+        self.assertTrue(KarmaTransaction.objects.filter(id=recent.id).exists())
+
+    def test_history_survives_archival_and_unlike_reverses_it(self):
+        """Test that archived karma stays in the series and an unlike takes it back out."""
+        post = Post.objects.create(author=self.author, content='Old post')
+        like_post(self.liker, post.id)
+        earned_at = timezone.now() - timedelta(days=20)
+        KarmaTransaction.objects.update(created_at=earned_at)
+        PostLike.objects.update(created_at=earned_at)
+        self._award(2, days_ago=20)
+        
+        archive_karma_before(timezone.now() - timedelta(days=8), self.archive_dir)
+        
+        rollup = KarmaRollup.objects.get()
+        self.assertEqual((rollup.count, rollup.points), (2, 10))
+        series = get_user_karma_series(
+            self.author.id, 'day', earned_at - timedelta(days=1), earned_at + timedelta(days=1)
+        )
+        self.assertEqual(sum(series['points']), 10)
+        
+        unlike_post(self.liker, post.id)
+        
+        counter = KarmaCounter.objects.get(user=self.author)
+        self.assertEqual((counter.total_karma, counter.archived_post_likes_karma), (5, 5))
+        series = get_user_karma_series(
+            self.author.id, 'day', earned_at - timedelta(days=1), earned_at + timedelta(days=1)
+        )
+        self.assertEqual(sum(series['points']), 5)
+
+
+class RevokeKarmaTests(TestCase):
+    """Test reversing the karma of one like."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.liker = User.objects.create_user(username='liker')
+
+    def revoke(self, actor_id):
+        return revoke_karma(
+            self.author.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 1, actor_id
+        )
+
+    def test_one_delete_statement(self):
+        award_karma(self.author.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 1, self.liker.id)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.revoke(self.liker.id), 5)
+        
+        karma_queries = [q['sql'] for q in queries if 'karma_transactions' in q['sql']]
+        self.assertEqual(len(karma_queries), 1)
+        self.assertTrue(karma_queries[0].startswith('DELETE'))
+        self.assertEqual(KarmaCounter.objects.get(user=self.author).total_karma, 0)
+
+    def test_legacy_rows_are_reversed_one_at_a_time(self):
+        for _ in range(2):
+            award_karma(self.author.id, KarmaTransaction.KARMA_TYPE_POST_LIKE, 'post', 1)
+        
+        self.assertEqual(self.revoke(self.liker.id), 5)
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+        self.assertEqual(KarmaCounter.objects.get(user=self.author).total_karma, 5)
+
+
+class HealthCheckTests(TestCase):
+    """Test the probe endpoints and cached health statistics."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(
+            username='someone',
+            email='someone@test.com',
+            password='testpass123'
+        )
+
+    def test_livez_does_not_query_database(self):
+        """Test that the liveness probe never touches the database."""
+        with self.assertNumQueries(0):
+            response = self.client.get('/livez')
+        self.assertEqual(response.status_code, 200)
+
+    def test_readyz_runs_one_query(self):
+        """Test that the readiness probe is a single trivial query."""
+        with self.assertNumQueries(1):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.json()['status'], 'ready')
+
+    def test_health_stats_are_cached(self):
+        """Test that repeated health checks reuse the cached stats."""
+        first = self.client.get('/api/health/').json()
+        self.assertEqual(first['stats']['users'], 1)
+        
+        with self.assertNumQueries(1):  # only the readiness ping
+            second = self.client.get('/api/health/').json()
+        self.assertEqual(second['stats'], first['stats'])
+        self.assertIn('stats_age_seconds', second)
+
+
+class BulkSeedTests(TestCase):
+    """Test that `seed_data --bulk` writes consistent, reproducible data."""
+
+    def _seed(self, seed=7):
+        call_command(
+            'seed_data', '--bulk', '--clear', '--seed', str(seed),
+            '--users', '30', '--posts', '40', '--comments', '200',
+            '--likes', '300', '--comment-likes', '150', '--batch-size', '64',
+            stdout=StringIO()
+        )
+
+    def test_counters_match_rows(self):
+        """Test that like counts, karma rows and counters agree with the likes."""
+        self._seed()
+        
+        self.assertGreater(PostLike.objects.count(), 200)
+        post_likes = dict(
+            Post.objects.annotate(likes=Count('post_likes')).values_list('id', 'likes')
+        )
+        self.assertEqual(dict(Post.objects.values_list('id', 'like_count')), post_likes)
+        comment_likes = dict(
+            Comment.objects.annotate(likes=Count('comment_likes')).values_list('id', 'likes')
+        )
+        self.assertEqual(dict(Comment.objects.values_list('id', 'like_count')), comment_likes)
+        
+        self.assertEqual(
+            KarmaTransaction.objects.count(),
+            PostLike.objects.count() + CommentLike.objects.count()
+        )
+        self.assertFalse(PostLike.objects.filter(user=F('post__author')).exists())
+        for counter in KarmaCounter.objects.all():
+            earned = KarmaTransaction.objects.filter(user_id=counter.user_id)
+            self.assertEqual(counter.total_karma, sum(earned.values_list('points', flat=True)))
+
+    def test_comment_tree_is_consistent(self):
+        """Test that replies belong to their parent's post and are one level deeper."""
+        self._seed()
+        
+        replies = Comment.objects.filter(parent__isnull=False).select_related('parent')
+        self.assertTrue(replies.filter(depth__gte=3).exists())
+        for reply in replies:
+            self.assertEqual(reply.post_id, reply.parent.post_id)
+            self.assertEqual(reply.depth, reply.parent.depth + 1)
+            self.assertGreaterEqual(reply.created_at, reply.parent.created_at)
+
+    def test_same_seed_same_dataset(self):
+        """Test that a seed reproduces the same distribution of likes and replies."""
+        def shape():
+            return (
+                list(Post.objects.order_by('id').values_list('like_count', flat=True)),
+                list(Comment.objects.order_by('id').values_list('depth', flat=True)),
+            )
+
+        self._seed(seed=3)
+        first = shape()
+        self._seed(seed=3)
+        self.assertEqual(shape(), first)
+        self._seed(seed=4)
+        self.assertNotEqual(shape(), first)
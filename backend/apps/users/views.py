@@ -8,6 +8,9 @@ from .serializers import UserSerializer, UserCreateSerializer
 class UserListCreateView(generics.ListCreateAPIView):
     """List all users or create a new user."""
     queryset = User.objects.all()
+    # session + page count + users
+    query_budget = 3
+    replica_reads = True
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
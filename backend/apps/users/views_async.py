@@ -0,0 +1,21 @@
+"""
+Async version of the health check view, served under ASGI when
+ASYNC_VIEWS is enabled. See apps/core/asyncviews.py.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from apps.core.asyncviews import json_response
+from .views_health import check_health
+
+
+class HealthCheckView(View):
+    """
+    Async GET /api/health/ (same response as views_health.HealthCheckView).
+
+    The ping and the stats need raw cursors, which Django only offers
+    synchronously, so they run in a worker thread.
+    """
+
+    async def get(self, request):
+        data, status_code = await sync_to_async(check_health)()
+        return json_response(data, status=status_code)
@@ -1,50 +1,167 @@
 """
 Health check views for debugging deployment issues.
+
+/livez and /readyz are meant for orchestrator probes and stay cheap:
+liveness never touches the database and readiness runs a single
+`SELECT 1` with a timeout. The statistics shown by /api/health/ are
+approximate and cached, so probing it does not scan whole tables.
 """
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import JsonResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db import connection
 from apps.users.models import User
 from apps.posts.models import Post
 from apps.comments.models import Comment
 from apps.likes.models import PostLike, CommentLike
 
+STATS_CACHE_KEY = 'health:stats'
+
+# Stats key -> model whose table is counted
+STATS_MODELS = {
+    'users': User,
+    'posts': Post,
+    'comments': Comment,
+    'post_likes': PostLike,
+    'comment_likes': CommentLike,
+}
+
+
+def liveness_view(request):
+    """
+    Liveness probe: the process is up and serving requests.
+
+    GET /livez
+    """
+    return JsonResponse({'status': 'alive'})
+
+
+def readiness_view(request):
+    """
+    Readiness probe: the database answers a trivial query in time.
+
+    GET /readyz
+
+    Returns 503 if the database is unreachable or too slow.
+    """
+    try:
+        ping_database()
+    except Exception as exc:
+        return JsonResponse(
+            {'status': 'unavailable', 'error': str(exc)},
+            status=503
+        )
+    return JsonResponse({'status': 'ready'})
+
+
+def ping_database():
+    """Run `SELECT 1`, bounded by HEALTH_READY_TIMEOUT_MS on PostgreSQL."""
+    if connection.vendor == 'postgresql':
+        # SET LOCAL only lasts until the end of this transaction
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SET LOCAL statement_timeout = %s',
+                [settings.HEALTH_READY_TIMEOUT_MS]
+            )
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def get_table_stats():
+    """
+    Get approximate row counts, cached for HEALTH_STATS_TTL seconds.
+
+    On PostgreSQL the planner's estimates (pg_class.reltuples) are read in
+    one catalog query; other databases fall back to COUNT(*), which is why
+    the result is cached.
+
+    Returns:
+        Dict with 'stats', 'sample_users', 'method' and 'computed_at' (epoch seconds)
+    """
+    cached = cache.get(STATS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    if connection.vendor == 'postgresql':
+        stats = _estimate_counts()
+        method = 'estimate'
+    else:
+        stats = {key: model.objects.count() for key, model in STATS_MODELS.items()}
+        method = 'count'
+
+    result = {
+        'stats': stats,
+        'sample_users': list(User.objects.order_by('id').values('id', 'username')[:10]),
+        'method': method,
+        'computed_at': time.time(),
+    }
+    cache.set(STATS_CACHE_KEY, result, settings.HEALTH_STATS_TTL)
+    return result
+
+
+def _estimate_counts():
+    tables = {model._meta.db_table: key for key, model in STATS_MODELS.items()}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relname, reltuples FROM pg_class '
+            "WHERE relkind IN ('r', 'p') AND relname = ANY(%s)",
+            [list(tables)]
+        )
+        # reltuples is -1 for tables that have never been analyzed
+        estimates = {tables[name]: max(int(reltuples), 0) for name, reltuples in cursor.fetchall()}
+    return {key: estimates.get(key, 0) for key in STATS_MODELS}
+
 
 class HealthCheckView(APIView):
     """
     Health check endpoint that shows database statistics.
     Useful for verifying deployment and database connectivity.
-    
+
     GET /api/health/
+
+    The stats block is approximate and may be up to HEALTH_STATS_TTL
+    seconds old; 'stats_age_seconds' says how old it is.
     """
-    
+
     def get(self, request):
-        # Get database info
-        db_vendor = connection.vendor
-        db_name = connection.settings_dict.get('NAME', 'unknown')
-        
-        # Get counts
-        user_count = User.objects.count()
-        post_count = Post.objects.count()
-        comment_count = Comment.objects.count()
-        post_like_count = PostLike.objects.count()
-        comment_like_count = CommentLike.objects.count()
-        
-        # Get sample users
-        users = list(User.objects.values('id', 'username')[:10])
-        
-        return Response({
-            'status': 'healthy',
-            'database': {
-                'vendor': db_vendor,
-                'name': db_name,
-            },
-            'stats': {
-                'users': user_count,
-                'posts': post_count,
-                'comments': comment_count,
-                'post_likes': post_like_count,
-                'comment_likes': comment_like_count,
-            },
-            'sample_users': users,
-        })
+        data, status_code = check_health()
+        return Response(data, status=status_code)
+
+
+def check_health():
+    """
+    Ping the database and collect the health payload.
+
+    Returns:
+        Tuple of (response data, HTTP status code)
+    """
+    # Get database info
+    db_vendor = connection.vendor
+    db_name = connection.settings_dict.get('NAME', 'unknown')
+
+    try:
+        ping_database()
+    except Exception as exc:
+        return {'status': 'unhealthy', 'error': str(exc)}, 503
+
+    table_stats = get_table_stats()
+
+    return {
+        'status': 'healthy',
+        'database': {
+            'vendor': db_vendor,
+            'name': str(db_name),
+        },
+        'stats': table_stats['stats'],
+        'stats_method': table_stats['method'],
+        'stats_age_seconds': round(time.time() - table_stats['computed_at'], 1),
+        'sample_users': table_stats['sample_users'],
+    }, 200
@@ -0,0 +1,30 @@
+"""
+ASGI config for Community Feed project.
+
+Run with an ASGI server, e.g.:
+    ASYNC_VIEWS=True gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+
+With ASYNC_VIEWS=True the read-heavy endpoints (leaderboard, comment
+tree, post detail, health) use their async views. WhiteNoise is then
+left out of the middleware (it is sync-only), so static files are
+served by Django's ASGI static files handler.
+
+Persistent database connections are turned off under ASGI (see
+DB_CONN_MAX_AGE in settings.py).
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Read by settings.py, which is loaded by get_asgi_application()
+os.environ['SERVING_ASGI'] = 'True'
+
+application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402  (settings are configured above)
+
+if settings.ASYNC_VIEWS:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
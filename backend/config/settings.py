@@ -3,6 +3,7 @@ Django settings for Community Feed project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -42,9 +43,23 @@ INSTALLED_APPS = [
     'apps.comments',
     'apps.likes',
     'apps.leaderboard',
+    'apps.core',
+    'apps.events',
+    'apps.jobs',
+    'apps.stream',
 ]
 
+# Serve the leaderboard, comment tree, post detail and health endpoints with
+# their async views (run under ASGI: config.asgi, uvicorn workers)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+
 MIDDLEWARE = [
+    'apps.core.middleware.RequestIdMiddleware',
+    'apps.core.middleware.MetricsMiddleware',
+    'apps.core.middleware.ServerTimingMiddleware',
+    'apps.core.middleware.CompressionMiddleware',
+    'apps.core.middleware.SamplingProfilerMiddleware',
+    'apps.core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -52,10 +67,16 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if ASYNC_VIEWS:
+    # WhiteNoise is sync-only and would force every request through a thread
+    # hop; config/asgi.py serves static files instead
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -75,24 +96,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
 
 # Database
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
 
+# Persistent connections: each worker thread keeps its connection for up to
+# DB_CONN_MAX_AGE seconds (0 closes it after every request). Health checks
+# replace a connection that died while idle instead of failing the request.
+# Under ASGI (config/asgi.py sets SERVING_ASGI) persistent connections are
+# off: sync code runs in executor threads that outlive the request, and a
+# connection kept in one of them is never closed or reused reliably.
+SERVING_ASGI = os.environ.get('SERVING_ASGI', 'False').lower() == 'true'
+DB_CONN_MAX_AGE = 0 if SERVING_ASGI else int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
 if DATABASE_URL and DATABASE_URL.startswith('postgres'):
     import dj_database_url
     # Use dj_database_url to parse the URL properly
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=True
+        )
     }
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        # Detect peers that vanished (failover, NAT timeouts) on idle connections
+        'keepalives': 1,
+        'keepalives_idle': 60,
+    })
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'apps.core.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+# Read replicas: comma-separated database URLs, registered as replica_1,
+# replica_2, ... Views with `replica_reads = True` read from them (see
+# apps/core/routers.py). For a local test, point one at a copy of the
+# SQLite file: DATABASE_REPLICA_URLS=sqlite:////path/to/replica.sqlite3
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(
+    url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+):
+    import dj_database_url
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = dj_database_url.parse(
+        replica_url.strip(),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True
+    )
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['ENGINE'] = 'apps.core.backends.sqlite3'
+    # Tests use the primary's test database instead of creating one
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
+
+# After a write, the client reads from the primary for this many seconds
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+# Applied to every new SQLite connection (see apps/core/backends/sqlite3)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': 256 * 1024 * 1024,
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -131,10 +210,146 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.core.renderers.TimedJSONRenderer',
     ],
 }
 
+# Caching: a small per-process LRU ('default') in front of a cache shared by
+# all workers ('shared'). The shared backend is a file cache unless
+# CACHE_SHARED_BACKEND/CACHE_SHARED_LOCATION point elsewhere, e.g.
+# django.core.cache.backends.redis.RedisCache and redis://localhost:6379/1.
+# The file cache lives in the project (var/cache), not the shared temp
+# directory; `manage.py test` points it at a fresh directory of its own.
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache.TieredCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+            # Longest time a worker can serve a value changed by another worker
+            'LOCAL_TIMEOUT': float(os.environ.get('CACHE_LOCAL_TIMEOUT', 5)),
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'CACHE_SHARED_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get(
+            'CACHE_SHARED_LOCATION', str(BASE_DIR / 'var' / 'cache')
+        ),
+        'TIMEOUT': 300,
+        'KEY_PREFIX': 'feed',
+    },
+}
+
+TEST_RUNNER = 'apps.core.testing.TestRunner'
+
+# Karma retention: transactions older than this are moved to compressed
+# archive files by `manage.py archive_karma`, leaving hourly rollups behind.
+# Must cover the widest leaderboard window (168 hours). Archival deletes
+# rows, so it only runs on a schedule when KARMA_ARCHIVE_CRON is set
+# (e.g. '30 3 * * *').
+KARMA_RETENTION_DAYS = int(os.environ.get('KARMA_RETENTION_DAYS', 8))
+KARMA_ARCHIVE_DIR = os.environ.get('KARMA_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'karma'))
+KARMA_ARCHIVE_CRON = os.environ.get('KARMA_ARCHIVE_CRON', '')
+
+# Outbox: with OUTBOX_DEFERRED, likes only record an event and karma (and
+# the change log) is applied by `manage.py consume_outbox`; otherwise
+# handlers run inline. Deferring does not reduce a like to the primary
+# write alone: the like row, the like_count update and the outbox row are
+# still written in the request's transaction. An event that fails
+# OUTBOX_MAX_ATTEMPTS times stops the consumer (see consume_outbox).
+OUTBOX_DEFERRED = os.environ.get('OUTBOX_DEFERRED', 'False').lower() == 'true'
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 200))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+
+# Background jobs (`manage.py runworker`): retry backoff (doubling from
+# JOB_RETRY_BACKOFF seconds), how often a running job refreshes its lock,
+# how long a lock may go unrefreshed (the worker died) before the job is
+# re-queued, and how long finished jobs are kept. Keep the heartbeat well
+# below the lock timeout; jobs may run for longer than either.
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 10))
+JOB_RETRY_BACKOFF_MAX = float(os.environ.get('JOB_RETRY_BACKOFF_MAX', 3600))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 60))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 1800))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
+# Scheduled jobs: name -> task, cron expression (UTC) and optional kwargs
+JOB_SCHEDULES = {
+    'purge-finished-jobs': {'task': 'jobs.purge_finished', 'cron': '0 4 * * *'},
+    'purge-change-log': {'task': 'stream.purge_changes', 'cron': '10 * * * *'},
+}
+if KARMA_ARCHIVE_CRON:
+    JOB_SCHEDULES['archive-karma'] = {'task': 'users.archive_karma', 'cron': KARMA_ARCHIVE_CRON}
+
+# Change log and /api/stream/ (server-sent events). Clients with a cursor
+# older than the retention window are told to reload. The gap timeout
+# bounds how long a change can take to commit and still be delivered
+CHANGE_LOG_RETENTION_HOURS = int(os.environ.get('CHANGE_LOG_RETENTION_HOURS', 24))
+CHANGE_LOG_GAP_TIMEOUT = float(os.environ.get('CHANGE_LOG_GAP_TIMEOUT', 5.0))
+STREAM_TICK = float(os.environ.get('STREAM_TICK', 0.25))
+# Recent events kept per worker for clients resuming with Last-Event-ID
+STREAM_BUFFER_EVENTS = int(os.environ.get('STREAM_BUFFER_EVENTS', 1200))
+STREAM_CATCH_UP_LIMIT = int(os.environ.get('STREAM_CATCH_UP_LIMIT', 50000))
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 15))
+STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 300))
+STREAM_LEADERBOARD_INTERVAL = float(os.environ.get('STREAM_LEADERBOARD_INTERVAL', 5))
+# Open streams per WSGI worker (each holds a thread; keep well below
+# gunicorn --threads). Further clients get 503; ASGI streams are not capped
+STREAM_MAX_WSGI_STREAMS = int(os.environ.get('STREAM_MAX_WSGI_STREAMS', 4))
+
+# Cursors returned by /api/comments/post/<id>/ lag this many seconds behind
+# now, so comments that commit after their created_at are still picked up
+COMMENT_CURSOR_LAG = float(os.environ.get('COMMENT_CURSOR_LAG', 5.0))
+
+# Health checks: /readyz query timeout and how long /api/health/ stats are cached
+HEALTH_READY_TIMEOUT_MS = int(os.environ.get('HEALTH_READY_TIMEOUT_MS', 2000))
+HEALTH_STATS_TTL = int(os.environ.get('HEALTH_STATS_TTL', 60))
+
+# Metrics (/metrics): each worker writes its samples to METRICS_DIR at most
+# every METRICS_FLUSH_INTERVAL seconds, and on exit; the endpoint merges all workers.
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; unset, /metrics is closed
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'community-feed-metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Log requests that run more queries than their view's query_budget
+QUERY_BUDGET_LOG = os.environ.get('QUERY_BUDGET_LOG', 'True').lower() == 'true'
+
+# Response compression (apps/core/compression.py): zstd/br when the zstandard/
+# brotli packages are installed, else gzip, for bodies of COMPRESS_MIN_SIZE+
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() == 'true'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+# Level per encoding; every encoding in apps.core.compression.COMPRESSORS needs one
+COMPRESS_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 4}
+# Per-process cache of compressed bodies, keyed by body hash (0 disables)
+COMPRESS_CACHE_ENTRIES = int(os.environ.get('COMPRESS_CACHE_ENTRIES', 256))
+COMPRESS_CACHE_TIMEOUT = 60
+
+# Server-Timing response header (db, serialize, app, total)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'False').lower() == 'true'
+
+# Seconds a staff SQL profile (?_profile=1) stays fetchable at /api/profile/<id>/
+PROFILE_TTL = int(os.environ.get('PROFILE_TTL', 600))
+
+# Sampling profiler: requests sending "X-Sample-Profile: <PROFILER_TOKEN>"
+# (never without a token), plus a random PROFILER_SAMPLE_RATE fraction, get
+# collapsed-stack files in PROFILER_DIR/<url name>/, newest PROFILER_MAX_FILES kept
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 200))
+PROFILER_DIR = os.environ.get(
+    'PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'community-feed-profiles')
+)
+
+# Log every SQL statement via django.db.backends (needs DEBUG; expensive)
+LOG_SQL = os.environ.get('LOG_SQL', 'False').lower() == 'true'
+
 # CORS settings
 cors_origins_str = os.environ.get(
     'CORS_ALLOWED_ORIGINS',
@@ -144,13 +359,40 @@ CORS_ALLOWED_ORIGINS = [origin.strip() for origin in cors_origins_str.split(',')
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 
-# Logging
+# Logging: records go through a bounded queue to a background writer thread
+# (apps/core/log.py), so request threads never block on stdout. Records that
+# do not fit in LOG_QUEUE_SIZE are dropped and counted.
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'plain' if DEBUG else 'json')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Fraction of records kept per logger, e.g. "django.db.backends=0.01"
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'apps.core.log.JsonFormatter',
+        },
+        'plain': {
+            'format': '%(levelname)s %(name)s [%(request_id)s %(view)s] %(message)s',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'apps.core.log.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
+        'request_context': {
+            '()': 'apps.core.log.RequestContextFilter',
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'apps.core.log.QueueLogHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'formatter': LOG_FORMAT,
+            'filters': ['sampling', 'request_context'],
         },
     },
     'root': {
@@ -160,7 +402,7 @@ LOGGING = {
     'loggers': {
         'django.db.backends': {
             'handlers': ['console'],
-            'level': 'DEBUG' if DEBUG else 'INFO',
+            'level': 'DEBUG' if DEBUG and LOG_SQL else 'INFO',
             'propagate': False,
         },
     },
@@ -1,18 +1,33 @@
 """
 URL configuration for Community Feed project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from apps.users.views_health import HealthCheckView
+from apps.users import views_async as users_async
+from apps.users.views_health import HealthCheckView, liveness_view, readiness_view
 from apps.users.views_diagnostic import diagnostic_view
+from apps.core.metrics import metrics_view
+from apps.core.views import ProfileDetailView
+from apps.stream.views import SyncView, stream_view
 
 urlpatterns = [
     path('', diagnostic_view, name='diagnostic'),  # Simple root endpoint
     path('admin/', admin.site.urls),
-    path('api/health/', HealthCheckView.as_view(), name='health-check'),
+    path('livez', liveness_view, name='livez'),
+    path('readyz', readiness_view, name='readyz'),
+    path('metrics', metrics_view, name='metrics'),
+    path(
+        'api/health/',
+        (users_async.HealthCheckView if settings.ASYNC_VIEWS else HealthCheckView).as_view(),
+        name='health-check'
+    ),
+    path('api/profile/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
     path('api/users/', include('apps.users.urls')),
     path('api/posts/', include('apps.posts.urls')),
     path('api/comments/', include('apps.comments.urls')),
     path('api/likes/', include('apps.likes.urls')),
     path('api/leaderboard/', include('apps.leaderboard.urls')),
+    path('api/stream/', stream_view, name='stream'),
+    path('api/sync/', SyncView.as_view(), name='sync'),
 ]
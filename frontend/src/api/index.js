@@ -28,7 +28,9 @@ export const postsApi = {
 
 // Comments API
 export const commentsApi = {
-  getByPost: (postId) => api.get(`/comments/post/${postId}/`),
+  // With `since` (the cursor of an earlier response), only newer comments, flat
+  getByPost: (postId, since) =>
+    api.get(`/comments/post/${postId}/`, { params: since ? { since } : {} }),
   create: (data) => api.post('/comments/', data),
   delete: (id) => api.delete(`/comments/${id}/`),
 };
@@ -45,4 +47,55 @@ export const leaderboardApi = {
   getUserKarma: (userId) => api.get(`/leaderboard/user/${userId}/`),
 };
 
+// What changed since a cursor; without one, just the current cursor
+export const syncApi = {
+  get: (since) => api.get('/sync/', { params: since == null ? {} : { since } }),
+};
+
+// Live updates (server-sent events from /api/stream/). One EventSource is
+// shared by all subscribers; the browser reconnects and resumes by itself.
+let stream = null;
+let streamRetry = null;
+const streamListeners = { update: new Set(), leaderboard: new Set(), reset: new Set() };
+// The server answers 503 when a worker has too many open streams. EventSource
+// gives up on an error status, so try again later (a reset makes the feed reload)
+const STREAM_RETRY_MS = 30000;
+
+const openStream = () => {
+  streamRetry = null;
+  stream = new EventSource(`${api.defaults.baseURL}/stream/`, { withCredentials: true });
+  Object.keys(streamListeners).forEach((name) => {
+    stream.addEventListener(name, (message) => {
+      const data = JSON.parse(message.data);
+      streamListeners[name].forEach((listener) => listener(data));
+    });
+  });
+  stream.onerror = () => {
+    if (stream.readyState !== EventSource.CLOSED) return;
+    stream = null;
+    streamRetry = setTimeout(() => {
+      openStream();
+      streamListeners.reset.forEach((listener) => listener({}));
+    }, STREAM_RETRY_MS);
+  };
+};
+
+export const streamApi = {
+  // Returns an unsubscribe function, or null if the browser has no EventSource
+  subscribe: (event, callback) => {
+    if (typeof EventSource === 'undefined') return null;
+    if (!stream && !streamRetry) openStream();
+    streamListeners[event].add(callback);
+    return () => {
+      streamListeners[event].delete(callback);
+      if (Object.values(streamListeners).every((listeners) => listeners.size === 0)) {
+        if (stream) stream.close();
+        clearTimeout(streamRetry);
+        stream = null;
+        streamRetry = null;
+      }
+    };
+  },
+};
+
 export default api;
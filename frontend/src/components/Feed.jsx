@@ -1,5 +1,5 @@
-import { useState, useEffect } from 'react';
-import { postsApi } from '../api';
+import { useState, useEffect, useRef } from 'react';
+import { postsApi, streamApi, syncApi } from '../api';
 import PostCard from './PostCard';
 import CreatePost from './CreatePost';
 import { RefreshCw } from 'lucide-react';
@@ -10,13 +10,38 @@ export default function Feed() {
   const [refreshing, setRefreshing] = useState(false);
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
+  // Change log cursor taken before the first page was loaded
+  const syncCursor = useRef(null);
 
   useEffect(() => {
     fetchPosts();
   }, []);
 
+  const applyUpdate = (update) => {
+    setPosts((prev) =>
+      prev
+        .filter((p) => !(update.deleted_posts || []).includes(p.id))
+        .map((p) => (update.posts && update.posts[p.id] ? { ...p, ...update.posts[p.id] } : p))
+    );
+  };
+
+  useEffect(() => {
+    // Live like/comment counts for the loaded posts
+    const unsubscribeUpdate = streamApi.subscribe('update', applyUpdate);
+    // Missed too much to catch up: reload
+    const unsubscribeReset = streamApi.subscribe('reset', () => fetchPosts(1));
+    return () => {
+      if (unsubscribeUpdate) unsubscribeUpdate();
+      if (unsubscribeReset) unsubscribeReset();
+    };
+  }, []);
+
   const fetchPosts = async (pageNum = 1, append = false) => {
     try {
+      if (!append) {
+        // Taken first, so later syncs cover anything the page missed
+        syncCursor.current = (await syncApi.get()).data.cursor;
+      }
       const response = await postsApi.list(pageNum);
       const newPosts = response.data.results || response.data;
       const postsArray = Array.isArray(newPosts) ? newPosts : [];
@@ -37,8 +62,35 @@ export default function Feed() {
     }
   };
 
-  const handleRefresh = () => {
+  const syncPosts = async () => {
+    let data;
+    do {
+      data = (await syncApi.get(syncCursor.current)).data;
+      if (data.reset) return false;
+      const { new_posts: newPosts } = data;
+      setPosts((prev) => [
+        ...newPosts.filter((post) => !prev.some((p) => p.id === post.id)),
+        ...prev,
+      ]);
+      applyUpdate(data);
+      syncCursor.current = data.cursor;
+    } while (data.has_more);
+    return true;
+  };
+
+  const handleRefresh = async () => {
     setRefreshing(true);
+    // Only fetch what changed since the feed was loaded; reload if too much did
+    if (syncCursor.current !== null) {
+      try {
+        if (await syncPosts()) {
+          setRefreshing(false);
+          return;
+        }
+      } catch (error) {
+        console.error('Failed to sync posts:', error);
+      }
+    }
     setPage(1);
     fetchPosts(1);
   };
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { leaderboardApi } from '../api';
+import { leaderboardApi, streamApi } from '../api';
 import { Trophy, Star, TrendingUp } from 'lucide-react';
 
 export default function Leaderboard() {
@@ -8,7 +8,12 @@ export default function Leaderboard() {
 
   useEffect(() => {
     fetchLeaderboard();
-    // Refresh every 30 seconds
+    // The server pushes the leaderboard when it changes
+    const unsubscribe = streamApi.subscribe('leaderboard', (data) => {
+      setLeaderboard(Array.isArray(data.leaderboard) ? data.leaderboard : []);
+    });
+    if (unsubscribe) return unsubscribe;
+    // No EventSource: refresh every 30 seconds
     const interval = setInterval(fetchLeaderboard, 30000);
     return () => clearInterval(interval);
   }, []);
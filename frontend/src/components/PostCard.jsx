@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { formatDistanceToNow } from 'date-fns';
 import { useAuth } from '../context/AuthContext';
 import { likesApi, commentsApi } from '../api';
@@ -6,6 +6,31 @@ import { Heart, MessageCircle, ChevronDown, ChevronUp } from 'lucide-react';
 import CommentThread from './CommentThread';
 import CreateComment from './CreateComment';
 
+// Add new comments (flat, oldest first) to a comment tree, skipping ones it has
+function spliceComments(tree, newComments) {
+  const byId = new Map();
+  const index = (comments) =>
+    comments.forEach((comment) => {
+      byId.set(comment.id, comment);
+      index(comment.replies || []);
+    });
+  const copy = structuredClone(tree);
+  index(copy);
+  newComments.forEach((comment) => {
+    if (byId.has(comment.id)) return;
+    const node = { ...comment, replies: [], reply_count: 0 };
+    byId.set(node.id, node);
+    const parent = node.parent ? byId.get(node.parent) : null;
+    if (parent) {
+      parent.replies.push(node);
+      parent.reply_count += 1;
+    } else if (!node.parent) {
+      copy.push(node);
+    }
+  });
+  return copy;
+}
+
 export default function PostCard({ post, onUpdate }) {
   const { isAuthenticated } = useAuth();
   const [isLiked, setIsLiked] = useState(post.is_liked_by_user);
@@ -15,6 +40,28 @@ export default function PostCard({ post, onUpdate }) {
   const [comments, setComments] = useState([]);
   const [commentsLoading, setCommentsLoading] = useState(false);
   const [commentCount, setCommentCount] = useState(post.comment_count);
+  const commentsCursor = useRef(null);
+
+  // Counts pushed by the live stream arrive as new props
+  useEffect(() => {
+    setLikeCount(post.like_count);
+  }, [post.like_count]);
+
+  useEffect(() => {
+    setCommentCount(post.comment_count);
+    // Someone replied: fetch just the new comments for an open thread
+    if (showComments && commentsCursor.current) fetchNewComments();
+  }, [post.comment_count]);
+
+  const fetchNewComments = async () => {
+    try {
+      const response = await commentsApi.getByPost(post.id, commentsCursor.current);
+      commentsCursor.current = response.data.cursor;
+      setComments((prev) => spliceComments(prev, response.data.comments));
+    } catch (error) {
+      console.error('Failed to load new comments:', error);
+    }
+  };
 
   const handleLike = async () => {
     if (!isAuthenticated || likeLoading) return;
@@ -42,6 +89,7 @@ export default function PostCard({ post, onUpdate }) {
 
     try {
       const response = await commentsApi.getByPost(post.id);
+      commentsCursor.current = response.data.cursor;
       setComments(Array.isArray(response.data.comments) ? response.data.comments : []);
     } catch (error) {
       console.error('Failed to load comments:', error);
@@ -52,19 +100,8 @@ export default function PostCard({ post, onUpdate }) {
   };
 
   const handleCommentCreated = (newComment) => {
-    // Add the new comment to the appropriate place
-    if (newComment.parent) {
-      // It's a reply - need to update the tree
-      // For simplicity, refresh the comments
-      commentsApi.getByPost(post.id).then((response) => {
-        setComments(Array.isArray(response.data.comments) ? response.data.comments : []);
-      }).catch(() => {
-        setComments([]);
-      });
-    } else {
-      // It's a top-level comment
-      setComments([...comments, { ...newComment, replies: [], reply_count: 0 }]);
-    }
+    // Add the new comment to the appropriate place in the tree
+    setComments((prev) => spliceComments(prev, [newComment]));
     setCommentCount((prev) => prev + 1);
   };
 